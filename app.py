@@ -1,4 +1,4 @@
-# Isla Verde Hotel Manager (single-file Streamlit app)
+# Isla Verde Hotel Manager (Streamlit app; data layer in hotel_core.py)
 # v4.4.0
 #
 # INCLUDED MODIFICATIONS:
@@ -14,46 +14,96 @@
 # ✅ Daily exchange rate is saved ONLY for that day; tomorrow it will be empty again
 #
 # FIXES / DEBUG:
-# ✅ Removed accidental "np =" variable / no numpy needed
+# ✅ Removed accidental "np =" variable shadowing the numpy import
 # ✅ Safer parsing & formatting
 # ✅ Better exception handling for admins vs non-admins
 
+import csv
+import io
+import json
+import logging
 import os
-import glob
 import sqlite3
-from datetime import date, datetime, timedelta
-from typing import Optional, List, Dict, Tuple
-from contextlib import contextmanager
+import tempfile
+from datetime import date, timedelta
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from hotel_core import (
+    GRID_LABELS,
+    STATUSES,
+    STATUS_LABEL,
+    add_room,
+    bootstrap,
+    export_audit_csv,
+    export_reservations_csv,
+    calc_total_usd,
+    clear_all_reservations,
+    clear_slow_queries,
+    BACKUP_MODE,
+    HISTORY_PAGE_SIZE,
+    SLOW_QUERY_MS,
+    StaleReservationError,
+    db_pool_stats,
+    delete_reservation,
+    delete_room,
+    finish_query_log,
+    fmt_money,
+    get_audit_page,
+    get_available_rooms,
+    get_audit_values,
+    get_el_roll_snapshot,
+    get_fx_for_day,
+    get_fx_series,
+    get_daily_stats,
+    get_guest_reservations,
+    get_history_summary,
+    get_latest_backup_path,
+    get_occupancy_grid,
+    get_reservation,
+    get_reservation_notes,
+    get_revenue_report,
+    get_room_by_number,
+    get_room_reservations,
+    get_rooms,
+    get_setting,
+    get_slow_queries,
+    import_reservations,
+    list_restore_points,
+    restore_backup,
+    run_backup,
+    log_audit,
+    nights,
+    parse_iso,
+    query_totals,
+    read_cache_stats,
+    reset_query_totals,
+    reset_rooms_to_default,
+    run_write,
+    save_reservation,
+    safe_float,
+    save_today_fx,
+    search_guests,
+    set_actor_provider,
+    set_setting,
+    start_query_log,
+    submit_write,
+    update_room_defaults_bulk,
+    usd_to_crc,
+)
+
 # ============================================================
 # CONFIG
 # ============================================================
-DB_PATH = "hotel.db"
-
 USERS = {
     "receptionist a": {"password": "ISLA1", "role": "receptionist"},
     "receptionist b": {"password": "ISLA2", "role": "receptionist"},
     "admin": {"password": "admin000", "role": "admin"},
 }
 
-STATUSES: List[Tuple[str, str]] = [
-    ("reserved", "Reserved"),
-    ("checkedin", "Checked In"),
-    ("noshow", "No Show"),
-    ("checkedout", "Checked Out"),
-]
-STATUS_LABEL = {k: v for k, v in STATUSES}
-VALID_STATUSES = {k for k, _ in STATUSES}
-
-CURRENCIES = [("USD", "$"), ("CRC", "₡")]
-CURRENCY_SYMBOL = {code: sym for code, sym in CURRENCIES}
-
-BACKUP_DIR = "backups"
-BACKUP_RETENTION_DAYS = 30
-
 APP_VERSION = "v4.4.0"
 
 # ============================================================
@@ -73,9 +123,36 @@ TEXT = {
         "go_to": "Go to",
         "el_roll": "El Roll",
         "register_guests": "Register Guests",
+        "availability": "Find a free room",
+        "free_rooms": "Free rooms",
+        "use_room": "Use room",
+        "bulk_import": "Bulk import (CSV / JSON)",
+        "bulk_import_hint": "Columns: room, guest_name, check_in, check_out, pax, tariff, tax, status, notes. "
+        "Blank tariff / tax use the room's prices. Rows that are invalid or overlap a stay are skipped.",
+        "import_file": "File",
+        "import_preview": "Rows to import",
+        "import_rejected": "Rejected rows",
+        "import_reason": "Reason",
+        "line": "Line",
+        "import_now": "Import",
+        "imported_rows": "Imported reservations",
+        "import_bad_file": "Could not read the file.",
         "search_guests": "Search Guests",
         "room_history": "Room History",
         "crc_calculator": "CRC Calculator",
+        "reports": "Reports",
+        "reports_hint": "Room-nights sold, revenue (tariff + tax), ADR, RevPAR and occupancy. No-shows are not counted.",
+        "report_period": "Group by",
+        "period_day": "Day",
+        "period_week": "Week",
+        "period_month": "Month",
+        "room_nights": "Room-nights",
+        "available_nights": "Available room-nights",
+        "guests_per_day": "Guests per night",
+        "revenue": "Revenue (USD)",
+        "revenue_crc": "Revenue (CRC)",
+        "adr": "ADR (USD)",
+        "revpar": "RevPAR (USD)",
         "settings": "Settings",
         "logout": "Logout",
         "today": "Today",
@@ -106,6 +183,7 @@ TEXT = {
         "confirm_delete": "Confirm Delete",
         "delete_warning": "Are you sure you want to delete this reservation?",
         "room_occupied": "Room is already occupied on these dates",
+        "stale_reservation": "Someone else changed this reservation after you opened it. The form now shows the latest version; review it and try again.",
         "date_range_error": "Check-out must be after check-in",
         "name_required": "Reservation name is required",
         "language": "Language",
@@ -146,6 +224,8 @@ TEXT = {
         "backup_created": "Backup created",
         "download_latest_backup": "Download latest backup",
         "no_backups": "No backups found yet.",
+        "backup_bytes": "bytes written",
+        "backup_mode": "Backup mode",
         "last_backup": "Last backup",
         "latest_backup": "Latest backup",
         "confirm_action": "Confirm action",
@@ -153,7 +233,20 @@ TEXT = {
         "audit_log": "Audit Log",
         "audit_hint": "Shows who made what changes (latest first).",
         "audit_export": "Export audit log CSV",
-        "audit_download": "Download audit CSV",
+        "audit_any": "(all)",
+        "audit_user": "User",
+        "audit_action": "Action",
+        "audit_entity": "Entity",
+        "audit_entity_id": "Entity ID",
+        "page_newer": "← Newer",
+        "page_older": "Older →",
+        "page_latest": "Latest",
+        "page_size": "Rows per page",
+        "history_reservations": "Reservations",
+        "history_summary_hint": "Totals cover the whole history, not just this page. No-shows are not counted.",
+        "export_reservations": "Export reservations CSV",
+        "date_from": "From",
+        "date_to": "To",
         "enter_username": "Enter username",
         "room_history_hint": "Pick a room number to see its reservation history (latest first).",
         "prices_admin_only": "Only admins can view/change room prices.",
@@ -169,6 +262,31 @@ TEXT = {
         "fx_last_saved": "Saved today by",
         "total_crc_title": "Total in colones (CRC)",
         "details": "Details",
+        "db_connections": "DB connections (opened / reused)",
+        "read_cache": "Read cache (hits / misses / generation)",
+        "query_timing": "Query timing",
+        "query_timing_hint": "SQL time per rerun, summed per view since the app started. "
+        "Statements over the threshold are kept with their query plan.",
+        "slow_query_ms": "Slow-query threshold (ms)",
+        "per_view_totals": "Per view",
+        "view": "View",
+        "reruns": "Reruns",
+        "statements": "Statements",
+        "sql_ms": "SQL ms",
+        "avg_ms": "Avg ms / rerun",
+        "max_ms": "Max ms",
+        "rows_read": "Rows",
+        "last_rerun": "Previous rerun",
+        "slow_queries": "Slow queries",
+        "no_slow_queries": "No slow queries recorded.",
+        "query_plan": "Plan",
+        "params_shape": "Parameters",
+        "clear_slow_queries": "Clear slow queries",
+        "reset_query_totals": "Reset totals",
+        "room_prices_saved": "Saved. Rooms changed",
+        "grid_view": "Multi-day grid",
+        "grid_days": "Days to show",
+        "grid_legend": "R = Reserved · IN = Checked In · NS = No Show · OUT = Checked Out",
     },
     "es": {
         "app_title": "Administrador del Hotel Isla Verde",
@@ -183,9 +301,36 @@ TEXT = {
         "go_to": "Ir a",
         "el_roll": "El Roll",
         "register_guests": "Registrar Huéspedes",
+        "availability": "Buscar habitación libre",
+        "free_rooms": "Habitaciones libres",
+        "use_room": "Usar habitación",
+        "bulk_import": "Importación masiva (CSV / JSON)",
+        "bulk_import_hint": "Columnas: room, guest_name, check_in, check_out, pax, tariff, tax, status, notes. "
+        "Tarifa / impuesto vacíos usan los precios de la habitación. Las filas inválidas o que se traslapan se omiten.",
+        "import_file": "Archivo",
+        "import_preview": "Filas a importar",
+        "import_rejected": "Filas rechazadas",
+        "import_reason": "Motivo",
+        "line": "Línea",
+        "import_now": "Importar",
+        "imported_rows": "Reservas importadas",
+        "import_bad_file": "No se pudo leer el archivo.",
         "search_guests": "Buscar Huéspedes",
         "room_history": "Historial de Habitación",
         "crc_calculator": "Calculadora CRC",
+        "reports": "Reportes",
+        "reports_hint": "Noches vendidas, ingresos (tarifa + impuesto), ADR, RevPAR y ocupación. No se cuentan los no-show.",
+        "report_period": "Agrupar por",
+        "period_day": "Día",
+        "period_week": "Semana",
+        "period_month": "Mes",
+        "room_nights": "Noches-habitación",
+        "available_nights": "Noches disponibles",
+        "guests_per_day": "Huéspedes por noche",
+        "revenue": "Ingresos (USD)",
+        "revenue_crc": "Ingresos (CRC)",
+        "adr": "ADR (USD)",
+        "revpar": "RevPAR (USD)",
         "settings": "Ajustes",
         "logout": "Cerrar sesión",
         "today": "Hoy",
@@ -216,6 +361,7 @@ TEXT = {
         "confirm_delete": "Confirmar Borrado",
         "delete_warning": "¿Estás seguro de que quieres borrar esta reserva?",
         "room_occupied": "La habitación ya está ocupada en estas fechas",
+        "stale_reservation": "Alguien más cambió esta reserva después de que la abriste. El formulario muestra ahora la versión más reciente; revísala e inténtalo de nuevo.",
         "date_range_error": "La salida debe ser después de la entrada",
         "name_required": "El nombre de la reserva es obligatorio",
         "language": "Idioma",
@@ -256,6 +402,8 @@ TEXT = {
         "backup_created": "Backup creado",
         "download_latest_backup": "Descargar último backup",
         "no_backups": "Aún no hay backups.",
+        "backup_bytes": "bytes escritos",
+        "backup_mode": "Modo de backup",
         "last_backup": "Último backup",
         "latest_backup": "Último backup",
         "confirm_action": "Confirmar acción",
@@ -263,7 +411,20 @@ TEXT = {
         "audit_log": "Registro de Auditoría",
         "audit_hint": "Muestra quién hizo qué cambios (lo más reciente primero).",
         "audit_export": "Exportar auditoría a CSV",
-        "audit_download": "Descargar auditoría CSV",
+        "audit_any": "(todos)",
+        "audit_user": "Usuario",
+        "audit_action": "Acción",
+        "audit_entity": "Entidad",
+        "audit_entity_id": "ID de entidad",
+        "page_newer": "← Más recientes",
+        "page_older": "Más antiguos →",
+        "page_latest": "Lo último",
+        "page_size": "Filas por página",
+        "history_reservations": "Reservas",
+        "history_summary_hint": "Los totales cubren todo el historial, no solo esta página. No se cuentan los no-show.",
+        "export_reservations": "Exportar reservas a CSV",
+        "date_from": "Desde",
+        "date_to": "Hasta",
         "enter_username": "Ingrese usuario",
         "room_history_hint": "Elige una habitación para ver su historial (lo más reciente primero).",
         "prices_admin_only": "Solo admins pueden ver/cambiar precios.",
@@ -279,6 +440,31 @@ TEXT = {
         "fx_last_saved": "Guardado hoy por",
         "total_crc_title": "Total en colones (CRC)",
         "details": "Detalles",
+        "db_connections": "Conexiones BD (abiertas / reutilizadas)",
+        "read_cache": "Caché de lectura (aciertos / fallos / generación)",
+        "query_timing": "Tiempos de consultas",
+        "query_timing_hint": "Tiempo SQL por recarga, sumado por vista desde que inició la app. "
+        "Las consultas sobre el umbral se guardan con su plan.",
+        "slow_query_ms": "Umbral de consulta lenta (ms)",
+        "per_view_totals": "Por vista",
+        "view": "Vista",
+        "reruns": "Recargas",
+        "statements": "Consultas",
+        "sql_ms": "ms SQL",
+        "avg_ms": "ms prom. / recarga",
+        "max_ms": "ms máx.",
+        "rows_read": "Filas",
+        "last_rerun": "Recarga anterior",
+        "slow_queries": "Consultas lentas",
+        "no_slow_queries": "No hay consultas lentas registradas.",
+        "query_plan": "Plan",
+        "params_shape": "Parámetros",
+        "clear_slow_queries": "Borrar consultas lentas",
+        "reset_query_totals": "Reiniciar totales",
+        "room_prices_saved": "Guardado. Habitaciones cambiadas",
+        "grid_view": "Cuadrícula de varios días",
+        "grid_days": "Días a mostrar",
+        "grid_legend": "R = Reservado · IN = Registrado · NS = No Show · OUT = Salida",
     },
 }
 
@@ -291,47 +477,6 @@ def t(key: str) -> str:
 # ============================================================
 # HELPERS
 # ============================================================
-def now_utc() -> str:
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-
-
-def iso(d: date) -> str:
-    return d.isoformat()
-
-
-def parse_iso(s: str) -> date:
-    try:
-        return date.fromisoformat(str(s)[:10])
-    except Exception:
-        return date.today()
-
-
-def nights(ci: date, co: date) -> int:
-    try:
-        return max(0, (co - ci).days)
-    except Exception:
-        return 0
-
-
-def normalize_guest_name(name: str) -> str:
-    return " ".join((name or "").strip().split())
-
-
-def safe_float(x, default: float = 0.0) -> float:
-    try:
-        return float(x)
-    except Exception:
-        return default
-
-
-def fmt_money(amount: float, currency: str) -> str:
-    sym = CURRENCY_SYMBOL.get(currency, "")
-    try:
-        return f"{sym}{float(amount):,.2f}"
-    except Exception:
-        return f"{sym}{amount}"
-
-
 def current_user() -> str:
     return st.session_state.get("user", "unknown") or "unknown"
 
@@ -350,680 +495,212 @@ def status_display(db_status: str) -> str:
     return STATUS_LABEL.get(db_status, db_status)
 
 
-def calc_total_usd(tariff_usd: float, tax_usd: float, nn: int) -> float:
-    try:
-        return max(0.0, (float(tariff_usd) + float(tax_usd)) * int(nn))
-    except Exception:
-        return 0.0
+set_actor_provider(lambda: (current_user(), current_role()))
+
+logger = logging.getLogger("hotel")
 
 
-def usd_to_crc(usd: float, fx: float) -> Optional[float]:
-    if fx <= 0:
-        return None
-    return float(usd) * float(fx)
+def log_write_failure(future):
+    """Done-callback for writes nobody waits on (login/logout/backup audit rows):
+    log the error instead of dropping it with the future."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("background write failed", exc_info=future.exception())
 
 
 # ============================================================
-# DB
+# STARTUP / BACKUPS
 # ============================================================
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    conn.execute("PRAGMA journal_mode = WAL;")
-    conn.execute("PRAGMA synchronous = NORMAL;")
-    conn.execute("PRAGMA busy_timeout = 5000;")
-    return conn
-
-
-@contextmanager
-def db():
-    conn = _connect()
-    try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
-
-
-def table_exists(conn: sqlite3.Connection, table: str) -> bool:
-    row = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name=?;",
-        (table,),
-    ).fetchone()
-    return row is not None
-
-
-def column_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
-    rows = conn.execute(f"PRAGMA table_info({table});").fetchall()
-    return any(r["name"] == col for r in rows)
-
-
-def ensure_column(conn: sqlite3.Connection, table: str, col_def_sql: str, col_name: str):
-    if table_exists(conn, table) and not column_exists(conn, table, col_name):
-        conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_def_sql};")
-
-
-def init_db():
-    with db() as conn:
-        # rooms include default pricing (USD)
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS rooms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                number TEXT NOT NULL UNIQUE,
-                default_tariff REAL DEFAULT 0,
-                default_tax REAL DEFAULT 0
-            );
-            """
-        )
-
-        # reservations store USD tariff & tax
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS reservations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_id INTEGER NOT NULL,
-                guest_name TEXT NOT NULL,
-                status TEXT NOT NULL,
-                check_in TEXT NOT NULL,
-                check_out TEXT NOT NULL,
-                notes TEXT DEFAULT "",
-                num_guests INTEGER DEFAULT 1,
-                tariff REAL DEFAULT 0,
-                tax REAL DEFAULT 0,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                FOREIGN KEY(room_id) REFERENCES rooms(id) ON DELETE CASCADE
-            );
-            """
-        )
-
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts TEXT NOT NULL,
-                user TEXT NOT NULL,
-                role TEXT NOT NULL,
-                action TEXT NOT NULL,
-                entity TEXT NOT NULL,
-                entity_id INTEGER,
-                details TEXT
-            );
-            """
-        )
-
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            );
-            """
-        )
-
-        # daily exchange rate table
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS fx_daily (
-                day TEXT PRIMARY KEY,
-                fx_usd_crc REAL NOT NULL,
-                ts TEXT NOT NULL,
-                user TEXT NOT NULL,
-                role TEXT NOT NULL
-            );
-            """
-        )
-
-        # migrations for old DBs
-        ensure_column(conn, "rooms", "default_tariff REAL DEFAULT 0", "default_tariff")
-        ensure_column(conn, "rooms", "default_tax REAL DEFAULT 0", "default_tax")
-        ensure_column(conn, "reservations", "tariff REAL DEFAULT 0", "tariff")
-        ensure_column(conn, "reservations", "tax REAL DEFAULT 0", "tax")
+def get_latest_backup_name() -> str:
+    p = get_latest_backup_path()
+    return os.path.basename(p) if p else t("no_backups")
 
 
-def get_setting(key: str, default: str) -> str:
-    with db() as conn:
-        row = conn.execute("SELECT value FROM settings WHERE key=?;", (key,)).fetchone()
-        return str(row["value"]) if row else default
+@st.cache_resource
+def init_once():
+    bootstrap()
+    return True
 
 
-def set_setting(key: str, value: str):
-    with db() as conn:
-        conn.execute(
-            "INSERT INTO settings(key,value) VALUES(?,?) "
-            "ON CONFLICT(key) DO UPDATE SET value=excluded.value;",
-            (key, str(value)),
-        )
+@st.cache_data(show_spinner=False)
+def daily_backup_once(day_iso: str) -> str:
+    return run_backup(force=False)["path"] or ""
 
 
-def default_room_numbers() -> List[str]:
-    nums: List[int] = []
-    nums += list(range(101, 108))
-    nums += list(range(201, 212))
-    nums += list(range(214, 220))
-    nums += list(range(221, 229))
-    nums += list(range(301, 309))
-    return [str(n) for n in nums]
-
-
-def seed_rooms_if_empty():
-    with db() as conn:
-        c = int(conn.execute("SELECT COUNT(*) AS c FROM rooms;").fetchone()["c"])
-        if c == 0:
-            for num in default_room_numbers():
-                conn.execute(
-                    "INSERT OR IGNORE INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
-                    (num, 0.0, 0.0),
-                )
+def csv_download_button(label: str, make_chunks, file_name: str, key: str):
+    """Download button whose CSV is only produced when clicked.
 
+    The export is streamed from its own connection into a temporary file,
+    so the query never holds the whole result; the button itself still
+    hands Streamlit the finished file as bytes, so the download is not
+    streamed to the browser.
+    """
 
-def log_audit(action: str, entity: str, entity_id: Optional[int] = None, details: str = ""):
-    with db() as conn:
-        conn.execute(
-            """
-            INSERT INTO audit_log(ts, user, role, action, entity, entity_id, details)
-            VALUES(?,?,?,?,?,?,?);
-            """,
-            (now_utc(), current_user(), current_role(), action, entity, entity_id, details),
-        )
+    def build() -> bytes:
+        with tempfile.TemporaryFile() as f:
+            for chunk in make_chunks():
+                f.write(chunk)
+            f.seek(0)
+            return f.read()
 
+    st.download_button(label=label, data=build, file_name=file_name, mime="text/csv", key=key)
 
-# ============================================================
-# DAILY FX (saved per day; tomorrow is empty again)
-# ============================================================
-def get_fx_for_day(day: date) -> Optional[sqlite3.Row]:
-    with db() as conn:
-        return conn.execute(
-            "SELECT day, fx_usd_crc, ts, user, role FROM fx_daily WHERE day=?;",
-            (iso(day),),
-        ).fetchone()
-
-
-def get_today_fx_value() -> float:
-    row = get_fx_for_day(date.today())
-    if not row:
-        return 0.0
-    return max(0.0, safe_float(row["fx_usd_crc"], 0.0))
-
-
-def save_today_fx(fx: float):
-    fx = max(0.0, float(fx))
-    today = iso(date.today())
-    with db() as conn:
-        conn.execute(
-            """
-            INSERT INTO fx_daily(day, fx_usd_crc, ts, user, role)
-            VALUES(?,?,?,?,?)
-            ON CONFLICT(day) DO UPDATE SET
-                fx_usd_crc=excluded.fx_usd_crc,
-                ts=excluded.ts,
-                user=excluded.user,
-                role=excluded.role;
-            """,
-            (today, fx, now_utc(), current_user(), current_role()),
-        )
-    log_audit("UPDATE", "fx_daily", None, f"day={today}; fx_usd_crc={fx:.2f}")
 
+def read_file_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
 
-# ============================================================
-# BACKUPS
-# ============================================================
-def ensure_backup_dir():
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-
-
-def cleanup_old_backups(keep_days: int = BACKUP_RETENTION_DAYS):
-    ensure_backup_dir()
-    cutoff = date.today() - timedelta(days=keep_days)
-    for path in glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db")):
-        filename = os.path.basename(path)
-        try:
-            stamp = filename.replace("hotel_", "").replace(".db", "")
-            d = date.fromisoformat(stamp)
-        except Exception:
-            continue
-        if d < cutoff:
-            try:
-                os.remove(path)
-            except Exception:
-                pass
-
-
-def create_backup(force: bool = False) -> Optional[str]:
-    ensure_backup_dir()
-    today = date.today().isoformat()
-    final_path = os.path.join(BACKUP_DIR, f"hotel_{today}.db")
-    tmp_path = final_path + ".tmp"
-
-    if os.path.exists(final_path) and not force:
-        return final_path
 
+def restored_backup_bytes() -> bytes:
+    """The newest restore point rebuilt into a scratch file; called on click."""
+    fd, tmp_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
     try:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-    except Exception:
-        pass
+        restore_backup(tmp_path)
+        return read_file_bytes(tmp_path)
+    finally:
+        os.remove(tmp_path)
 
-    with db() as conn:
-        bconn = sqlite3.connect(tmp_path)
-        try:
-            conn.backup(bconn)
-            bconn.commit()
-        finally:
-            bconn.close()
 
-    os.replace(tmp_path, final_path)
-    cleanup_old_backups()
-    return final_path
+# reservation_frame() column kinds, by column name
+FRAME_DATE_COLUMNS = ("check_in", "check_out")
+FRAME_COUNT_COLUMNS = ("id", "reservation_id", "nights", "num_guests")
+FRAME_USD_COLUMNS = ("tariff", "tax", "tariff_usd", "tax_usd", "total_usd")
 
 
-def get_latest_backup_path() -> Optional[str]:
-    ensure_backup_dir()
-    backups = sorted(glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db")))
-    return backups[-1] if backups else None
+def reservation_frame(rows, crc: bool = False) -> pd.DataFrame:
+    """Reservation rows (sqlite Rows or dicts) as typed columns, one operation per column.
 
+    Dates become datetime64, counts Int64 and money float, so the table sorts
+    numerically; status carries its display label. crc adds total_crc: the
+    stay total at the check-in day's rate. Formatting is left to
+    reservation_column_config().
+    """
+    if not rows:
+        return pd.DataFrame()
+    if isinstance(rows[0], dict):
+        df = pd.DataFrame.from_records(rows)
+    else:
+        df = pd.DataFrame.from_records(rows, columns=rows[0].keys())
+    for col in df.columns:
+        if col in FRAME_DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif col in FRAME_COUNT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif col in FRAME_USD_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    if "status" in df.columns:
+        df["status"] = df["status"].map({s: status_display(s) for s in df["status"].unique()})
+    if crc:
+        df["total_crc"] = get_fx_series().to_crc(df["check_in"].to_numpy(), df["total_usd"].to_numpy())
+    return df
+
+
+def reservation_column_config(labels: dict, widths: Optional[dict] = None) -> dict:
+    """column_config for reservation_frame() columns: label per column, format by kind."""
+    widths = widths or {}
+    config = {}
+    for col, label in labels.items():
+        width = widths.get(col)
+        if col in FRAME_DATE_COLUMNS:
+            config[col] = st.column_config.DateColumn(label, format="YYYY-MM-DD", width=width)
+        elif col in FRAME_COUNT_COLUMNS:
+            config[col] = st.column_config.NumberColumn(label, format="%d", width=width)
+        elif col in FRAME_USD_COLUMNS:
+            config[col] = st.column_config.NumberColumn(label, format="$%.2f", width=width)
+        elif col == "total_crc":
+            config[col] = st.column_config.NumberColumn(label, format="₡%.2f", width=width)
+        else:
+            config[col] = st.column_config.TextColumn(label, width=width)
+    return config
+
+
+HISTORY_PAGE_SIZES = [25, 50, 100, 200]
+
+
+def keyset_page(state_key: str, scope, fetch):
+    """One page from fetch(before=..., after=...) -> (rows, more), newest first.
+
+    The cursor lives in session_state[state_key] and only makes sense for the
+    scope (filters, selection, page size) it was taken under: it is dropped
+    when scope changes. Returns (rows, has_newer, has_older).
+    """
+    if st.session_state.get(f"{state_key}_scope") != scope:
+        st.session_state[f"{state_key}_scope"] = scope
+        st.session_state[state_key] = None
+    cursor = st.session_state.get(state_key)
+    if cursor and cursor[0] == "after":
+        rows, more = fetch(after=cursor[1])
+        if not more:
+            # reached the newest rows: show a full newest page instead
+            st.session_state[state_key] = cursor = None
+            rows, more = fetch()
+        return rows, cursor is not None, cursor is not None or more
+    rows, more = fetch(before=cursor[1] if cursor else None)
+    return rows, cursor is not None, more
+
+
+def keyset_pager(state_key: str, rows, has_newer: bool, has_older: bool, cursor_of):
+    """Latest / Newer / Older buttons for a keyset_page(); cursor_of(row) is its key."""
+    p1, p2, p3 = st.columns(3)
+    with p1:
+        if st.button(t("page_latest"), key=f"{state_key}_latest", disabled=not has_newer, use_container_width=True):
+            st.session_state[state_key] = None
+            st.rerun()
+    with p2:
+        if st.button(t("page_newer"), key=f"{state_key}_newer", disabled=not has_newer, use_container_width=True):
+            st.session_state[state_key] = ("after", cursor_of(rows[0]))
+            st.rerun()
+    with p3:
+        if st.button(t("page_older"), key=f"{state_key}_older", disabled=not (has_older and rows), use_container_width=True):
+            st.session_state[state_key] = ("before", cursor_of(rows[-1]))
+            st.rerun()
 
-def get_latest_backup_name() -> str:
-    p = get_latest_backup_path()
-    return os.path.basename(p) if p else t("no_backups")
 
+def history_cursor(row):
+    return (row["check_in"], int(row["id"]))
 
-@st.cache_resource
-def init_once():
-    init_db()
-    seed_rooms_if_empty()
-    return True
 
+def history_frame(rows) -> pd.DataFrame:
+    """A room / guest history page, with the notes of just these rows."""
+    df = reservation_frame(rows, crc=True)
+    df["notes"] = df["id"].map(get_reservation_notes([int(r["id"]) for r in rows]))
+    return df
 
-@st.cache_data(show_spinner=False)
-def daily_backup_once(day_iso: str) -> str:
-    p = create_backup(force=False)
-    return p or ""
 
+def history_summary(summary: dict):
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric(t("history_reservations"), f"{summary['reservations']:,}")
+    m2.metric(t("num_nights"), f"{summary['nights']:,}")
+    m3.metric(f"{t('total')} (USD)", fmt_money(summary["total_usd"], "USD"))
+    m4.metric(f"{t('total')} (CRC)", "—" if summary["total_crc"] is None else fmt_money(summary["total_crc"], "CRC"))
+    st.caption(t("history_summary_hint"))
 
-# ============================================================
-# DATA FUNCTIONS
-# ============================================================
-def get_rooms() -> List[sqlite3.Row]:
-    with db() as conn:
-        return conn.execute(
-            "SELECT id, number, default_tariff, default_tax FROM rooms ORDER BY number;"
-        ).fetchall()
-
-
-def get_room_by_number(room_number: str) -> Optional[sqlite3.Row]:
-    rn = str(room_number).strip()
-    if not rn:
-        return None
-    with db() as conn:
-        return conn.execute(
-            "SELECT id, number, default_tariff, default_tax FROM rooms WHERE number=?;",
-            (rn,),
-        ).fetchone()
-
-
-def update_room_defaults(room_id: int, default_tariff_usd: float, default_tax_usd: float):
-    with db() as conn:
-        conn.execute(
-            "UPDATE rooms SET default_tariff=?, default_tax=? WHERE id=?;",
-            (float(default_tariff_usd), float(default_tax_usd), int(room_id)),
-        )
-    log_audit(
-        "UPDATE",
-        "room",
-        int(room_id),
-        f"Updated room defaults (USD): tariff={float(default_tariff_usd):.2f}, tax={float(default_tax_usd):.2f}",
-    )
 
-
-def add_room(num: str):
-    num = str(num).strip()
-    if not num:
-        raise ValueError("Empty room number")
-    with db() as conn:
-        conn.execute(
-            "INSERT INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
-            (num, 0.0, 0.0),
-        )
-        rid = int(conn.execute("SELECT id FROM rooms WHERE number=?;", (num,)).fetchone()["id"])
-    log_audit("CREATE", "room", rid, f"Added room {num}")
-
-
-def delete_room(room_id: int):
-    with db() as conn:
-        row = conn.execute("SELECT number FROM rooms WHERE id=?;", (int(room_id),)).fetchone()
-        room_number = row["number"] if row else ""
-        conn.execute("DELETE FROM rooms WHERE id=?;", (int(room_id),))
-    log_audit("DELETE", "room", int(room_id), f"Deleted room {room_number}")
-
-
-def get_reservations_for_date(selected_date: date) -> List[sqlite3.Row]:
-    with db() as conn:
-        return conn.execute(
-            """
-            SELECT r.id, rm.number AS room_number, r.guest_name, r.num_guests,
-                   r.tariff, r.tax,
-                   r.notes, r.status, r.check_in, r.check_out
-            FROM reservations r
-            JOIN rooms rm ON r.room_id = rm.id
-            WHERE r.check_in <= ? AND ? < r.check_out
-            ORDER BY rm.number;
-            """,
-            (iso(selected_date), iso(selected_date)),
-        ).fetchall()
-
-
-def get_all_rooms_with_status(selected_date: date) -> List[Dict]:
-    rooms = get_rooms()
-    reservations = get_reservations_for_date(selected_date)
-
-    reservation_map: Dict[str, dict] = {}
-    for res in reservations:
-        room_number = str(res["room_number"])
-        reservation_map[room_number] = {
-            "id": int(res["id"]),
-            "guest_name": res["guest_name"] or "",
-            "num_guests": int(res["num_guests"] or 0),
-            "tariff_usd": float(res["tariff"] or 0.0),
-            "tax_usd": float(res["tax"] or 0.0),
-            "notes": res["notes"] or "",
-            "status": res["status"],
-            "check_in": parse_iso(res["check_in"]),
-            "check_out": parse_iso(res["check_out"]),
-        }
-
-    room_status: List[Dict] = []
-    for room in rooms:
-        room_number = str(room["number"])
-        if room_number in reservation_map:
-            res = reservation_map[room_number]
-            room_status.append(
-                {
-                    "room_number": room_number,
-                    "guest_name": res["guest_name"],
-                    "num_guests": res["num_guests"],
-                    "tariff_usd": res["tariff_usd"],
-                    "tax_usd": res["tax_usd"],
-                    "notes": res["notes"],
-                    "status": res["status"],
-                    "reservation_id": res["id"],
-                    "occupied": True,
-                    "check_in": res["check_in"],
-                    "check_out": res["check_out"],
-                }
-            )
-        else:
-            room_status.append(
-                {
-                    "room_number": room_number,
-                    "guest_name": "",
-                    "num_guests": 0,
-                    "tariff_usd": 0.0,
-                    "tax_usd": 0.0,
-                    "notes": "",
-                    "status": "available",
-                    "reservation_id": None,
-                    "occupied": False,
-                    "check_in": None,
-                    "check_out": None,
-                }
-            )
-    return room_status
-
-
-def get_reservation(res_id: int) -> Optional[sqlite3.Row]:
-    with db() as conn:
-        return conn.execute(
-            """
-            SELECT r.id, rm.number AS room_number, r.guest_name, r.status, r.check_in, r.check_out,
-                   r.notes, r.num_guests, r.tariff, r.tax
-            FROM reservations r
-            JOIN rooms rm ON r.room_id = rm.id
-            WHERE r.id = ?;
-            """,
-            (int(res_id),),
-        ).fetchone()
-
-
-def save_reservation(
-    room_number: str,
-    guest_name: str,
-    check_in: date,
-    check_out: date,
-    num_guests: int,
-    tariff_usd: float,
-    tax_usd: float,
-    notes: str,
-    status: str,
-    reservation_id: Optional[int] = None,
-) -> bool:
-    room_number = str(room_number).strip()
-    guest_name = normalize_guest_name(guest_name)
-    status = status if status in VALID_STATUSES else "reserved"
-
-    if not room_number or not guest_name:
-        return False
-    if check_out <= check_in:
-        return False
-
-    with db() as conn:
-        room_row = conn.execute("SELECT id FROM rooms WHERE number=?;", (room_number,)).fetchone()
-        if not room_row:
-            return False
-        room_id = int(room_row["id"])
-
-        params = {"room_id": room_id, "new_ci": iso(check_in), "new_co": iso(check_out)}
-        if reservation_id is not None:
-            params["rid"] = int(reservation_id)
-            conflict = conn.execute(
-                """
-                SELECT id FROM reservations
-                WHERE room_id = :room_id
-                  AND status NOT IN ('noshow', 'checkedout')
-                  AND id != :rid
-                  AND check_in < :new_co
-                  AND :new_ci < check_out
-                LIMIT 1;
-                """,
-                params,
-            ).fetchone()
-        else:
-            conflict = conn.execute(
-                """
-                SELECT id FROM reservations
-                WHERE room_id = :room_id
-                  AND status NOT IN ('noshow', 'checkedout')
-                  AND check_in < :new_co
-                  AND :new_ci < check_out
-                LIMIT 1;
-                """,
-                params,
-            ).fetchone()
-
-        if conflict:
-            return False
-
-        tstamp = now_utc()
-        if reservation_id is not None:
-            conn.execute(
-                """
-                UPDATE reservations
-                SET guest_name=?, status=?, check_in=?, check_out=?, notes=?,
-                    num_guests=?, tariff=?, tax=?, updated_at=?
-                WHERE id=?;
-                """,
-                (
-                    guest_name,
-                    status,
-                    iso(check_in),
-                    iso(check_out),
-                    notes or "",
-                    int(num_guests),
-                    float(tariff_usd),
-                    float(tax_usd),
-                    tstamp,
-                    int(reservation_id),
-                ),
-            )
-            action = "UPDATE"
-            rid = int(reservation_id)
-        else:
-            conn.execute(
-                """
-                INSERT INTO reservations(room_id, guest_name, status, check_in, check_out,
-                                         notes, num_guests, tariff, tax, created_at, updated_at)
-                VALUES(?,?,?,?,?,?,?,?,?,?,?);
-                """,
-                (
-                    room_id,
-                    guest_name,
-                    status,
-                    iso(check_in),
-                    iso(check_out),
-                    notes or "",
-                    int(num_guests),
-                    float(tariff_usd),
-                    float(tax_usd),
-                    tstamp,
-                    tstamp,
-                ),
-            )
-            rid = int(conn.execute("SELECT last_insert_rowid() AS id;").fetchone()["id"])
-            action = "CREATE"
-
-    nn = nights(check_in, check_out)
-    total_usd = calc_total_usd(float(tariff_usd), float(tax_usd), nn)
-    log_audit(
-        action,
-        "reservation",
-        rid,
-        f"room={room_number}; name={guest_name}; status={status}; ci={iso(check_in)}; co={iso(check_out)}; "
-        f"pax={int(num_guests)}; tariff_usd={float(tariff_usd):.2f}; tax_usd={float(tax_usd):.2f}; "
-        f"nights={nn}; total_usd={total_usd:.2f}",
+def history_page_size() -> int:
+    return st.selectbox(
+        t("page_size"),
+        HISTORY_PAGE_SIZES,
+        index=HISTORY_PAGE_SIZES.index(HISTORY_PAGE_SIZE),
+        key="history_page_size",
     )
-    return True
 
 
-def delete_reservation(res_id: int):
-    row = get_reservation(int(res_id))
-    details = ""
-    if row:
-        details = (
-            f"room={row['room_number']}; name={row['guest_name']}; ci={row['check_in']}; "
-            f"co={row['check_out']}; status={row['status']}"
-        )
-    with db() as conn:
-        conn.execute("DELETE FROM reservations WHERE id=?;", (int(res_id),))
-    log_audit("DELETE", "reservation", int(res_id), details)
-
-
-def search_guests(query: str, limit: int = 10) -> List[str]:
-    if not query or len(query.strip()) < 2:
-        return []
-    q = query.strip()
-    with db() as conn:
-        rows = conn.execute(
-            """
-            SELECT DISTINCT guest_name
-            FROM reservations
-            WHERE LOWER(guest_name) LIKE LOWER(?)
-            ORDER BY guest_name
-            LIMIT ?;
-            """,
-            (f"%{q}%", int(limit)),
-        ).fetchall()
-        return [str(r["guest_name"]) for r in rows]
-
-
-def get_guest_reservations(guest_name: str) -> List[sqlite3.Row]:
-    with db() as conn:
-        return conn.execute(
-            """
-            SELECT r.id, rm.number AS room_number, r.status, r.check_in, r.check_out,
-                   r.notes, r.num_guests, r.tariff, r.tax, r.updated_at
-            FROM reservations r
-            JOIN rooms rm ON r.room_id = rm.id
-            WHERE r.guest_name = ?
-            ORDER BY r.check_in DESC;
-            """,
-            (guest_name,),
-        ).fetchall()
-
-
-def get_room_reservations(room_number: str, limit: int = 500) -> List[sqlite3.Row]:
-    rn = str(room_number).strip()
-    if not rn:
-        return []
-    with db() as conn:
-        return conn.execute(
-            """
-            SELECT r.id, rm.number AS room_number, r.guest_name, r.status, r.check_in, r.check_out,
-                   r.notes, r.num_guests, r.tariff, r.tax, r.updated_at
-            FROM reservations r
-            JOIN rooms rm ON r.room_id = rm.id
-            WHERE rm.number = ?
-            ORDER BY r.check_in DESC
-            LIMIT ?;
-            """,
-            (rn, int(limit)),
-        ).fetchall()
-
-
-def get_dashboard_stats(selected_date: date) -> Dict[str, float]:
-    with db() as conn:
-        total_rooms = int(conn.execute("SELECT COUNT(*) AS c FROM rooms;").fetchone()["c"])
-        occupied_rooms = int(
-            conn.execute(
-                """
-                SELECT COUNT(DISTINCT r.room_id) AS c
-                FROM reservations r
-                WHERE r.check_in <= ? AND ? < r.check_out
-                  AND r.status NOT IN ('noshow', 'checkedout');
-                """,
-                (iso(selected_date), iso(selected_date)),
-            ).fetchone()["c"]
-        )
-        total_guests = int(
-            conn.execute(
-                """
-                SELECT COALESCE(SUM(r.num_guests), 0) AS c
-                FROM reservations r
-                WHERE r.check_in <= ? AND ? < r.check_out
-                  AND r.status NOT IN ('noshow', 'checkedout');
-                """,
-                (iso(selected_date), iso(selected_date)),
-            ).fetchone()["c"]
-        )
-    occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0.0
-    return {
-        "total_rooms": float(total_rooms),
-        "occupied_rooms": float(occupied_rooms),
-        "total_guests": float(total_guests),
-        "occupancy_rate": float(occupancy_rate),
-    }
-
-
-def get_audit_log(limit: int = 300) -> pd.DataFrame:
-    with db() as conn:
-        rows = conn.execute(
-            """
-            SELECT ts, user, role, action, entity, entity_id, details
-            FROM audit_log
-            ORDER BY id DESC
-            LIMIT ?;
-            """,
-            (int(limit),),
-        ).fetchall()
+def audit_log_frame(rows) -> pd.DataFrame:
     if not rows:
-        return pd.DataFrame(columns=["ts", "user", "role", "action", "entity", "entity_id", "details"])
+        return pd.DataFrame(columns=["id", "ts", "user", "role", "action", "entity", "entity_id", "details"])
     return pd.DataFrame([dict(r) for r in rows])
 
 
+def select_elroll_reservation(res_id: Optional[int]):
+    """Select a reservation in El Roll together with the version its edit form
+    sends back; None clears both. Keeping the current row keeps its version."""
+    if res_id is not None and res_id == st.session_state.get("elroll_selected_res_id"):
+        return
+    row = get_reservation(int(res_id)) if res_id is not None else None
+    st.session_state.elroll_selected_res_id = int(row["id"]) if row else None
+    st.session_state.elroll_loaded_version = int(row["version"]) if row else None
+
+
 # ============================================================
 # STREAMLIT APP START
 # ============================================================
@@ -1032,6 +709,12 @@ st.set_page_config(TEXT["en"]["app_title"], layout="wide")
 init_once()
 _ = daily_backup_once(date.today().isoformat())
 
+# time this rerun's SQL; a rerun cut short by st.rerun() / st.stop() is folded in here
+if st.session_state.get("query_log") is not None:
+    finish_query_log(st.session_state.query_log)
+    st.session_state.last_query_log = st.session_state.query_log
+st.session_state.query_log = start_query_log("login")
+
 # Session defaults
 st.session_state.setdefault("authed", False)
 st.session_state.setdefault("user", None)
@@ -1040,6 +723,7 @@ st.session_state.setdefault("selected_date", date.today())
 
 st.session_state.setdefault("register_popup", False)
 st.session_state.setdefault("elroll_selected_res_id", None)
+st.session_state.setdefault("elroll_loaded_version", None)
 st.session_state.setdefault("elroll_editor_key_n", 0)
 st.session_state.setdefault("search_last_input", "")
 st.session_state.setdefault("search_active_name", None)
@@ -1074,7 +758,9 @@ if not st.session_state.authed:
             st.session_state.authed = True
             st.session_state.user = u
             st.session_state.role = record["role"]
-            log_audit("LOGIN", "session", None, f"user={u}; role={record['role']}")
+            submit_write(
+                log_audit, "LOGIN", "session", None, f"user={u}; role={record['role']}"
+            ).add_done_callback(log_write_failure)
             st.rerun()
         else:
             st.error(t("incorrect_login"))
@@ -1091,6 +777,7 @@ view_options = [
     t("search_guests"),
     t("room_history"),
     t("crc_calculator"),
+    t("reports"),
     t("settings"),
 ]
 view = st.sidebar.radio(t("go_to"), view_options, index=0)
@@ -1101,13 +788,15 @@ VIEW_MAP = {
     t("search_guests"): "search_guests",
     t("room_history"): "room_history",
     t("crc_calculator"): "crc_calculator",
+    t("reports"): "reports",
     t("settings"): "settings",
 }
 view_key = VIEW_MAP[view]
+st.session_state.query_log.label = view_key
 
 st.sidebar.divider()
 if st.sidebar.button(t("logout")):
-    log_audit("LOGOUT", "session", None, f"user={current_user()}")
+    submit_write(log_audit, "LOGOUT", "session", None, f"user={current_user()}").add_done_callback(log_write_failure)
     st.session_state.authed = False
     st.session_state.user = None
     st.session_state.role = None
@@ -1130,7 +819,7 @@ try:
 
         today = date.today()
         today_row = get_fx_for_day(today)
-        saved_fx = get_today_fx_value()
+        saved_fx = max(0.0, float(today_row["fx_usd_crc"] or 0.0)) if today_row else 0.0
 
         # 1) Simple rate box
         with st.container(border=True):
@@ -1149,7 +838,7 @@ try:
                     if fx_input <= 0:
                         st.warning(t("fx_missing"))
                     else:
-                        save_today_fx(float(fx_input))
+                        run_write(save_today_fx, float(fx_input))
                         st.success(t("fx_saved"))
                         st.rerun()
 
@@ -1162,7 +851,7 @@ try:
                 else:
                     st.info(t("fx_missing"))
 
-        fx = get_today_fx_value()
+        fx = saved_fx
         if fx <= 0:
             st.warning(t("fx_missing"))
             st.stop()
@@ -1212,13 +901,13 @@ try:
         with col1:
             if st.button(t("prev")):
                 st.session_state.selected_date -= timedelta(days=1)
-                st.session_state.elroll_selected_res_id = None
+                select_elroll_reservation(None)
                 st.session_state.elroll_editor_key_n += 1
                 st.rerun()
         with col2:
             if st.button(t("today")):
                 st.session_state.selected_date = date.today()
-                st.session_state.elroll_selected_res_id = None
+                select_elroll_reservation(None)
                 st.session_state.elroll_editor_key_n += 1
                 st.rerun()
         with col3:
@@ -1226,7 +915,7 @@ try:
         with col4:
             if st.button(t("next")):
                 st.session_state.selected_date += timedelta(days=1)
-                st.session_state.elroll_selected_res_id = None
+                select_elroll_reservation(None)
                 st.session_state.elroll_editor_key_n += 1
                 st.rerun()
         with col5:
@@ -1237,15 +926,33 @@ try:
             )
             if new_date != st.session_state.selected_date:
                 st.session_state.selected_date = new_date
-                st.session_state.elroll_selected_res_id = None
+                select_elroll_reservation(None)
                 st.session_state.elroll_editor_key_n += 1
                 st.rerun()
 
-        rooms_status = get_all_rooms_with_status(st.session_state.selected_date)
-        available_rooms = [r["room_number"] for r in rooms_status if r["status"] == "available"]
+        g1, g2 = st.columns([1, 3])
+        with g1:
+            grid_mode = st.toggle(t("grid_view"), key="elroll_grid_mode")
+        if grid_mode:
+            with g2:
+                grid_days = st.slider(t("grid_days"), min_value=14, max_value=90, value=14, step=1)
+            occ = get_occupancy_grid(st.session_state.selected_date, grid_days)
+            labels = np.array(GRID_LABELS, dtype=object)[occ["grid"]]
+            grid_df = pd.DataFrame(
+                labels,
+                index=pd.Index(occ["rooms"], name=t("room")),
+                columns=[d.strftime("%a %d/%m") for d in occ["dates"]],
+            )
+            st.caption(t("grid_legend"))
+            st.dataframe(grid_df, use_container_width=True, height=min(35 * (len(occ["rooms"]) + 1) + 3, 800))
+            st.stop()
+
+        snapshot = get_el_roll_snapshot(st.session_state.selected_date)
+        rooms_status = snapshot["rooms"]
+        available_rooms = snapshot["available_rooms"]
         available_count = len(available_rooms)
 
-        stats = get_dashboard_stats(st.session_state.selected_date)
+        stats = snapshot["stats"]
         a, b, c, d = st.columns(4)
         with a:
             st.metric(t("total_rooms"), int(stats["total_rooms"]))
@@ -1265,89 +972,74 @@ try:
 
         st.divider()
 
-        rows = []
-        for r in rooms_status:
-            tariff_text = ""
-            tax_text = ""
-            total_text = ""
-            if r["occupied"]:
-                nn = nights(r["check_in"], r["check_out"]) if r.get("check_in") and r.get("check_out") else 0
-                tariff_text = fmt_money(float(r["tariff_usd"] or 0.0), "USD")
-                tax_text = fmt_money(float(r["tax_usd"] or 0.0), "USD")
-                total_usd = calc_total_usd(float(r["tariff_usd"] or 0.0), float(r["tax_usd"] or 0.0), nn)
-                total_text = fmt_money(total_usd, "USD") if nn > 0 else "—"
-
-            rows.append(
-                {
-                    t("room"): r["room_number"],
-                    t("reservation_name"): r["guest_name"],
-                    t("pax"): r["num_guests"] if r["num_guests"] else "",
-                    t("tariff"): tariff_text,
-                    t("tax"): tax_text,
-                    t("total"): total_text,
-                    t("observations"): r["notes"],
-                    t("status"): status_display(r["status"]),
-                    "_reservation_id": r["reservation_id"],
-                    t("select_to_edit"): False,
-                }
-            )
+        elroll_labels = {
+            "room_number": t("room"),
+            "guest_name": t("reservation_name"),
+            "num_guests": t("pax"),
+            "tariff_usd": t("tariff"),
+            "tax_usd": t("tax"),
+            "total_usd": t("total"),
+            "notes": t("observations"),
+            "status": t("status"),
+            "reservation_id": "ID",
+        }
+        df = reservation_frame(rooms_status)
 
-        if not rows:
+        if df.empty:
             st.info(t("no_results"))
         else:
-            df = pd.DataFrame(rows)
+            # free rooms and zero-night stays show blank cells, not $0.00
+            df.loc[~df["occupied"], ["tariff_usd", "tax_usd"]] = np.nan
+            df.loc[df["nights"] <= 0, "total_usd"] = np.nan
+            df.loc[df["num_guests"] <= 0, "num_guests"] = pd.NA
+            df = df[list(elroll_labels)]
+            df["select"] = False
             st.caption(t("select_row_hint"))
 
             editor_key = f"elroll_editor_{st.session_state.elroll_editor_key_n}"
+            column_config = reservation_column_config(
+                elroll_labels,
+                widths={
+                    "room_number": "small",
+                    "guest_name": "medium",
+                    "num_guests": "small",
+                    "tariff_usd": "small",
+                    "tax_usd": "small",
+                    "total_usd": "small",
+                    "notes": "large",
+                    "status": "medium",
+                    "reservation_id": "small",
+                },
+            )
+            column_config["select"] = st.column_config.CheckboxColumn(t("select_to_edit"), width="small")
             edited_df = st.data_editor(
                 df,
                 use_container_width=True,
                 hide_index=True,
-                disabled=[
-                    t("room"),
-                    t("reservation_name"),
-                    t("pax"),
-                    t("tariff"),
-                    t("tax"),
-                    t("total"),
-                    t("observations"),
-                    t("status"),
-                    "_reservation_id",
-                ],
-                column_config={
-                    t("room"): st.column_config.TextColumn(width="small"),
-                    t("reservation_name"): st.column_config.TextColumn(width="medium"),
-                    t("pax"): st.column_config.TextColumn(width="small"),
-                    t("tariff"): st.column_config.TextColumn(width="small"),
-                    t("tax"): st.column_config.TextColumn(width="small"),
-                    t("total"): st.column_config.TextColumn(width="small"),
-                    t("observations"): st.column_config.TextColumn(width="large"),
-                    t("status"): st.column_config.TextColumn(width="medium"),
-                    t("select_to_edit"): st.column_config.CheckboxColumn(width="small"),
-                    "_reservation_id": st.column_config.NumberColumn(width="small"),
-                },
+                disabled=list(elroll_labels),
+                column_config=column_config,
                 key=editor_key,
             )
 
             selected_ids = edited_df.loc[
-                (edited_df[t("select_to_edit")] == True) & (edited_df["_reservation_id"].notna()),
-                "_reservation_id",
+                edited_df["select"] & edited_df["reservation_id"].notna(),
+                "reservation_id",
             ].tolist()
-            st.session_state.elroll_selected_res_id = int(selected_ids[0]) if selected_ids else None
+            select_elroll_reservation(int(selected_ids[0]) if selected_ids else None)
 
             r1, r2 = st.columns([1, 2])
             with r1:
                 if st.button(t("clear_selection"), use_container_width=True):
-                    st.session_state.elroll_selected_res_id = None
+                    select_elroll_reservation(None)
                     st.session_state.elroll_editor_key_n += 1
                     st.rerun()
             with r2:
                 if st.button(t("export_csv"), use_container_width=True):
-                    export_df = df.drop(columns=[t("select_to_edit"), "_reservation_id"], errors="ignore")
-                    csv = export_df.to_csv(index=False).encode("utf-8")
+                    export_df = df.drop(columns=["select", "reservation_id"]).rename(columns=elroll_labels)
+                    csv_bytes = export_df.to_csv(index=False).encode("utf-8")
                     st.download_button(
                         label=t("download_csv"),
-                        data=csv,
+                        data=csv_bytes,
                         file_name=f"el_roll_{st.session_state.selected_date}.csv",
                         mime="text/csv",
                     )
@@ -1363,6 +1055,11 @@ try:
                     check_out_s = reservation_data["check_out"]
                     notes = reservation_data["notes"] or ""
                     num_guests = int(reservation_data["num_guests"] or 1)
+                    # the version the form was opened with; saving over a newer one is refused
+                    if st.session_state.elroll_loaded_version is None:
+                        # cleared by a stale save: go on from the current row
+                        st.session_state.elroll_loaded_version = int(reservation_data["version"])
+                    loaded_version = st.session_state.elroll_loaded_version
 
                     st.divider()
                     st.subheader(t("edit_from_elroll"))
@@ -1458,7 +1155,7 @@ try:
                             delete_btn = st.form_submit_button(f"🗑️ {t('delete')}")
 
                         if cancel_btn:
-                            st.session_state.elroll_selected_res_id = None
+                            select_elroll_reservation(None)
                             st.session_state.elroll_editor_key_n += 1
                             st.rerun()
 
@@ -1473,25 +1170,33 @@ try:
                                     tariff_new_usd = float(room_default_tariff)
                                     tax_new_usd = float(room_default_tax)
 
-                                ok = save_reservation(
-                                    room_number=room_number_new,
-                                    guest_name=guest_name_new,
-                                    check_in=check_in_new,
-                                    check_out=check_out_new,
-                                    num_guests=int(pax_new),
-                                    tariff_usd=float(tariff_new_usd),
-                                    tax_usd=float(tax_new_usd),
-                                    notes=notes_new,
-                                    status=status_new,
-                                    reservation_id=int(res_id),
-                                )
-                                if ok:
-                                    st.success(t("saved"))
-                                    st.session_state.elroll_selected_res_id = None
-                                    st.session_state.elroll_editor_key_n += 1
-                                    st.rerun()
+                                try:
+                                    ok = run_write(
+                                        save_reservation,
+                                        room_number=room_number_new,
+                                        guest_name=guest_name_new,
+                                        check_in=check_in_new,
+                                        check_out=check_out_new,
+                                        num_guests=int(pax_new),
+                                        tariff_usd=float(tariff_new_usd),
+                                        tax_usd=float(tax_new_usd),
+                                        notes=notes_new,
+                                        status=status_new,
+                                        reservation_id=int(res_id),
+                                        expected_version=loaded_version,
+                                    )
+                                except StaleReservationError:
+                                    # the next run reloads the form from the current row
+                                    st.session_state.elroll_loaded_version = None
+                                    st.error(t("stale_reservation"))
                                 else:
-                                    st.error(t("room_occupied"))
+                                    if ok:
+                                        st.success(t("saved"))
+                                        select_elroll_reservation(None)
+                                        st.session_state.elroll_editor_key_n += 1
+                                        st.rerun()
+                                    else:
+                                        st.error(t("room_occupied"))
 
                         if delete_btn:
                             st.session_state.delete_candidate = int(res_id)
@@ -1502,12 +1207,18 @@ try:
                         y1, y2 = st.columns(2)
                         with y1:
                             if st.button(t("confirm_delete"), type="primary"):
-                                delete_reservation(int(res_id))
-                                st.session_state.delete_candidate = None
-                                st.session_state.elroll_selected_res_id = None
-                                st.session_state.elroll_editor_key_n += 1
-                                st.success(t("deleted"))
-                                st.rerun()
+                                try:
+                                    run_write(delete_reservation, int(res_id), expected_version=loaded_version)
+                                except StaleReservationError:
+                                    st.session_state.delete_candidate = None
+                                    st.session_state.elroll_loaded_version = None
+                                    st.error(t("stale_reservation"))
+                                else:
+                                    st.session_state.delete_candidate = None
+                                    select_elroll_reservation(None)
+                                    st.session_state.elroll_editor_key_n += 1
+                                    st.success(t("deleted"))
+                                    st.rerun()
                         with y2:
                             if st.button(t("cancel")):
                                 st.session_state.delete_candidate = None
@@ -1519,18 +1230,87 @@ try:
     elif view_key == "register_guests":
         st.subheader(t("register_guests"))
 
+        # free rooms for a stay; "use room" fills the form below
+        with st.expander(t("availability"), expanded=False):
+            a1, a2 = st.columns(2)
+            with a1:
+                av_ci = st.date_input(t("checkin_date"), value=st.session_state.selected_date, key="avail_ci")
+            with a2:
+                av_co = st.date_input(
+                    t("checkout_date"), value=st.session_state.selected_date + timedelta(days=1), key="avail_co"
+                )
+            if av_co <= av_ci:
+                st.error(t("date_range_error"))
+            else:
+                free = get_available_rooms(av_ci, av_co)
+                st.caption(f"{t('free_rooms')}: {len(free)} / {len(get_rooms())}")
+                if free:
+                    st.dataframe(
+                        pd.DataFrame(free),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "room_number": st.column_config.TextColumn(t("room")),
+                            "default_tariff_usd": st.column_config.NumberColumn(f"{t('tariff')} (USD)", format="$%.2f"),
+                            "default_tax_usd": st.column_config.NumberColumn(f"{t('tax')} (USD)", format="$%.2f"),
+                            "nights": st.column_config.NumberColumn(t("num_nights"), format="%d"),
+                            "total_usd": st.column_config.NumberColumn(f"{t('total')} (USD)", format="$%.2f"),
+                        },
+                    )
+                    u1, u2 = st.columns([2, 1])
+                    with u1:
+                        pick = st.selectbox(t("room"), [r["room_number"] for r in free], key="avail_pick")
+                    with u2:
+                        st.write("")
+                        if st.button(t("use_room"), use_container_width=True):
+                            st.session_state.register_prefill = {"room": pick, "ci": av_ci, "co": av_co}
+                            st.rerun()
+
+        if is_admin():
+            with st.expander(t("bulk_import"), expanded=False):
+                st.caption(t("bulk_import_hint"))
+                upload = st.file_uploader(t("import_file"), type=["csv", "json"], key="bulk_import_file")
+                if upload is not None:
+                    try:
+                        text = upload.getvalue().decode("utf-8-sig")
+                        if upload.name.lower().endswith(".json"):
+                            import_rows, first_line = json.loads(text), 1
+                        else:
+                            import_rows, first_line = list(csv.DictReader(io.StringIO(text))), 2
+                    except (UnicodeDecodeError, ValueError):
+                        import_rows = None
+                        st.error(t("import_bad_file"))
+                    if import_rows is not None:
+                        # the preview only reads: it stays off the write queue
+                        preview = import_reservations(import_rows, first_line=first_line, dry_run=True)
+                        st.caption(f"{t('import_preview')}: {preview['imported']}")
+                        if preview["rejected"]:
+                            st.caption(f"{t('import_rejected')}: {len(preview['rejected'])}")
+                            st.dataframe(
+                                pd.DataFrame(preview["rejected"], columns=[t("line"), t("import_reason")]),
+                                use_container_width=True,
+                                hide_index=True,
+                            )
+                        if preview["imported"] and st.button(t("import_now"), type="primary"):
+                            report = run_write(import_reservations, import_rows, first_line=first_line)
+                            st.success(f"{t('imported_rows')}: {report['imported']}")
+
+        prefill = st.session_state.get("register_prefill") or {}
         with st.form("reservation_form"):
             rooms = get_rooms()
             room_options = [str(r["number"]) for r in rooms]
-            room_number = st.selectbox(t("room"), room_options, index=0)
+            room_index = room_options.index(prefill["room"]) if prefill.get("room") in room_options else 0
+            room_number = st.selectbox(t("room"), room_options, index=room_index)
 
             reservation_name = st.text_input(t("reservation_name"), value="")
 
+            default_ci = prefill.get("ci", st.session_state.selected_date)
+            default_co = prefill.get("co", default_ci + timedelta(days=1))
             col1, col2 = st.columns(2)
             with col1:
-                check_in = st.date_input(t("checkin_date"), value=st.session_state.selected_date)
+                check_in = st.date_input(t("checkin_date"), value=default_ci)
             with col2:
-                check_out = st.date_input(t("checkout_date"), value=st.session_state.selected_date + timedelta(days=1))
+                check_out = st.date_input(t("checkout_date"), value=default_co)
 
             nn = nights(check_in, check_out)
             st.caption(f"{t('num_nights')}: {nn}")
@@ -1605,7 +1385,8 @@ try:
                         tariff_usd = float(room_default_tariff)
                         tax_usd = float(room_default_tax)
 
-                    ok = save_reservation(
+                    ok = run_write(
+                        save_reservation,
                         room_number=room_number,
                         guest_name=reservation_name,
                         check_in=check_in,
@@ -1618,6 +1399,7 @@ try:
                     )
                     if ok:
                         st.session_state.register_popup = True
+                        st.session_state.pop("register_prefill", None)
                         st.rerun()
                     else:
                         st.error(t("room_occupied"))
@@ -1634,7 +1416,7 @@ try:
                 if st.button(t("add_room")):
                     if new_room.strip():
                         try:
-                            add_room(new_room.strip())
+                            run_write(add_room, new_room.strip())
                             st.success(t("room_added"))
                             st.rerun()
                         except sqlite3.IntegrityError:
@@ -1672,13 +1454,15 @@ try:
                 )
 
                 if st.button("💾 " + t("save_room_prices"), type="primary"):
-                    for _, row in edited.iterrows():
-                        update_room_defaults(
-                            room_id=int(row["id"]),
-                            default_tariff_usd=float(row["default_tariff_usd"] or 0.0),
-                            default_tax_usd=float(row["default_tax_usd"] or 0.0),
+                    prices = list(
+                        zip(
+                            edited["id"].astype(int),
+                            edited["default_tariff_usd"].fillna(0.0).astype(float),
+                            edited["default_tax_usd"].fillna(0.0).astype(float),
                         )
-                    st.success("Saved.")
+                    )
+                    changed = run_write(update_room_defaults_bulk, prices)
+                    st.success(f"{t('room_prices_saved')}: {changed}")
                     st.rerun()
 
                 st.divider()
@@ -1691,7 +1475,7 @@ try:
                         st.write(f"• {room_number}")
                     with b:
                         if st.button("🗑️", key=f"del_room_{room_id}"):
-                            delete_room(room_id)
+                            run_write(delete_room, room_id)
                             st.success(t("room_deleted"))
                             st.rerun()
         else:
@@ -1732,46 +1516,49 @@ try:
         active_name = st.session_state.search_active_name
         if active_name and len(active_name.strip()) >= 2:
             guest_name = active_name.strip()
-            reservations = get_guest_reservations(guest_name)
 
             st.divider()
             st.subheader(f"{t('results')}: {guest_name}")
+            page_size = history_page_size()
+            reservations, has_newer, has_older = keyset_page(
+                "guest_history_cursor",
+                (guest_name, page_size),
+                lambda before=None, after=None: get_guest_reservations(
+                    guest_name, before=before, after=after, limit=page_size
+                ),
+            )
 
             if reservations:
-                table_data = []
-                for res in reservations:
-                    ci = parse_iso(res["check_in"])
-                    co = parse_iso(res["check_out"])
-                    nn = nights(ci, co)
-                    total_usd = calc_total_usd(float(res["tariff"] or 0.0), float(res["tax"] or 0.0), nn)
-
-                    table_data.append(
-                        {
-                            "Room": str(res["room_number"]),
-                            "Check-in": ci,
-                            "Check-out": co,
-                            "Nights": nn,
-                            "PAX": int(res["num_guests"] or 0),
-                            "Tariff (USD)": fmt_money(float(res["tariff"] or 0.0), "USD"),
-                            "Tax (USD)": fmt_money(float(res["tax"] or 0.0), "USD"),
-                            "Total (USD)": fmt_money(total_usd, "USD"),
-                            "Status": STATUS_LABEL.get(str(res["status"]), str(res["status"])),
-                            "Notes": str(res["notes"] or ""),
-                            "Updated": str(res["updated_at"] or ""),
-                        }
-                    )
-
-                df = pd.DataFrame(table_data)
-                st.dataframe(df, use_container_width=True, hide_index=True)
+                history_summary(get_history_summary(guest_name=guest_name))
+                guest_labels = {
+                    "room_number": "Room",
+                    "check_in": "Check-in",
+                    "check_out": "Check-out",
+                    "nights": "Nights",
+                    "num_guests": "PAX",
+                    "tariff": "Tariff (USD)",
+                    "tax": "Tax (USD)",
+                    "total_usd": "Total (USD)",
+                    "total_crc": "Total (CRC)",
+                    "status": "Status",
+                    "notes": "Notes",
+                    "updated_at": "Updated",
+                }
+                st.dataframe(
+                    history_frame(reservations),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_order=list(guest_labels),
+                    column_config=reservation_column_config(guest_labels),
+                )
+                keyset_pager("guest_history_cursor", reservations, has_newer, has_older, history_cursor)
 
-                if st.button(t("export_csv")):
-                    csv = df.to_csv(index=False).encode("utf-8")
-                    st.download_button(
-                        label=t("download_csv"),
-                        data=csv,
-                        file_name=f"guest_history_{guest_name}.csv",
-                        mime="text/csv",
-                    )
+                csv_download_button(
+                    t("export_csv"),
+                    lambda: export_reservations_csv(guest_name=guest_name),
+                    f"guest_history_{guest_name}.csv",
+                    key="guest_history_csv",
+                )
             else:
                 st.info(t("no_res_for_name"))
 
@@ -1791,48 +1578,121 @@ try:
 
         selected_room = st.session_state.get("room_history_selected") or ""
         if selected_room:
-            res = get_room_reservations(selected_room, limit=500)
             st.divider()
             st.subheader(f"{t('results')}: {t('room')} {selected_room}")
+            page_size = history_page_size()
+            res, has_newer, has_older = keyset_page(
+                "room_history_cursor",
+                (selected_room, page_size),
+                lambda before=None, after=None: get_room_reservations(
+                    selected_room, before=before, after=after, limit=page_size
+                ),
+            )
 
             if not res:
                 st.info(t("no_results"))
             else:
-                table_data = []
-                for r in res:
-                    ci = parse_iso(r["check_in"])
-                    co = parse_iso(r["check_out"])
-                    nn = nights(ci, co)
-                    total_usd = calc_total_usd(float(r["tariff"] or 0.0), float(r["tax"] or 0.0), nn)
-
-                    table_data.append(
-                        {
-                            "Reservation ID": int(r["id"]),
-                            "Guest": str(r["guest_name"] or ""),
-                            "Check-in": ci,
-                            "Check-out": co,
-                            "Nights": nn,
-                            "PAX": int(r["num_guests"] or 0),
-                            "Status": STATUS_LABEL.get(str(r["status"]), str(r["status"])),
-                            "Tariff (USD)": fmt_money(float(r["tariff"] or 0.0), "USD"),
-                            "Tax (USD)": fmt_money(float(r["tax"] or 0.0), "USD"),
-                            "Total (USD)": fmt_money(total_usd, "USD"),
-                            "Notes": str(r["notes"] or ""),
-                            "Updated": str(r["updated_at"] or ""),
-                        }
-                    )
+                history_summary(get_history_summary(room_number=selected_room))
+                room_labels = {
+                    "id": "Reservation ID",
+                    "guest_name": "Guest",
+                    "check_in": "Check-in",
+                    "check_out": "Check-out",
+                    "nights": "Nights",
+                    "num_guests": "PAX",
+                    "status": "Status",
+                    "tariff": "Tariff (USD)",
+                    "tax": "Tax (USD)",
+                    "total_usd": "Total (USD)",
+                    "total_crc": "Total (CRC)",
+                    "notes": "Notes",
+                    "updated_at": "Updated",
+                }
+                st.dataframe(
+                    history_frame(res),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_order=list(room_labels),
+                    column_config=reservation_column_config(room_labels),
+                )
+                keyset_pager("room_history_cursor", res, has_newer, has_older, history_cursor)
+
+                # the export covers the whole history, not just this page
+                csv_download_button(
+                    t("export_csv"),
+                    lambda: export_reservations_csv(room_number=selected_room),
+                    f"room_history_{selected_room}.csv",
+                    key="room_history_csv",
+                )
 
-                df = pd.DataFrame(table_data)
-                st.dataframe(df, use_container_width=True, hide_index=True)
+    # ========================================================
+    # REPORTS
+    # ========================================================
+    elif view_key == "reports":
+        st.subheader(t("reports"))
+        st.caption(t("reports_hint"))
 
-                if st.button(t("export_csv")):
-                    csv = df.to_csv(index=False).encode("utf-8")
-                    st.download_button(
-                        label=t("download_csv"),
-                        data=csv,
-                        file_name=f"room_history_{selected_room}.csv",
-                        mime="text/csv",
-                    )
+        c1, c2, c3 = st.columns([1, 1, 2])
+        with c1:
+            rep_from = st.date_input(t("date_from"), value=date.today().replace(month=1, day=1), key="report_from")
+        with c2:
+            rep_to = st.date_input(t("date_to"), value=date.today(), key="report_to")
+        with c3:
+            period = st.radio(
+                t("report_period"),
+                ["day", "week", "month"],
+                index=2,
+                format_func=lambda p: t(f"period_{p}"),
+                horizontal=True,
+                key="report_period",
+            )
+
+        if rep_to < rep_from:
+            st.error(t("date_range_error"))
+            st.stop()
+
+        report = get_revenue_report(rep_from, rep_to, period)
+        totals = report["totals"]
+        m1, m2, m3, m4, m5 = st.columns(5)
+        m1.metric(t("room_nights"), f"{totals['room_nights']:,}")
+        m2.metric(t("occupancy_rate"), f"{totals['occupancy_rate']:.1f}%")
+        m3.metric(t("revenue"), fmt_money(totals["revenue_usd"], "USD"))
+        m4.metric(t("adr"), fmt_money(totals["adr_usd"], "USD"))
+        m5.metric(t("revpar"), fmt_money(totals["revpar_usd"], "USD"))
+
+        df = pd.DataFrame(report["rows"])
+        if not df.empty:
+            ch1, ch2 = st.columns(2)
+            with ch1:
+                st.caption(t("occupancy_rate"))
+                st.line_chart(df.set_index("period")[["occupancy_rate"]], height=220)
+            with ch2:
+                st.caption(t("guests_per_day"))
+                daily = pd.DataFrame(get_daily_stats(rep_from, rep_to))
+                st.line_chart(daily.set_index("day")[["guests"]], height=220)
+            df = df[["period", "room_nights", "available_room_nights", "occupancy_rate",
+                     "revenue_usd", "revenue_crc", "adr_usd", "revpar_usd"]]
+            st.dataframe(
+                df,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "period": st.column_config.TextColumn(t(f"period_{period}")),
+                    "room_nights": st.column_config.NumberColumn(t("room_nights"), format="%d"),
+                    "available_room_nights": st.column_config.NumberColumn(t("available_nights"), format="%d"),
+                    "occupancy_rate": st.column_config.NumberColumn(t("occupancy_rate"), format="%.1f%%"),
+                    "revenue_usd": st.column_config.NumberColumn(t("revenue"), format="$%.2f"),
+                    "revenue_crc": st.column_config.NumberColumn(t("revenue_crc"), format="₡%.2f"),
+                    "adr_usd": st.column_config.NumberColumn(t("adr"), format="$%.2f"),
+                    "revpar_usd": st.column_config.NumberColumn(t("revpar"), format="$%.2f"),
+                },
+            )
+            st.download_button(
+                label=t("export_csv"),
+                data=df.to_csv(index=False).encode("utf-8"),
+                file_name=f"report_{period}_{rep_from.isoformat()}_{rep_to.isoformat()}.csv",
+                mime="text/csv",
+            )
 
     # ========================================================
     # SETTINGS
@@ -1851,7 +1711,7 @@ try:
 
         if st.button(t("save_language"), key="save_lang"):
             st.session_state.lang = lang_choice
-            set_setting("lang", lang_choice)
+            run_write(set_setting, "lang", lang_choice)
             st.success(t("lang_saved"))
             st.rerun()
 
@@ -1862,35 +1722,58 @@ try:
             st.markdown("### Backups")
             latest = get_latest_backup_path()
             if latest:
-                st.caption(f"{t('last_backup')}: {os.path.basename(latest)}")
+                st.caption(f"{t('last_backup')}: {os.path.basename(latest)} · {t('backup_mode')}: {BACKUP_MODE}")
             else:
                 st.info(t("no_backups"))
 
             colb1, colb2 = st.columns(2)
             with colb1:
                 if st.button(t("backup_now"), type="primary"):
-                    path = create_backup(force=True)
-                    if path:
-                        log_audit("BACKUP", "database", None, f"Created backup {os.path.basename(path)}")
-                        st.success(t("backup_created"))
-                        st.rerun()
+                    report = run_backup(force=True)
+                    name = os.path.basename(report["path"])
+                    if report["kind"] != "unchanged":
+                        submit_write(
+                            log_audit, "BACKUP", "database", None,
+                            f"Created backup {name} ({report['kind']}, {report['bytes_written']} bytes)",
+                        ).add_done_callback(log_write_failure)
+                    st.session_state["backup_report"] = (
+                        f"{t('backup_created')}: {name} · {report['bytes_written']:,} {t('backup_bytes')}"
+                    )
+                    st.rerun()
+                if st.session_state.get("backup_report"):
+                    st.success(st.session_state["backup_report"])
 
             with colb2:
-                latest = get_latest_backup_path()
-                if latest and os.path.exists(latest):
-                    with open(latest, "rb") as f:
-                        st.download_button(
-                            label=t("download_latest_backup"),
-                            data=f.read(),
-                            file_name=os.path.basename(latest),
-                            mime="application/octet-stream",
-                            use_container_width=True,
-                        )
+                # incremental points are not standalone files: rebuild one on click
+                points = list_restore_points() if BACKUP_MODE == "incremental" and latest else []
+                if points:
+                    st.download_button(
+                        label=t("download_latest_backup"),
+                        data=restored_backup_bytes,
+                        file_name=f"hotel_{points[-1][0]}.db",
+                        mime="application/octet-stream",
+                        use_container_width=True,
+                    )
+                elif latest and os.path.exists(latest):
+                    st.download_button(
+                        label=t("download_latest_backup"),
+                        data=lambda: read_file_bytes(latest),
+                        file_name=os.path.basename(latest),
+                        mime="application/octet-stream",
+                        use_container_width=True,
+                    )
                 else:
                     st.button(t("download_latest_backup"), disabled=True, use_container_width=True)
 
             st.divider()
             st.markdown(f"### {t('db_mgmt')}")
+            pool_stats = db_pool_stats()
+            st.caption(f"{t('db_connections')}: {pool_stats['opened']} / {pool_stats['reused']}")
+            cache_stats = read_cache_stats()
+            st.caption(
+                f"{t('read_cache')}: {cache_stats['hits']} / {cache_stats['misses']} / "
+                f"{cache_stats['generation']}"
+            )
 
             if st.button(t("clear_all_res"), type="secondary"):
                 st.session_state.confirm_clear_all = True
@@ -1900,9 +1783,7 @@ try:
                 c1, c2 = st.columns(2)
                 with c1:
                     if st.button(t("confirm_action"), type="primary"):
-                        with db() as conn:
-                            conn.execute("DELETE FROM reservations;")
-                        log_audit("DELETE_ALL", "reservations", None, "Cleared all reservations")
+                        run_write(clear_all_reservations)
                         st.session_state.confirm_clear_all = False
                         st.success("OK")
                         st.rerun()
@@ -1921,14 +1802,7 @@ try:
                 r1, r2 = st.columns(2)
                 with r1:
                     if st.button(t("confirm_action"), type="primary", key="confirm_reset_rooms_btn"):
-                        with db() as conn:
-                            conn.execute("DELETE FROM rooms;")
-                            for num in default_room_numbers():
-                                conn.execute(
-                                    "INSERT OR IGNORE INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
-                                    (num, 0.0, 0.0),
-                                )
-                        log_audit("RESET", "rooms", None, "Reset rooms to defaults")
+                        run_write(reset_rooms_to_default)
                         st.session_state.confirm_reset_rooms = False
                         st.success(t("rooms_reset"))
                         st.rerun()
@@ -1937,21 +1811,148 @@ try:
                         st.session_state.confirm_reset_rooms = False
                         st.rerun()
 
+            st.divider()
+            st.markdown(f"### {t('query_timing')}")
+            st.caption(t("query_timing_hint"))
+            qt1, qt2 = st.columns([2, 1])
+            with qt1:
+                slow_ms = st.number_input(
+                    t("slow_query_ms"),
+                    min_value=1.0,
+                    value=safe_float(get_setting("slow_query_ms", str(SLOW_QUERY_MS)), SLOW_QUERY_MS),
+                    step=10.0,
+                    key="slow_query_ms_input",
+                )
+            with qt2:
+                st.write("")
+                if st.button(t("save"), key="save_slow_query_ms", use_container_width=True):
+                    run_write(set_setting, "slow_query_ms", f"{slow_ms:g}")
+                    st.success(t("saved"))
+
+            totals = query_totals()
+            if totals:
+                st.markdown(f"#### {t('per_view_totals')}")
+                st.dataframe(
+                    pd.DataFrame(totals)[["label", "runs", "statements", "ms", "avg_ms", "max_ms", "rows"]],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "label": st.column_config.TextColumn(t("view")),
+                        "runs": st.column_config.NumberColumn(t("reruns"), format="%d"),
+                        "statements": st.column_config.NumberColumn(t("statements"), format="%d"),
+                        "ms": st.column_config.NumberColumn(t("sql_ms"), format="%.1f"),
+                        "avg_ms": st.column_config.NumberColumn(t("avg_ms"), format="%.1f"),
+                        "max_ms": st.column_config.NumberColumn(t("max_ms"), format="%.1f"),
+                        "rows": st.column_config.NumberColumn(t("rows_read"), format="%d"),
+                    },
+                )
+
+            last_log = st.session_state.get("last_query_log")
+            if last_log is not None and last_log.records:
+                st.markdown(
+                    f"#### {t('last_rerun')} · {last_log.label} · {last_log.statements} {t('statements').lower()} · "
+                    f"{last_log.ms:.1f} ms"
+                )
+                st.dataframe(
+                    pd.DataFrame(
+                        [{"ms": r.ms, "rows": r.rows, "params": r.shape, "sql": " ".join(r.sql.split())} for r in last_log.top(10)]
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "ms": st.column_config.NumberColumn("ms", format="%.2f"),
+                        "rows": st.column_config.NumberColumn(t("rows_read"), format="%d"),
+                        "params": st.column_config.TextColumn(t("params_shape")),
+                        "sql": st.column_config.TextColumn("SQL", width="large"),
+                    },
+                )
+
+            st.markdown(f"#### {t('slow_queries')}")
+            slow = get_slow_queries()
+            if slow:
+                st.dataframe(
+                    pd.DataFrame([dict(r) for r in slow])[["ts", "label", "ms", "rows", "params", "sql", "plan"]],
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "ts": st.column_config.TextColumn("UTC"),
+                        "label": st.column_config.TextColumn(t("view")),
+                        "ms": st.column_config.NumberColumn("ms", format="%.1f"),
+                        "rows": st.column_config.NumberColumn(t("rows_read"), format="%d"),
+                        "params": st.column_config.TextColumn(t("params_shape")),
+                        "sql": st.column_config.TextColumn("SQL", width="large"),
+                        "plan": st.column_config.TextColumn(t("query_plan"), width="large"),
+                    },
+                )
+            else:
+                st.caption(t("no_slow_queries"))
+            qc1, qc2 = st.columns(2)
+            with qc1:
+                if st.button(t("clear_slow_queries"), disabled=not slow, use_container_width=True):
+                    run_write(clear_slow_queries)
+                    st.rerun()
+            with qc2:
+                if st.button(t("reset_query_totals"), disabled=not totals, use_container_width=True):
+                    reset_query_totals()
+                    st.rerun()
+
             st.divider()
             st.markdown(f"### {t('audit_log')}")
             st.caption(t("audit_hint"))
 
-            audit_df = get_audit_log(limit=300)
-            st.dataframe(audit_df, use_container_width=True, hide_index=True)
+            any_label = t("audit_any")
+            fa1, fa2, fa3, fa4 = st.columns(4)
+            with fa1:
+                f_user = st.selectbox(t("audit_user"), [any_label] + get_audit_values("user"), key="audit_f_user")
+            with fa2:
+                f_action = st.selectbox(t("audit_action"), [any_label] + get_audit_values("action"), key="audit_f_action")
+            with fa3:
+                f_entity = st.selectbox(t("audit_entity"), [any_label] + get_audit_values("entity"), key="audit_f_entity")
+            with fa4:
+                f_entity_id = st.text_input(t("audit_entity_id"), key="audit_f_entity_id").strip()
+            fb1, fb2 = st.columns(2)
+            with fb1:
+                f_from = st.date_input(t("date_from"), value=None, key="audit_f_from")
+            with fb2:
+                f_to = st.date_input(t("date_to"), value=None, key="audit_f_to")
+
+            audit_filters = {
+                "user": None if f_user == any_label else f_user,
+                "action": None if f_action == any_label else f_action,
+                "entity": None if f_entity == any_label else f_entity,
+                "entity_id": int(f_entity_id) if f_entity_id.isdigit() else None,
+                "ts_from": f_from,
+                "ts_to": f_to,
+            }
+            audit_rows, has_newer, has_older = keyset_page(
+                "audit_cursor",
+                audit_filters,
+                lambda before=None, after=None: get_audit_page(before_id=before, after_id=after, **audit_filters),
+            )
+            st.dataframe(audit_log_frame(audit_rows), use_container_width=True, hide_index=True)
+            keyset_pager("audit_cursor", audit_rows, has_newer, has_older, lambda r: int(r["id"]))
+
+            export_filters = dict(audit_filters)
+            export_start, export_end = export_filters.pop("ts_from"), export_filters.pop("ts_to")
+            csv_download_button(
+                t("audit_export"),
+                lambda: export_audit_csv(export_start, export_end, **export_filters),
+                f"audit_log_{date.today().isoformat()}.csv",
+                key="audit_csv",
+            )
 
-            if st.button(t("audit_export")):
-                csv = audit_df.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    label=t("audit_download"),
-                    data=csv,
-                    file_name=f"audit_log_{date.today().isoformat()}.csv",
-                    mime="text/csv",
-                )
+            st.markdown(f"#### {t('export_reservations')}")
+            ce1, ce2 = st.columns(2)
+            with ce1:
+                exp_from = st.date_input(t("date_from"), value=date.today().replace(month=1, day=1), key="export_from")
+            with ce2:
+                exp_to = st.date_input(t("date_to"), value=date.today(), key="export_to")
+            csv_download_button(
+                t("export_reservations"),
+                lambda: export_reservations_csv(exp_from, exp_to),
+                f"reservations_{exp_from.isoformat()}_{exp_to.isoformat()}.csv",
+                key="reservations_csv",
+            )
 
         st.divider()
         st.markdown("### About")
@@ -1965,3 +1966,5 @@ except Exception as e:
     else:
         st.error(t("unexpected_error"))
     st.stop()
+
+finish_query_log(st.session_state.query_log)
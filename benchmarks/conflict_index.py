@@ -0,0 +1,74 @@
+"""Conflict checks: in-memory interval index vs. the SQL overlap probe.
+
+    python benchmarks/conflict_index.py                   # 100k reservations, 400 rooms
+    python benchmarks/conflict_index.py --probes 50000 --regenerate
+
+Runs the same random probes (room, dates, sometimes an excluded id) through
+RoomIntervalIndex.find_conflict and find_conflict_sql on a generated
+database in benchmarks/.cache/, checks they agree, and prints microseconds
+per probe and the index rebuild time.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import scenario_core  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rooms", type=int, default=400)
+    p.add_argument("--reservations", type=int, default=100000)
+    p.add_argument("--years", type=float, default=4.0)
+    p.add_argument("--probes", type=int, default=20000)
+    p.add_argument("--seed", type=int, default=11)
+    p.add_argument("--regenerate", action="store_true", help="rebuild the scenario database")
+    args = p.parse_args()
+
+    core, scenario = scenario_core(args.rooms, args.reservations, args.years, args.regenerate)
+
+    rnd = random.Random(args.seed)
+    with core.db() as conn:
+        room_ids = [int(r["id"]) for r in conn.execute("SELECT id FROM rooms;")]
+        res_ids = [int(r["id"]) for r in conn.execute("SELECT id FROM reservations;")]
+    today = date.today()
+    probes = []
+    for _ in range(args.probes):
+        ci = today + timedelta(days=rnd.randint(-60, 240))
+        co = ci + timedelta(days=rnd.randint(1, 7))
+        exclude = rnd.choice(res_ids) if rnd.random() < 0.2 else None
+        probes.append((rnd.choice(room_ids), ci, co, exclude))
+
+    index = core._room_index()
+    t0 = time.perf_counter()
+    index.rebuild()
+    rebuild_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with core.db() as conn:
+        sql_hits = [core.find_conflict_sql(conn, room_id, ci, co, exclude_id=ex) for room_id, ci, co, ex in probes]
+    sql_us = (time.perf_counter() - t0) / len(probes) * 1e6
+
+    t0 = time.perf_counter()
+    index_hits = [index.find_conflict(room_id, ci.isoformat(), co.isoformat(), exclude_id=ex)
+                  for room_id, ci, co, ex in probes]
+    index_us = (time.perf_counter() - t0) / len(probes) * 1e6
+
+    mismatches = sum((a is None) != (b is None) for a, b in zip(sql_hits, index_hits))
+    conflicts = sum(h is not None for h in sql_hits)
+    print(f"{scenario}: {len(probes)} probes, {conflicts} conflicts")
+    print(f"  SQL probe       {sql_us:8.1f} us/probe")
+    print(f"  interval index  {index_us:8.1f} us/probe")
+    print(f"  index rebuild   {rebuild_s:8.2f} s")
+    print(f"  mismatches      {mismatches:8d}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import load_core, scenario_core  # noqa: E402
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("hotel", "synthetic scenario for the data-layer benchmarks")
+    group.addoption("--rooms", type=int, default=200)
+    group.addoption("--reservations", type=int, default=100000)
+    group.addoption("--years", type=float, default=4.0)
+    group.addoption("--regenerate", action="store_true", help="rebuild the scenario database")
+
+
+@pytest.fixture(scope="session")
+def bench_core(request, tmp_path_factory):
+    """hotel_core on a scratch copy of the scenario database.
+
+    The scenario is generated once into benchmarks/.cache/; each session works
+    on a copy so the rows save_reservation adds don't skew the next run.
+    """
+    opt = request.config.getoption
+    core, _ = scenario_core(opt("--rooms"), opt("--reservations"), opt("--years"), opt("--regenerate"))
+    with core.db() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    cached = core.DB_PATH
+    core._db_pool().close_all()
+    scratch = tmp_path_factory.mktemp("scenario")
+    shutil.copy(cached, scratch / "hotel.db")
+    return load_core(str(scratch))
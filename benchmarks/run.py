@@ -0,0 +1,123 @@
+"""Data-layer benchmarks with stored baselines.
+
+    python benchmarks/run.py                      # default scenario, compare with baseline
+    python benchmarks/run.py --save               # record a new baseline
+    python benchmarks/run.py --rooms 2000 --reservations 1000000 --years 8
+
+Each scenario's database is generated once into benchmarks/.cache/<scenario>/
+and reused. Results are medians in milliseconds; a benchmark more than
+--threshold percent slower than its baseline is reported as a regression and
+the script exits non-zero.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import scenario_core  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def build_benchmarks(core, rnd: random.Random):
+    with core.db() as conn:
+        rooms = [str(r["number"]) for r in conn.execute("SELECT number FROM rooms;")]
+        guests = [str(r["guest_name"]) for r in conn.execute(
+            "SELECT guest_name FROM reservations ORDER BY random() LIMIT 200;")]
+    today = date.today()
+    far = today + timedelta(days=3650)
+
+    def day():
+        return today + timedelta(days=rnd.randint(-365, 60))
+
+    def save():
+        ci = far + timedelta(days=rnd.randint(0, 20000))
+        core.save_reservation(rnd.choice(rooms), "Bench Guest", ci, ci + timedelta(days=2),
+                             2, 80.0, 10.4, "", "reserved")
+
+    return {
+        "get_all_rooms_with_status": lambda: core.get_all_rooms_with_status(day()),
+        "get_dashboard_stats": lambda: core.get_dashboard_stats(day()),
+        "get_el_roll_snapshot": lambda: core.get_el_roll_snapshot(day()),
+        "save_reservation": save,
+        "search_guests": lambda: core.search_guests(rnd.choice(guests)[: rnd.randint(3, 8)]),
+        "get_guest_reservations": lambda: core.get_guest_reservations(rnd.choice(guests)),
+        "get_room_reservations": lambda: core.get_room_reservations(rnd.choice(rooms)),
+        "get_audit_log": lambda: core.get_audit_log(),
+        "create_backup": lambda: core.create_backup(force=True),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rooms", type=int, default=200)
+    p.add_argument("--reservations", type=int, default=100000)
+    p.add_argument("--years", type=float, default=4.0)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--only", nargs="*", help="benchmark names to run")
+    p.add_argument("--threshold", type=float, default=25.0, help="regression threshold in percent")
+    p.add_argument("--save", action="store_true", help="store results as the new baseline")
+    p.add_argument("--regenerate", action="store_true", help="rebuild the scenario database")
+    args = p.parse_args()
+
+    core, scenario = scenario_core(args.rooms, args.reservations, args.years, args.regenerate)
+
+    rnd = random.Random(11)
+    benches = build_benchmarks(core, rnd)
+    names = args.only or list(benches)
+
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+    baseline = baselines.get(scenario, {})
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<28}{'median ms':>12}{'baseline':>12}{'change':>10}")
+    for name in names:
+        fn = benches[name]
+        fn()  # warm caches / pool
+        repeat = max(3, args.repeat // 5) if name == "create_backup" else args.repeat
+        ms = timed(fn, repeat)
+        results[name] = round(ms, 3)
+        base = baseline.get(name)
+        change = ""
+        if base:
+            pct = (ms - base) / base * 100.0
+            change = f"{pct:+.0f}%"
+            if pct > args.threshold:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:<28}{ms:>12.3f}{(f'{base:.3f}' if base else '-'):>12}{change:>10}")
+
+    if args.save:
+        baselines[scenario] = dict(baseline, **results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {BASELINE_PATH}")
+
+    if regressions:
+        print(f"regressions (> {args.threshold:g}%): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
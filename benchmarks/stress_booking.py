@@ -0,0 +1,160 @@
+"""Concurrent booking stress test: no room may end up double-booked.
+
+    python benchmarks/stress_booking.py                       # 16 threads, 4 rooms
+    python benchmarks/stress_booking.py --threads 32 --attempts 300 --index
+
+Threads book random, heavily overlapping stays in a few rooms of a fresh
+database (benchmarks/.cache/stress/); then every thread keeps editing one
+shared reservation with the version it last read. The script exits non-zero
+if two active stays of a room overlap or an edit overwrote another one.
+"""
+
+import argparse
+import glob
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import load_core  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def fresh_core(workdir: str):
+    os.makedirs(workdir, exist_ok=True)
+    for path in glob.glob(os.path.join(workdir, "hotel.db*")):
+        os.remove(path)
+    return load_core(workdir)
+
+
+def run_threads(n: int, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    started = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return time.perf_counter() - started
+
+
+def overlapping_pairs(core) -> int:
+    with core.db() as conn:
+        return int(conn.execute(
+            """
+            SELECT COUNT(*) FROM reservations a
+            JOIN reservations b ON a.room_id = b.room_id AND a.id < b.id
+            WHERE a.status NOT IN ('noshow', 'checkedout')
+              AND b.status NOT IN ('noshow', 'checkedout')
+              AND a.check_in < b.check_out AND b.check_in < a.check_out;
+            """
+        ).fetchone()[0])
+
+
+def booking_race(core, rooms, threads: int, attempts: int, days: int, seed: int):
+    counts = {"booked": 0, "conflict": 0, "locked": 0}
+    latencies = []
+    lock = threading.Lock()
+    start = date.today() + timedelta(days=30)
+
+    def worker(i: int):
+        rnd = random.Random(seed + i)
+        local = {"booked": 0, "conflict": 0, "locked": 0}
+        samples = []
+        with core.acting_as(f"stress{i}", "receptionist"):
+            for _ in range(attempts):
+                ci = start + timedelta(days=rnd.randint(0, days))
+                co = ci + timedelta(days=rnd.randint(1, 4))
+                t0 = time.perf_counter()
+                try:
+                    ok = core.save_reservation(rnd.choice(rooms), f"Stress Guest {i}", ci, co, 2, 80.0, 10.0, "", "reserved")
+                    local["booked" if ok else "conflict"] += 1
+                except sqlite3.OperationalError:
+                    local["locked"] += 1
+                samples.append((time.perf_counter() - t0) * 1000.0)
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+            latencies.extend(samples)
+
+    seconds = run_threads(threads, worker)
+    return counts, latencies, seconds
+
+
+def version_race(core, room: str, threads: int, edits: int):
+    start = date.today() + timedelta(days=30)
+    core.save_reservation(room, "Version Guest", start, start + timedelta(days=2), 2, 80.0, 10.0, "", "reserved")
+    with core.db() as conn:
+        res_id = int(conn.execute("SELECT MAX(id) FROM reservations;").fetchone()[0])
+    counts = {"updated": 0, "stale": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def worker(i: int):
+        local = {"updated": 0, "stale": 0, "locked": 0}
+        with core.acting_as(f"stress{i}", "receptionist"):
+            for n in range(edits):
+                row = core.get_reservation(res_id)
+                try:
+                    core.save_reservation(
+                        room, "Version Guest", start, start + timedelta(days=2), 2, 80.0, 10.0,
+                        f"edit {i}-{n}", "reserved", reservation_id=res_id, expected_version=int(row["version"]),
+                    )
+                    local["updated"] += 1
+                except core.StaleReservationError:
+                    local["stale"] += 1
+                except sqlite3.OperationalError:
+                    local["locked"] += 1
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+
+    seconds = run_threads(threads, worker)
+    final = int(core.get_reservation(res_id)["version"])
+    return counts, final, seconds
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--attempts", type=int, default=200, help="booking attempts per thread")
+    p.add_argument("--rooms", type=int, default=4, help="rooms the threads compete for")
+    p.add_argument("--days", type=int, default=60, help="check-in spread in days")
+    p.add_argument("--edits", type=int, default=50, help="edits per thread in the version race")
+    p.add_argument("--index", action="store_true", help="use the in-memory conflict index")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--workdir", default=os.path.join(HERE, ".cache", "stress"))
+    args = p.parse_args()
+
+    core = fresh_core(os.path.abspath(args.workdir))
+    core.CONFLICT_INDEX_ENABLED = args.index
+    rooms = [str(r["number"]) for r in core.get_rooms()]
+    if len(rooms) <= args.rooms:
+        sys.exit(f"need more than {args.rooms} rooms, the database has {len(rooms)}")
+
+    counts, latencies, seconds = booking_race(core, rooms[: args.rooms], args.threads, args.attempts, args.days, args.seed)
+    total = sum(counts.values())
+    latencies.sort()
+    pairs = overlapping_pairs(core)
+    print(f"booking race: {args.threads} threads x {args.attempts} attempts on {args.rooms} rooms"
+          f" ({'index' if args.index else 'sql'} conflict check)")
+    print(f"  {counts}  {total / seconds:.0f} attempts/s"
+          f"  median {statistics.median(latencies):.2f} ms  p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+    print(f"  overlapping active stays: {pairs}")
+
+    vcounts, final, vseconds = version_race(core, rooms[args.rooms], args.threads, args.edits)
+    lost = vcounts["updated"] + 1 - final
+    print(f"version race: {args.threads} threads x {args.edits} edits of one reservation")
+    print(f"  {vcounts}  final version {final}  lost updates {lost}  {vseconds:.2f} s")
+    print(f"pool: {core.db_pool_stats()}")
+
+    if pairs or lost:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Synthetic hotel databases for benchmarking the data layer.
+
+    python benchmarks/synthetic.py --out /tmp/hotel_big --rooms 500 --reservations 200000
+
+Creates <out>/hotel.db with the hotel schema and fills it with rooms, years of
+non-overlapping stays per room, repeat guests, audit rows and daily FX rates.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+FIRST_NAMES = [
+    "Ana", "Luis", "María", "José", "Carlos", "Sofía", "Elena", "Pedro", "Lucía", "Diego",
+    "John", "Mary", "James", "Linda", "Chen", "Yuki", "Hans", "Ingrid", "Pierre", "Amélie",
+]
+LAST_NAMES = [
+    "Rodríguez", "Jiménez", "Mora", "Vargas", "Rojas", "Castro", "Solano", "Araya", "Quesada",
+    "Smith", "Johnson", "Brown", "Müller", "Schmidt", "Dubois", "Martin", "Wang", "Tanaka",
+]
+NOTES = ["", "", "", "Late arrival", "Airport pickup", "Extra bed", "Anniversary", "VIP"]
+
+
+def load_core(workdir: str):
+    """Point hotel_core at <workdir>/hotel.db (and its backups) and bootstrap it."""
+    os.makedirs(workdir, exist_ok=True)
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo not in sys.path:
+        sys.path.insert(0, repo)
+    import hotel_core as core
+
+    core.DB_PATH = os.path.join(workdir, "hotel.db")
+    core.BACKUP_DIR = os.path.join(workdir, "backups")
+    core.bootstrap()
+    return core
+
+
+# bump when generate() changes the data it produces; cached scenarios are rebuilt
+GENERATOR_VERSION = 2
+
+
+def scenario_core(rooms: int, reservations: int, years: float, regenerate: bool = False):
+    """load_core() on the cached database for a scenario, generating it if needed.
+
+    Returns (core, scenario name). Databases live in benchmarks/.cache/<scenario>/
+    and are rebuilt when GENERATOR_VERSION changed since they were made.
+    """
+    scenario = f"rooms={rooms},reservations={reservations},years={years:g}"
+    workdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache",
+                           scenario.replace("=", "").replace(",", "_"))
+    stamp = os.path.join(workdir, "generator_version")
+    current = os.path.exists(os.path.join(workdir, "hotel.db")) and os.path.exists(stamp)
+    if current:
+        with open(stamp, encoding="utf-8") as f:
+            current = f.read().strip() == str(GENERATOR_VERSION)
+    core = load_core(workdir)
+    if regenerate or not current:
+        print(f"generating {scenario} …")
+        print(generate(core, rooms, reservations, years))
+        with open(stamp, "w", encoding="utf-8") as f:
+            f.write(str(GENERATOR_VERSION))
+    return core, scenario
+
+
+def room_numbers(n: int):
+    per_floor = 40 if n > 200 else 20
+    return [f"{1 + i // per_floor}{1 + i % per_floor:02d}" for i in range(n)]
+
+
+def generate(core, rooms: int, reservations: int, years: float, audit_ratio: float = 1.0, seed: int = 7):
+    """Replace the contents of core.DB_PATH with a synthetic dataset."""
+    rnd = random.Random(seed)
+    today = date.today()
+    per_room = max(1, reservations // max(1, rooms))
+    # each stay gets an equal slot of the span (at least ~1.5 nights, so a
+    # dense scenario stretches the span rather than piling stays up early);
+    # 85% of it lies in the past, so today and the coming months are booked
+    span_days = max(int(365 * years), (per_room * 3) // 2)
+    start = today - timedelta(days=int(span_days * 0.85))
+
+    guests = [f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {rnd.choice(LAST_NAMES)}" for _ in range(max(50, reservations // 4))]
+    # a skewed pick so some guests come back often
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) ** 0.6 for i in range(len(guests))))
+
+    with core.db() as conn:
+        conn.execute("DELETE FROM reservations;")
+        conn.execute("DELETE FROM rooms;")
+        conn.execute("DELETE FROM audit_log;")
+        conn.execute("DELETE FROM fx_daily;")
+
+        room_rows = []
+        for num in room_numbers(rooms):
+            tariff = float(rnd.choice([45, 60, 75, 90, 120, 150]))
+            room_rows.append((num, tariff, round(tariff * 0.13, 2)))
+        conn.executemany("INSERT INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);", room_rows)
+        room_ids = [(int(r["id"]), float(r["default_tariff"]), float(r["default_tax"]))
+                    for r in conn.execute("SELECT id, default_tariff, default_tax FROM rooms ORDER BY id;")]
+
+        slot = span_days / per_room
+        res_rows = []
+        for room_id, tariff, tax in room_ids:
+            for k in range(per_room):
+                if len(res_rows) >= reservations:
+                    break
+                first, last = int(k * slot), int((k + 1) * slot)
+                n = rnd.randint(1, max(1, min(7, last - first)))
+                ci = start + timedelta(days=first + rnd.randint(0, max(0, last - first - n)))
+                co = ci + timedelta(days=n)
+                if co <= today:
+                    status = "noshow" if rnd.random() < 0.03 else "checkedout"
+                elif ci <= today:
+                    status = "checkedin"
+                else:
+                    status = "reserved"
+                stamp = f"{ci.isoformat()}T12:00:00Z"
+                res_rows.append((
+                    room_id, rnd.choices(guests, cum_weights=cum_weights)[0], status, ci.isoformat(), co.isoformat(),
+                    rnd.choice(NOTES), rnd.randint(1, 4), tariff, tax, stamp, stamp,
+                ))
+        conn.executemany(
+            """
+            INSERT INTO reservations(room_id, guest_name, status, check_in, check_out,
+                                     notes, num_guests, tariff, tax, created_at, updated_at)
+            VALUES(?,?,?,?,?,?,?,?,?,?,?);
+            """,
+            res_rows,
+        )
+
+        audit_rows = []
+        for i, r in enumerate(res_rows[: int(len(res_rows) * audit_ratio)]):
+            audit_rows.append((r[9], rnd.choice(["receptionist a", "receptionist b", "admin"]), "receptionist",
+                               "CREATE", "reservation", i + 1, f"name={r[1]}; ci={r[3]}; co={r[4]}"))
+        audit_rows.sort(key=lambda a: a[0])  # appended in time order, like the live log
+        conn.executemany(core.AUDIT_INSERT_SQL, audit_rows)
+
+        fx = 520.0
+        fx_rows = []
+        for k in range(span_days):
+            fx = max(400.0, fx + rnd.uniform(-2.0, 2.0))
+            day = (start + timedelta(days=k)).isoformat()
+            fx_rows.append((day, round(fx, 2), f"{day}T08:00:00Z", "admin", "admin"))
+        conn.executemany("INSERT OR REPLACE INTO fx_daily(day, fx_usd_crc, ts, user, role) VALUES (?,?,?,?,?);", fx_rows)
+        core.rebuild_daily_stats()
+        core.invalidate_read_cache()
+
+    with core.db() as conn:
+        conn.execute("ANALYZE;")
+    return {"rooms": len(room_ids), "reservations": len(res_rows), "audit": len(audit_rows), "fx_days": len(fx_rows)}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--out", required=True, help="directory to create hotel.db in")
+    p.add_argument("--rooms", type=int, default=50)
+    p.add_argument("--reservations", type=int, default=10000)
+    p.add_argument("--years", type=float, default=3.0)
+    p.add_argument("--audit-ratio", type=float, default=1.0, help="audit rows per reservation")
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+
+    core = load_core(os.path.abspath(args.out))
+    counts = generate(core, args.rooms, args.reservations, args.years, args.audit_ratio, args.seed)
+    print(f"{core.DB_PATH}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""pytest-benchmark suite for the data layer (same cases as run.py).
+
+    python -m pytest benchmarks --benchmark-save=before          # store a run
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+
+Takes the same --rooms / --reservations / --years scenario options as
+run.py. Stored runs go to .benchmarks/ and only mean something on the
+machine that made them, so they are not committed; benchmarks/baseline.json
+is the shared reference.
+"""
+
+import random
+
+import pytest
+from run import build_benchmarks
+
+CASES = [
+    "get_all_rooms_with_status",
+    "get_dashboard_stats",
+    "get_el_roll_snapshot",
+    "save_reservation",
+    "search_guests",
+    "get_guest_reservations",
+    "get_room_reservations",
+    "get_audit_log",
+    "create_backup",
+]
+
+
+@pytest.fixture(scope="module")
+def benches(bench_core):
+    return build_benchmarks(bench_core, random.Random(11))
+
+
+@pytest.mark.benchmark(warmup=True, warmup_iterations=20)
+@pytest.mark.parametrize("name", CASES)
+def test_data_layer(benchmark, benches, name):
+    fn = benches[name]
+    fn()  # warm caches / pool
+    if name == "create_backup":
+        benchmark.pedantic(fn, rounds=5, iterations=1)
+    else:
+        benchmark(fn)
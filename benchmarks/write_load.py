@@ -0,0 +1,131 @@
+"""Concurrent session write load: direct writers vs. the write queue.
+
+    python benchmarks/write_load.py                       # 16 sessions, both modes
+    python benchmarks/write_load.py --sessions 48 --ops 300 --mode queue
+
+Each session thread does what the app's write paths do -- book a stay,
+write a login audit row, now and then save the day's exchange rate -- on a
+fresh database (benchmarks/.cache/write_load/). "direct" calls the write
+functions on the session's own thread; "queue" sends them through
+run_write() to the single writer thread, which commits them in groups.
+"""
+
+import argparse
+import glob
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import load_core  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def fresh_core(workdir: str):
+    os.makedirs(workdir, exist_ok=True)
+    for path in glob.glob(os.path.join(workdir, "hotel.db*")):
+        os.remove(path)
+    return load_core(workdir)
+
+
+def run_load(core, sessions: int, ops: int, seed: int):
+    rooms = [str(r["number"]) for r in core.get_rooms()]
+    start = date.today() + timedelta(days=30)
+    counts = {"booked": 0, "conflict": 0, "audit": 0, "fx": 0, "locked": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def session(i: int):
+        rnd = random.Random(seed + i)
+        local = dict.fromkeys(counts, 0)
+        samples = []
+        with core.acting_as(f"session{i}", "receptionist"):
+            for _ in range(ops):
+                pick = rnd.random()
+                t0 = time.perf_counter()
+                try:
+                    if pick < 0.6:
+                        ci = start + timedelta(days=rnd.randint(0, 1000))
+                        ok = core.run_write(
+                            core.save_reservation, rnd.choice(rooms), f"Load Guest {i}", ci,
+                            ci + timedelta(days=rnd.randint(1, 5)), 2, 80.0, 10.0, "", "reserved",
+                        )
+                        local["booked" if ok else "conflict"] += 1
+                    elif pick < 0.95:
+                        core.run_write(core.log_audit, "LOGIN", "session", None, f"user=session{i}")
+                        local["audit"] += 1
+                    else:
+                        core.run_write(core.save_today_fx, 500.0 + rnd.random())
+                        local["fx"] += 1
+                except sqlite3.OperationalError:
+                    local["locked"] += 1
+                samples.append((time.perf_counter() - t0) * 1000.0)
+        with lock:
+            for k, v in local.items():
+                counts[k] += v
+            latencies.extend(samples)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    seconds = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "seconds": seconds,
+        "ops_per_s": sessions * ops / seconds,
+        "median_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "max_ms": latencies[-1],
+        **counts,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=16)
+    p.add_argument("--ops", type=int, default=200, help="writes per session")
+    p.add_argument("--mode", choices=["direct", "queue", "both"], default="both")
+    p.add_argument("--batch-max", type=int, default=None, help="override WRITE_BATCH_MAX")
+    p.add_argument("--batch-wait-ms", type=float, default=None, help="override WRITE_BATCH_WAIT_MS")
+    p.add_argument("--index", action="store_true", help="use the in-memory conflict index")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--workdir", default=os.path.join(HERE, ".cache", "write_load"))
+    args = p.parse_args()
+
+    modes = ["direct", "queue"] if args.mode == "both" else [args.mode]
+    print(f"{args.sessions} sessions x {args.ops} writes")
+    print(f"{'mode':<8}{'ops/s':>9}{'median ms':>11}{'p99 ms':>9}{'max ms':>9}{'locked':>8}  detail")
+    for mode in modes:
+        core = fresh_core(os.path.abspath(args.workdir))
+        core.CONFLICT_INDEX_ENABLED = args.index
+        core.WRITE_QUEUE_ENABLED = mode == "queue"
+        wq = core._write_queue()
+        if args.batch_max is not None:
+            wq.batch_max = args.batch_max
+        if args.batch_wait_ms is not None:
+            wq.wait_ms = args.batch_wait_ms
+        before = core.db_pool_stats()
+        r = run_load(core, args.sessions, args.ops, args.seed)
+        wq.stop()
+        pool = core.db_pool_stats()
+        detail = f"booked {r['booked']}, conflicts {r['conflict']}, lock retries {pool['write_retries'] - before['write_retries']}"
+        if mode == "queue":
+            stats = core.write_queue_stats()
+            detail += f", batches {stats['batches']} (avg {stats['jobs'] / max(1, stats['batches']):.1f}, max {stats['max_batch']})"
+        print(f"{mode:<8}{r['ops_per_s']:>9.0f}{r['median_ms']:>11.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.1f}"
+              f"{r['locked']:>8}  {detail}")
+        # the next mode deletes and recreates hotel.db
+        core._db_pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
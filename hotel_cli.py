@@ -0,0 +1,261 @@
+"""Command-line access to the hotel data layer (no Streamlit needed).
+
+    python hotel_cli.py occupancy --date 2024-07-01
+    python hotel_cli.py backup --force
+    python hotel_cli.py restore --date 2024-07-01 --out restored.db
+    python hotel_cli.py export reservations --from 2024-01-01 --to 2024-12-31 --out 2024.csv
+    python hotel_cli.py report --from 2024-01-01 --to 2024-12-31 --period month
+    python hotel_cli.py stats --check
+    python hotel_cli.py availability --from 2024-07-01 --to 2024-07-05
+    python hotel_cli.py import reservations.csv
+
+Use --db to point at a database other than ./hotel.db.
+"""
+
+import argparse
+import csv
+import getpass
+import json
+import os
+import sqlite3
+import sys
+from datetime import date
+
+import hotel_core as core
+
+
+def cmd_occupancy(args) -> int:
+    day = date.fromisoformat(args.date) if args.date else date.today()
+    snapshot = core.get_el_roll_snapshot(day)
+    stats = snapshot["stats"]
+    if args.json:
+        rooms = [
+            dict(r, check_in=core.iso(r["check_in"]) if r["check_in"] else None,
+                 check_out=core.iso(r["check_out"]) if r["check_out"] else None)
+            for r in snapshot["rooms"]
+        ]
+        json.dump({"date": core.iso(day), "stats": stats, "rooms": rooms}, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+
+    print(
+        f"{core.iso(day)}: {int(stats['occupied_rooms'])}/{int(stats['total_rooms'])} rooms occupied "
+        f"({stats['occupancy_rate']:.1f}%), {int(stats['total_guests'])} guests"
+    )
+    if args.rooms:
+        for r in snapshot["rooms"]:
+            label = core.STATUS_LABEL.get(r["status"], "Available")
+            print(f"  {r['room_number']:>6}  {label:<12} {r['guest_name']}")
+    return 0
+
+
+def cmd_backup(args) -> int:
+    report = core.run_backup(force=args.force)
+    if report["kind"] != "unchanged":
+        core.log_audit(
+            "BACKUP", "database", None,
+            f"Created backup {os.path.basename(report['path'])} ({report['kind']}, {report['bytes_written']} bytes)",
+        )
+    line = f"{report['path']}  {report['kind']}, {report['bytes_written']:,} bytes written"
+    if "pages_total" in report:
+        line += f" ({report['pages_written']}/{report['pages_total']} pages)"
+    print(f"{line} in {report['seconds']:.2f}s")
+    return 0
+
+
+def cmd_restore(args) -> int:
+    if args.list:
+        for stamp, kind in core.list_restore_points():
+            print(f"{stamp}  {kind}")
+        return 0
+    if not args.out:
+        print("--out is required (the live database is never overwritten)", file=sys.stderr)
+        return 1
+    if os.path.abspath(args.out) == os.path.abspath(core.DB_PATH):
+        print("refusing to restore over the live database", file=sys.stderr)
+        return 1
+    try:
+        stamp = core.restore_backup(args.out, date.fromisoformat(args.date) if args.date else None)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    conn = sqlite3.connect(args.out)
+    try:
+        check = conn.execute("PRAGMA integrity_check;").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"restored {stamp} to {args.out} (integrity: {check})")
+    return 0 if check == "ok" else 2
+
+
+def cmd_import(args) -> int:
+    """CSV columns: room, guest_name, check_in, check_out[, pax, tariff, tax, status, notes].
+
+    A .json file holds a list of objects with the same keys. All accepted rows
+    go in with one transaction; rejected ones are listed by line (CSV) or
+    position (JSON).
+    """
+    with open(args.file, newline="", encoding="utf-8-sig") as f:
+        if args.file.lower().endswith(".json"):
+            report = core.import_reservations(json.load(f), first_line=1, dry_run=args.dry_run)
+        else:
+            report = core.import_reservations(csv.DictReader(f), first_line=2, dry_run=args.dry_run)
+
+    verb = "would import" if args.dry_run else "imported"
+    print(f"{verb} {report['imported']}, rejected {len(report['rejected'])} ({report['seconds']:.2f}s)")
+    for line_no, reason in report["rejected"]:
+        print(f"  line {line_no}: {reason}")
+    return 0 if not report["rejected"] else 2
+
+
+def cmd_export(args) -> int:
+    start = date.fromisoformat(args.date_from) if args.date_from else None
+    end = date.fromisoformat(args.date_to) if args.date_to else None
+    if args.table == "reservations":
+        chunks = core.export_reservations_csv(start, end, room_number=args.room)
+    else:
+        chunks = core.export_audit_csv(start, end)
+
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.out:
+            out.close()
+    if args.out:
+        print(f"{args.out}: {written:,} bytes", file=sys.stderr)
+    return 0
+
+
+def cmd_report(args) -> int:
+    end = date.fromisoformat(args.date_to) if args.date_to else date.today()
+    start = date.fromisoformat(args.date_from) if args.date_from else end.replace(month=1, day=1)
+    try:
+        report = core.get_revenue_report(start, end, args.period)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.json:
+        json.dump(report, sys.stdout, default=core.iso, indent=2)
+        print()
+        return 0
+
+    print(f"{'period':<10} {'nights':>8} {'occ %':>7} {'revenue':>14} {'revenue CRC':>18} {'ADR':>10} {'RevPAR':>10}")
+    for r in report["rows"] + [dict(report["totals"], period="total")]:
+        crc = f"{r['revenue_crc']:,.2f}" if r["revenue_crc"] is not None else "-"
+        print(
+            f"{r['period']:<10} {r['room_nights']:>8} {r['occupancy_rate']:>7.1f} "
+            f"{r['revenue_usd']:>14,.2f} {crc:>18} {r['adr_usd']:>10,.2f} {r['revpar_usd']:>10,.2f}"
+        )
+    return 0
+
+
+def cmd_stats(args) -> int:
+    if args.rebuild:
+        days = core.rebuild_daily_stats()
+        core.log_audit("REBUILD", "daily_stats", None, f"Rebuilt daily_stats ({days} days)")
+        print(f"daily_stats rebuilt: {days} days")
+    mismatches = core.check_daily_stats()
+    for m in mismatches[: args.show]:
+        print(f"  {m['day']}: stored {m['stored']} expected {m['expected']}  (rooms, guests, cents)")
+    print(f"daily_stats: {'consistent' if not mismatches else f'{len(mismatches)} days differ'}")
+    return 0 if not mismatches else 2
+
+
+def cmd_availability(args) -> int:
+    check_in = date.fromisoformat(args.date_from)
+    check_out = date.fromisoformat(args.date_to)
+    if check_out <= check_in:
+        print("--to must be after --from", file=sys.stderr)
+        return 1
+    free = core.get_available_rooms(check_in, check_out)
+    if args.json:
+        json.dump(free, sys.stdout, indent=2)
+        print()
+        return 0
+    print(f"{len(free)} rooms free for {core.nights(check_in, check_out)} nights from {args.date_from}")
+    for r in free:
+        print(
+            f"  {r['room_number']:>6}  {r['default_tariff_usd']:>9,.2f} + {r['default_tax_usd']:>7,.2f} tax"
+            f"  = {r['total_usd']:>10,.2f} USD"
+        )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="hotel-cli", description="Isla Verde Hotel Manager CLI")
+    p.add_argument("--db", default=core.DB_PATH, help="database file (default: %(default)s)")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    occ = sub.add_parser("occupancy", help="occupancy and guests for a day")
+    occ.add_argument("--date", help="YYYY-MM-DD (default: today)")
+    occ.add_argument("--rooms", action="store_true", help="list every room")
+    occ.add_argument("--json", action="store_true", help="print the full snapshot as JSON")
+    occ.set_defaults(func=cmd_occupancy)
+
+    bk = sub.add_parser("backup", help="create today's backup (see BACKUP_MODE)")
+    bk.add_argument("--force", action="store_true", help="back up again even if today's backup exists")
+    bk.set_defaults(func=cmd_backup)
+
+    rs = sub.add_parser("restore", help="rebuild the database as of a backup day")
+    rs.add_argument("--date", help="YYYY-MM-DD (default: newest backup)")
+    rs.add_argument("--out", help="file to write the restored database to")
+    rs.add_argument("--list", action="store_true", help="list restore points")
+    rs.set_defaults(func=cmd_restore)
+
+    imp = sub.add_parser("import", help="import reservations from a CSV or JSON file")
+    imp.add_argument("file")
+    imp.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    imp.set_defaults(func=cmd_import)
+
+    ex = sub.add_parser("export", help="stream reservations or the audit log as CSV")
+    ex.add_argument("table", choices=["reservations", "audit"])
+    ex.add_argument("--from", dest="date_from", help="YYYY-MM-DD, inclusive (default: no lower bound)")
+    ex.add_argument("--to", dest="date_to", help="YYYY-MM-DD, inclusive (default: no upper bound)")
+    ex.add_argument("--room", help="reservations of one room only")
+    ex.add_argument("--out", help="CSV file to write (default: stdout)")
+    ex.set_defaults(func=cmd_export)
+
+    rp = sub.add_parser("report", help="room-nights, revenue, ADR, RevPAR and occupancy per period")
+    rp.add_argument("--from", dest="date_from", help="YYYY-MM-DD, inclusive (default: Jan 1 of --to's year)")
+    rp.add_argument("--to", dest="date_to", help="YYYY-MM-DD, inclusive (default: today)")
+    rp.add_argument("--period", choices=core.REPORT_PERIODS, default="month")
+    rp.add_argument("--json", action="store_true", help="print the report as JSON")
+    rp.set_defaults(func=cmd_report)
+
+    stt = sub.add_parser("stats", help="check (and optionally rebuild) the daily_stats table")
+    stt.add_argument("--rebuild", action="store_true", help="recompute daily_stats from reservations first")
+    stt.add_argument("--check", action="store_true", help="compare daily_stats with reservations (the default)")
+    stt.add_argument("--show", type=int, default=20, help="mismatching days to print (default: %(default)s)")
+    stt.set_defaults(func=cmd_stats)
+
+    av = sub.add_parser("availability", help="rooms free for a stay, with quotes")
+    av.add_argument("--from", dest="date_from", required=True, help="check-in, YYYY-MM-DD")
+    av.add_argument("--to", dest="date_to", required=True, help="check-out, YYYY-MM-DD")
+    av.add_argument("--json", action="store_true", help="print the rooms as JSON")
+    av.set_defaults(func=cmd_availability)
+    return p
+
+
+def _cli_user() -> str:
+    # getuser() raises OSError under cron or in containers without a passwd entry
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        return os.environ.get("USER", "cli")
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    core.DB_PATH = args.db
+    core.BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(args.db)), "backups")
+    core.set_actor_provider(lambda: (f"cli:{_cli_user()}", "admin"))
+    core.bootstrap()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
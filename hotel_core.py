@@ -0,0 +1,3106 @@
+"""Isla Verde Hotel Manager — data layer.
+
+Everything that touches hotel.db lives here: connection pool, schema and
+migrations, rooms, reservations, FX, audit log and backups. It imports
+neither Streamlit nor pandas, so scripts, the CLI (hotel_cli.py) and the
+benchmarks can use it directly; app.py is the Streamlit UI on top of it.
+"""
+
+import os
+import bisect
+import csv
+import glob
+import hashlib
+import io
+import json
+import math
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterator, Optional, List, Dict, Tuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# ============================================================
+# CONFIG
+# ============================================================
+DB_PATH = "hotel.db"
+DB_POOL_SIZE = 8
+DB_STATEMENT_CACHE = 256
+DB_BUSY_TIMEOUT_MS = 5000
+# writers take the lock up front (BEGIN IMMEDIATE): each attempt waits this long,
+# then backs off (doubling from DB_WRITE_BACKOFF_MS, jittered) before retrying
+DB_WRITE_LOCK_WAIT_MS = 20
+DB_WRITE_RETRIES = 8
+DB_WRITE_BACKOFF_MS = 5.0
+DB_WRITE_BACKOFF_MAX_MS = 250.0
+# route writes through one in-process writer thread that commits them in groups
+WRITE_QUEUE_ENABLED = False
+WRITE_BATCH_MAX = 32
+# how long the writer waits for more jobs after the first (0: take only what is queued)
+WRITE_BATCH_WAIT_MS = 0.0
+# keep active reservations per room in memory for O(log n) conflict checks
+CONFLICT_INDEX_ENABLED = False
+
+STATUSES: List[Tuple[str, str]] = [
+    ("reserved", "Reserved"),
+    ("checkedin", "Checked In"),
+    ("noshow", "No Show"),
+    ("checkedout", "Checked Out"),
+]
+STATUS_LABEL = {k: v for k, v in STATUSES}
+VALID_STATUSES = {k for k, _ in STATUSES}
+# statuses that no longer hold the room (ignored by the conflict check)
+RELEASED_STATUSES = {"noshow", "checkedout"}
+# no-shows never used the room: reports and daily_stats count no nights or revenue for them
+REPORT_EXCLUDED_STATUSES = ("noshow",)
+
+CURRENCIES = [("USD", "$"), ("CRC", "₡")]
+CURRENCY_SYMBOL = {code: sym for code, sym in CURRENCIES}
+
+BACKUP_DIR = "backups"
+BACKUP_RETENTION_DAYS = 30
+# "full": one complete copy per day (hotel_<date>.db)
+# "incremental": a base snapshot plus one file of changed pages per run
+BACKUP_MODE = "incremental"
+# start a new base snapshot after this many days (older chains expire as a whole)
+BACKUP_REBASE_DAYS = 7
+
+# rows fetched (and CSV bytes yielded) per step of a streaming export
+EXPORT_CHUNK_ROWS = 2000
+AUDIT_PAGE_SIZE = 50
+HISTORY_PAGE_SIZE = 50
+
+# statements slower than this (ms) go to slow_query; the "slow_query_ms" setting overrides it
+SLOW_QUERY_MS = 100.0
+SLOW_QUERY_KEEP = 500
+# statements kept per query log (totals still count the rest)
+QUERY_LOG_MAX_ENTRIES = 1000
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+def now_utc() -> str:
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def iso(d: date) -> str:
+    return d.isoformat()
+
+
+def parse_iso(s: str) -> date:
+    try:
+        return date.fromisoformat(str(s)[:10])
+    except Exception:
+        return date.today()
+
+
+def nights(ci: date, co: date) -> int:
+    try:
+        return max(0, (co - ci).days)
+    except Exception:
+        return 0
+
+
+def normalize_guest_name(name: str) -> str:
+    return " ".join((name or "").strip().split())
+
+
+def safe_float(x, default: float = 0.0) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return default
+
+
+def fmt_money(amount: float, currency: str) -> str:
+    sym = CURRENCY_SYMBOL.get(currency, "")
+    try:
+        return f"{sym}{float(amount):,.2f}"
+    except Exception:
+        return f"{sym}{amount}"
+
+
+def calc_total_usd(tariff_usd: float, tax_usd: float, nn: int) -> float:
+    try:
+        return max(0.0, (float(tariff_usd) + float(tax_usd)) * int(nn))
+    except Exception:
+        return 0.0
+
+
+def usd_to_crc(usd: float, fx: float) -> Optional[float]:
+    if fx <= 0:
+        return None
+    return float(usd) * float(fx)
+
+
+# ============================================================
+# ACTOR (who audit rows are attributed to)
+# ============================================================
+_actor_provider: Callable[[], Tuple[str, str]] = lambda: ("system", "system")
+_actor_local = threading.local()
+
+
+def set_actor_provider(fn: Callable[[], Tuple[str, str]]):
+    """Register how to find the current (user, role); the UI reads its session."""
+    global _actor_provider
+    _actor_provider = fn
+
+
+@contextmanager
+def acting_as(user: str, role: str):
+    """Attribute writes on this thread to (user, role) for the duration of the block."""
+    previous = getattr(_actor_local, "actor", None)
+    _actor_local.actor = (user, role)
+    try:
+        yield
+    finally:
+        _actor_local.actor = previous
+
+
+def current_actor() -> Tuple[str, str]:
+    actor = getattr(_actor_local, "actor", None)
+    return actor if actor is not None else _actor_provider()
+
+
+# ============================================================
+# DB
+# ============================================================
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE, factory=TimedConnection
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)};")
+    return conn
+
+
+def _begin_immediate(conn: sqlite3.Connection) -> int:
+    """Open a write transaction, taking the write lock now; returns the retries used.
+
+    A deferred transaction only asks for the lock at its first write, after
+    its reads -- two sessions can both pass a conflict check and then queue
+    up behind busy_timeout. Here each attempt waits DB_WRITE_LOCK_WAIT_MS and
+    then sleeps a jittered, doubling backoff; after DB_WRITE_RETRIES the
+    "database is locked" error goes to the caller.
+    """
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_WRITE_LOCK_WAIT_MS)};")
+    try:
+        backoff = DB_WRITE_BACKOFF_MS
+        for attempt in range(DB_WRITE_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE;")
+                return attempt
+            except sqlite3.OperationalError as e:
+                msg = str(e).lower()
+                if attempt == DB_WRITE_RETRIES or ("locked" not in msg and "busy" not in msg):
+                    raise
+            time.sleep(backoff * random.uniform(0.5, 1.5) / 1000.0)
+            backoff = min(backoff * 2, DB_WRITE_BACKOFF_MAX_MS)
+        return DB_WRITE_RETRIES
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)};")
+
+
+class ConnectionPool:
+    """Keeps warmed connections around instead of reconnecting on every db() call.
+
+    A thread checks out one connection for its outermost db() block; nested
+    db() blocks on the same thread share it (and its transaction). When the
+    outermost block ends the connection goes back to the idle list.
+
+    on_commit callbacks run under commit_lock together with the COMMIT, so a
+    writer that holds commit_lock sees in-memory state (the conflict index)
+    that matches the database. Callbacks must not touch the database.
+    """
+
+    def __init__(self, max_idle: int = DB_POOL_SIZE):
+        self.max_idle = max_idle
+        self._idle: List[Tuple[str, sqlite3.Connection]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.commit_lock = threading.Lock()
+        self.stats = {"opened": 0, "reused": 0, "closed": 0, "write_retries": 0, "write_lock_failures": 0}
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._lock:
+            while self._idle:
+                path, conn = self._idle.pop()
+                if path == DB_PATH:
+                    self.stats["reused"] += 1
+                    return conn
+                conn.close()
+                self.stats["closed"] += 1
+            self.stats["opened"] += 1
+        return _connect()
+
+    def _checkin(self, conn: sqlite3.Connection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((DB_PATH, conn))
+                return
+            self.stats["closed"] += 1
+        conn.close()
+
+    def _begin_write(self, conn: sqlite3.Connection):
+        try:
+            retries = _begin_immediate(conn)
+        except sqlite3.OperationalError:
+            with self._lock:
+                self.stats["write_lock_failures"] += 1
+            raise
+        if retries:
+            with self._lock:
+                self.stats["write_retries"] += retries
+
+    @contextmanager
+    def connection(self, immediate: bool = False):
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            # nested db(): join the outer block's connection and transaction
+            conn = self._local.conn
+            self._local.depth = depth + 1
+            try:
+                # reads don't open a transaction, so a write block nested in a
+                # read-only one can still take the lock up front
+                if immediate and not conn.in_transaction:
+                    self._begin_write(conn)
+                yield conn
+            finally:
+                self._local.depth = depth
+            return
+
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.depth = 1
+        self._local.on_commit = []
+        healthy = True
+        try:
+            if immediate:
+                self._begin_write(conn)
+            yield conn
+            callbacks = self._local.on_commit
+            self._local.on_commit = []
+            if callbacks:
+                with self.commit_lock:
+                    conn.commit()
+                    for fn in callbacks:
+                        fn()
+            else:
+                conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                healthy = False
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._local.on_commit = []
+            if healthy:
+                self._checkin(conn)
+            else:
+                conn.close()
+
+    def on_commit(self, fn: Callable[[], None]):
+        """Run fn after the current thread's transaction commits (dropped on rollback)."""
+        if getattr(self._local, "depth", 0):
+            self._local.on_commit.append(fn)
+        else:
+            fn()
+
+    def in_transaction(self) -> bool:
+        """True while this thread's db() block has an open (uncommitted) transaction."""
+        return bool(getattr(self._local, "depth", 0)) and self._local.conn.in_transaction
+
+    def pending_callbacks(self) -> int:
+        """on_commit callbacks queued so far by this thread's open transaction."""
+        return len(self._local.on_commit) if getattr(self._local, "depth", 0) else 0
+
+    def discard_callbacks(self, keep: int):
+        """Drop the callbacks queued after the first keep (their savepoint rolled back)."""
+        if getattr(self._local, "depth", 0):
+            del self._local.on_commit[keep:]
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.stats["closed"] += len(idle)
+        for _, conn in idle:
+            conn.close()
+
+
+_POOL = ConnectionPool()
+
+
+def _db_pool() -> ConnectionPool:
+    return _POOL
+
+
+@contextmanager
+def db(immediate: bool = False):
+    """Connection for one transaction; immediate=True takes the write lock up front."""
+    with _db_pool().connection(immediate) as conn:
+        yield conn
+
+
+def on_commit(fn: Callable[[], None]):
+    _db_pool().on_commit(fn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    pool = _db_pool()
+    with pool._lock:
+        return dict(pool.stats, idle=len(pool._idle))
+
+
+class ReadCache:
+    """Process-wide cache for rarely-changing reads (rooms, settings).
+
+    Writers bump a global generation after their transaction commits; any
+    entry stored under an older generation is dropped and reloaded.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._data: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key: str, loader: Callable[[], object]):
+        ckey = (DB_PATH, key)
+        with self._lock:
+            if ckey in self._data:
+                self.stats["hits"] += 1
+                return self._data[ckey]
+            self.stats["misses"] += 1
+            gen = self.generation
+        # inside a write the loader may see rows that could still roll back
+        uncommitted = _db_pool().in_transaction()
+        value = loader()
+        with self._lock:
+            # a write committed while we were loading; don't keep what we read
+            if self.generation == gen and not uncommitted:
+                self._data[ckey] = value
+        return value
+
+    def bump(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self.stats["invalidations"] += 1
+
+
+_READ_CACHE = ReadCache()
+
+
+def _read_cache() -> ReadCache:
+    return _READ_CACHE
+
+
+def invalidate_read_cache():
+    """Call inside a write's db() block; the bump happens once it commits."""
+    on_commit(_read_cache().bump)
+
+
+def read_cache_stats() -> Dict[str, int]:
+    cache = _read_cache()
+    with cache._lock:
+        return dict(cache.stats, generation=cache.generation, entries=len(cache._data))
+
+
+# ============================================================
+# WRITE QUEUE (optional single writer with group commit)
+# ============================================================
+class WriteJob:
+    __slots__ = ("fn", "args", "kwargs", "actor", "future")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, actor: Tuple[str, str]):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.actor = actor
+        self.future: Future = Future()
+
+
+class WriteQueue:
+    """One writer thread that commits queued write jobs in groups.
+
+    Sessions submit(fn, ...) and get a Future back. The writer takes the jobs
+    waiting in the queue (up to batch_max) and runs them in one BEGIN
+    IMMEDIATE transaction, each inside its own SAVEPOINT: a job that raises is
+    rolled back alone and its future gets the exception, the others commit
+    together and get their return values. Sessions no longer fight over the
+    write lock, and a batch pays for one commit.
+
+    Jobs run with the submitting session's actor. A job may submit (or
+    run_write) another job, which runs at once in a nested savepoint; it must
+    not wait on jobs from other sessions, and a session must not wait on a
+    job from inside its own db() block.
+    """
+
+    def __init__(self, batch_max: int = WRITE_BATCH_MAX, wait_ms: float = WRITE_BATCH_WAIT_MS):
+        self.batch_max = batch_max
+        self.wait_ms = wait_ms
+        self._queue: "queue.Queue[Optional[WriteJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"jobs": 0, "failed": 0, "batches": 0, "max_batch": 0}
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        job = WriteJob(fn, args, kwargs, current_actor())
+        if threading.current_thread() is self._thread:
+            # a job writing more: run it now, in a savepoint of the batch's
+            # transaction, so a failure undoes only its own writes
+            if job.future.set_running_or_notify_cancel():
+                with db() as conn:
+                    ok, result = self._run_in_savepoint(conn, job)
+                if ok:
+                    job.future.set_result(result)
+            return job.future
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="hotel-writer", daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+        return job.future
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish the queued jobs and end the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _next_batch(self) -> Optional[List[WriteJob]]:
+        job = self._queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        deadline = time.perf_counter() + self.wait_ms / 1000.0
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._commit(batch)
+
+    def _commit(self, batch: List[WriteJob]):
+        done: List[Tuple[WriteJob, object]] = []
+        failed = 0
+        try:
+            with db(immediate=True) as conn:
+                for job in batch:
+                    if not job.future.set_running_or_notify_cancel():
+                        continue
+                    ok, result = self._run_in_savepoint(conn, job)
+                    if ok:
+                        done.append((job, result))
+                    else:
+                        failed += 1
+        except Exception as e:
+            # the batch itself failed (lock, commit): every job still waiting gets the error
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                    failed += 1
+        else:
+            for job, result in done:
+                job.future.set_result(result)
+        with self._lock:
+            self.stats["jobs"] += len(batch)
+            self.stats["failed"] += failed
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+    @staticmethod
+    def _run_in_savepoint(conn: sqlite3.Connection, job: WriteJob) -> Tuple[bool, object]:
+        """Run job in its own SAVEPOINT: (True, result), or (False, None) once a
+        failure is rolled back and set on the job's future."""
+        pool = _db_pool()
+        mark = pool.pending_callbacks()
+        conn.execute("SAVEPOINT write_job;")
+        try:
+            with acting_as(*job.actor):
+                result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            conn.execute("ROLLBACK TO write_job;")
+            conn.execute("RELEASE write_job;")
+            pool.discard_callbacks(mark)
+            job.future.set_exception(e)
+            return False, None
+        conn.execute("RELEASE write_job;")
+        return True, result
+
+
+def _run_job(job: WriteJob):
+    if not job.future.set_running_or_notify_cancel():
+        return
+    try:
+        result = job.fn(*job.args, **job.kwargs)
+    except Exception as e:
+        job.future.set_exception(e)
+    else:
+        job.future.set_result(result)
+
+
+_WRITE_QUEUE = WriteQueue()
+
+
+def _write_queue() -> WriteQueue:
+    return _WRITE_QUEUE
+
+
+def submit_write(fn: Callable, *args, **kwargs) -> Future:
+    """Run fn(*args, **kwargs) as a write job and return its Future.
+
+    With WRITE_QUEUE_ENABLED the job goes to the writer thread; otherwise it
+    runs right here. Either way the Future carries fn's result or exception.
+    """
+    if WRITE_QUEUE_ENABLED:
+        return _write_queue().submit(fn, *args, **kwargs)
+    job = WriteJob(fn, args, kwargs, current_actor())
+    _run_job(job)
+    return job.future
+
+
+def run_write(fn: Callable, *args, **kwargs):
+    """submit_write() and wait: returns fn's result or raises its exception."""
+    return submit_write(fn, *args, **kwargs).result()
+
+
+def write_queue_stats() -> Dict[str, int]:
+    wq = _write_queue()
+    with wq._lock:
+        return dict(wq.stats, queued=wq._queue.qsize())
+
+
+# ============================================================
+# QUERY LOG (statement timing per rerun, slow-query table)
+# ============================================================
+_query_local = threading.local()
+_QUERY_TOTALS: Dict[str, Dict[str, float]] = {}
+_QUERY_TOTALS_LOCK = threading.Lock()
+
+
+def _param_shape(params) -> str:
+    """Types of the bound parameters, never their values."""
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+class QueryRecord:
+    __slots__ = ("sql", "shape", "ms", "rows", "slow")
+
+    def __init__(self, sql: str, shape: str):
+        self.sql = sql
+        self.shape = shape
+        self.ms = 0.0
+        self.rows = 0
+        self.slow = False
+
+
+class QueryLog:
+    """Statements run on one thread while the log is active (one Streamlit rerun).
+
+    A statement's time covers execute() and every fetch from its cursor.
+    Statements that reach threshold_ms are kept in pending_slow and written
+    to slow_query, with their EXPLAIN QUERY PLAN, by finish_query_log(), so
+    read-only reruns never write in the middle of a db() block.
+    """
+
+    def __init__(self, label: str = "", threshold_ms: float = SLOW_QUERY_MS):
+        self.label = label
+        self.threshold_ms = threshold_ms
+        self.records: List[QueryRecord] = []
+        self.statements = 0
+        self.ms = 0.0
+        self.rows = 0
+        self.finished = False
+        self.pending_slow: List[Tuple[QueryRecord, object]] = []
+
+    def add(self, sql: str, shape: str) -> QueryRecord:
+        rec = QueryRecord(sql, shape)
+        self.statements += 1
+        if len(self.records) < QUERY_LOG_MAX_ENTRIES:
+            self.records.append(rec)
+        return rec
+
+    def top(self, n: int = 20) -> List[QueryRecord]:
+        return sorted(self.records, key=lambda r: r.ms, reverse=True)[:n]
+
+
+def _active_query_log() -> Optional[QueryLog]:
+    return getattr(_query_local, "log", None)
+
+
+class TimedCursor(sqlite3.Cursor):
+    _log: Optional[QueryLog] = None
+    _rec: Optional[QueryRecord] = None
+    _params: object = ()
+
+    def _start(self, sql: str, shape: str, params):
+        self._log = _active_query_log()
+        self._rec = self._log.add(sql, shape) if self._log is not None else None
+        self._params = params
+
+    def _charge(self, t0: float, rows: int):
+        rec = self._rec
+        if rec is None:
+            return
+        ms = (time.perf_counter() - t0) * 1000.0
+        rec.ms += ms
+        rec.rows += rows
+        log = self._log
+        log.ms += ms
+        log.rows += rows
+        if not rec.slow and rec.ms >= log.threshold_ms:
+            rec.slow = True
+            log.pending_slow.append((rec, self._params))
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, _param_shape(parameters), parameters)
+        t0 = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._charge(t0, max(self.rowcount, 0))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters:
+            first = seq_of_parameters[0]
+            shape = f"{len(seq_of_parameters)} x {_param_shape(first)}"
+        else:
+            first, shape = None, "many"
+        self._start(sql, shape, first)
+        t0 = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._charge(t0, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._charge(t0, row is not None)
+        return row
+
+    def fetchmany(self, size: Optional[int] = None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._charge(t0, len(rows))
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._charge(t0, len(rows))
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._charge(t0, 0)
+            raise
+        self._charge(t0, 1)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    """Hands out TimedCursor while a query log is active on this thread; plain cursors otherwise."""
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TimedCursor if _active_query_log() is not None else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if _active_query_log() is None:
+            return super().execute(sql, parameters)
+        return self.cursor(TimedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _active_query_log() is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor(TimedCursor).executemany(sql, seq_of_parameters)
+
+
+def _save_slow_queries(label: str, pending: List[Tuple[QueryRecord, object]]):
+    """Write job: store slow statements with their plan and trim slow_query to SLOW_QUERY_KEEP."""
+    # plain sqlite3 calls so none of this is timed into a query log
+    tstamp = now_utc()
+    with db(immediate=True) as conn:
+        rows = []
+        for rec, params in pending:
+            try:
+                plan = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + rec.sql, params or ()).fetchall()
+                plan_text = "\n".join(str(p[3]) for p in plan)
+            except (sqlite3.Error, ValueError):
+                plan_text = ""
+            rows.append((tstamp, label, " ".join(rec.sql.split()), rec.shape, round(rec.ms, 3), rec.rows, plan_text))
+        sqlite3.Connection.executemany(
+            conn,
+            "INSERT INTO slow_query(ts, label, sql, params, ms, rows, plan) VALUES(?,?,?,?,?,?,?);",
+            rows,
+        )
+        sqlite3.Connection.execute(
+            conn,
+            "DELETE FROM slow_query WHERE id <= (SELECT MAX(id) FROM slow_query) - ?;",
+            (SLOW_QUERY_KEEP,),
+        )
+
+
+def start_query_log(label: str = "") -> QueryLog:
+    """Time every statement this thread runs until finish_query_log()."""
+    try:
+        threshold = float(get_setting("slow_query_ms", str(SLOW_QUERY_MS)))
+    except ValueError:
+        threshold = SLOW_QUERY_MS
+    log = QueryLog(label, threshold)
+    _query_local.log = log
+    return log
+
+
+def finish_query_log(log: QueryLog):
+    """Stop logging (if log is this thread's) and add it to the per-label totals, once.
+
+    The log's slow statements go to slow_query here, as one write job per
+    rerun; if that write fails (no slow_query table yet, database busy) they
+    are dropped.
+    """
+    if _active_query_log() is log:
+        _query_local.log = None
+    if log.finished:
+        return
+    log.finished = True
+    if log.pending_slow:
+        pending, log.pending_slow = log.pending_slow, []
+        submit_write(_save_slow_queries, log.label, pending)
+    with _QUERY_TOTALS_LOCK:
+        totals = _QUERY_TOTALS.setdefault(
+            log.label or "-", {"runs": 0, "statements": 0, "ms": 0.0, "rows": 0, "max_ms": 0.0}
+        )
+        totals["runs"] += 1
+        totals["statements"] += log.statements
+        totals["ms"] += log.ms
+        totals["rows"] += log.rows
+        totals["max_ms"] = max(totals["max_ms"], log.ms)
+
+
+def query_totals() -> List[Dict]:
+    """Finished query logs summed per label, slowest total first."""
+    with _QUERY_TOTALS_LOCK:
+        out = [dict(v, label=k) for k, v in _QUERY_TOTALS.items()]
+    for row in out:
+        row["avg_ms"] = row["ms"] / row["runs"] if row["runs"] else 0.0
+    return sorted(out, key=lambda r: r["ms"], reverse=True)
+
+
+def reset_query_totals():
+    with _QUERY_TOTALS_LOCK:
+        _QUERY_TOTALS.clear()
+
+
+def get_slow_queries(limit: int = 20) -> List[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            "SELECT id, ts, label, sql, params, ms, rows, plan FROM slow_query ORDER BY ms DESC LIMIT ?;",
+            (int(limit),),
+        ).fetchall()
+
+
+def clear_slow_queries():
+    with db() as conn:
+        conn.execute("DELETE FROM slow_query;")
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?;",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def column_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
+    rows = conn.execute(f"PRAGMA table_info({table});").fetchall()
+    return any(r["name"] == col for r in rows)
+
+
+def ensure_column(conn: sqlite3.Connection, table: str, col_def_sql: str, col_name: str):
+    if table_exists(conn, table) and not column_exists(conn, table, col_name):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {col_def_sql};")
+
+
+def _migrate_reservation_indexes(conn: sqlite3.Connection):
+    # room conflict probe, date window (El Roll), guest history
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_room_dates "
+        "ON reservations(room_id, check_in, check_out);"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_dates "
+        "ON reservations(check_in, check_out);"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_guest "
+        "ON reservations(guest_name, check_in);"
+    )
+
+
+def _migrate_guest_name_fts(conn: sqlite3.Connection):
+    # trigram FTS over reservations.guest_name (external content, kept in sync by triggers)
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS reservations_guest_fts USING fts5(
+                guest_name,
+                content='reservations',
+                content_rowid='id',
+                tokenize='trigram'
+            );
+            """
+        )
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 / trigram: search_guests falls back to LIKE
+        return
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS reservations_guest_fts_ai AFTER INSERT ON reservations BEGIN
+            INSERT INTO reservations_guest_fts(rowid, guest_name) VALUES (new.id, new.guest_name);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS reservations_guest_fts_ad AFTER DELETE ON reservations BEGIN
+            INSERT INTO reservations_guest_fts(reservations_guest_fts, rowid, guest_name)
+            VALUES ('delete', old.id, old.guest_name);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS reservations_guest_fts_au AFTER UPDATE OF guest_name ON reservations BEGIN
+            INSERT INTO reservations_guest_fts(reservations_guest_fts, rowid, guest_name)
+            VALUES ('delete', old.id, old.guest_name);
+            INSERT INTO reservations_guest_fts(rowid, guest_name) VALUES (new.id, new.guest_name);
+        END;
+        """
+    )
+    conn.execute("INSERT INTO reservations_guest_fts(reservations_guest_fts) VALUES ('rebuild');")
+
+
+def _migrate_audit_indexes(conn: sqlite3.Connection):
+    # audit browser: each equality filter keeps id as the trailing key so a
+    # keyset page is one index seek; ts serves the date range filter
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_log(user, id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action, id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_entity ON audit_log(entity, entity_id, id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_log(ts);")
+
+
+def _migrate_daily_stats(conn: sqlite3.Connection):
+    # per-day totals of sold nights, kept current by the reservation writers
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            occupied_rooms INTEGER NOT NULL DEFAULT 0,
+            guests INTEGER NOT NULL DEFAULT 0,
+            revenue_cents INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        """
+    )
+    rebuild_daily_stats()  # nested db(): joins this migration's transaction
+
+
+def _migrate_room_checkout_index(conn: sqlite3.Connection):
+    # overlap probes seek on check_out > new check_in, which skips a room's
+    # past stays; check_in and status ride along so the index covers the probe
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_room_checkout "
+        "ON reservations(room_id, check_out, check_in, status);"
+    )
+
+
+def _migrate_slow_query(conn: sqlite3.Connection):
+    # statements over the slow-query threshold, with the plan SQLite chose
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS slow_query (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,
+            label TEXT,
+            sql TEXT NOT NULL,
+            params TEXT,
+            ms REAL NOT NULL,
+            rows INTEGER,
+            plan TEXT
+        );
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_slow_query_ms ON slow_query(ms);")
+
+
+RESERVATION_GENERATED_COLUMNS = [
+    ("check_in_jd", "REAL GENERATED ALWAYS AS (julianday(check_in)) VIRTUAL"),
+    ("check_out_jd", "REAL GENERATED ALWAYS AS (julianday(check_out)) VIRTUAL"),
+    ("nights", "INTEGER GENERATED ALWAYS AS (MAX(0, CAST(julianday(check_out) - julianday(check_in) AS INTEGER))) VIRTUAL"),
+    # same rule as calc_total_usd()
+    ("total_usd", "REAL GENERATED ALWAYS AS (MAX(0, (COALESCE(tariff, 0) + COALESCE(tax, 0)) * nights)) VIRTUAL"),
+]
+
+
+def _migrate_generated_columns(conn: sqlite3.Connection):
+    # ALTER TABLE can only add VIRTUAL generated columns: they are computed on
+    # read, and the indexes below store them so sums and sorts by stay value
+    # don't evaluate the expression per row
+    existing = {r["name"] for r in conn.execute("PRAGMA table_xinfo(reservations);")}
+    for name, col_def in RESERVATION_GENERATED_COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE reservations ADD COLUMN {name} {col_def};")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservations_total ON reservations(total_usd);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservations_room_total ON reservations(room_id, total_usd);")
+
+
+def _migrate_reservation_version(conn: sqlite3.Connection):
+    # bumped by every UPDATE; an edit form sends back the version it loaded
+    existing = {r["name"] for r in conn.execute("PRAGMA table_xinfo(reservations);")}
+    if "version" not in existing:
+        conn.execute("ALTER TABLE reservations ADD COLUMN version INTEGER NOT NULL DEFAULT 1;")
+
+
+def _migrate_room_history_index(conn: sqlite3.Connection):
+    # room history pages sort by (check_in, id); idx_reservations_room_dates
+    # has check_out in between, which leaves a temp B-tree sort per page
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_room_history "
+        "ON reservations(room_id, check_in, id);"
+    )
+
+
+# Versioned schema migrations, tracked in PRAGMA user_version.
+# Append new steps at the end; never renumber or edit applied ones.
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migrate_reservation_indexes),
+    (2, _migrate_guest_name_fts),
+    (3, _migrate_audit_indexes),
+    (4, _migrate_daily_stats),
+    (5, _migrate_room_checkout_index),
+    (6, _migrate_slow_query),
+    (7, _migrate_generated_columns),
+    (8, _migrate_reservation_version),
+    (9, _migrate_room_history_index),
+]
+
+
+def run_migrations(conn: sqlite3.Connection):
+    current = int(conn.execute("PRAGMA user_version;").fetchone()[0])
+    for version, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(conn)
+        conn.execute(f"PRAGMA user_version = {int(version)};")
+        current = version
+
+
+def init_db():
+    with db() as conn:
+        # rooms include default pricing (USD)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rooms (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                number TEXT NOT NULL UNIQUE,
+                default_tariff REAL DEFAULT 0,
+                default_tax REAL DEFAULT 0
+            );
+            """
+        )
+
+        # reservations store USD tariff & tax
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER NOT NULL,
+                guest_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                check_in TEXT NOT NULL,
+                check_out TEXT NOT NULL,
+                notes TEXT DEFAULT "",
+                num_guests INTEGER DEFAULT 1,
+                tariff REAL DEFAULT 0,
+                tax REAL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY(room_id) REFERENCES rooms(id) ON DELETE CASCADE
+            );
+            """
+        )
+
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts TEXT NOT NULL,
+                user TEXT NOT NULL,
+                role TEXT NOT NULL,
+                action TEXT NOT NULL,
+                entity TEXT NOT NULL,
+                entity_id INTEGER,
+                details TEXT
+            );
+            """
+        )
+
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+
+        # daily exchange rate table
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fx_daily (
+                day TEXT PRIMARY KEY,
+                fx_usd_crc REAL NOT NULL,
+                ts TEXT NOT NULL,
+                user TEXT NOT NULL,
+                role TEXT NOT NULL
+            );
+            """
+        )
+
+        # migrations for old DBs
+        ensure_column(conn, "rooms", "default_tariff REAL DEFAULT 0", "default_tariff")
+        ensure_column(conn, "rooms", "default_tax REAL DEFAULT 0", "default_tax")
+        ensure_column(conn, "reservations", "tariff REAL DEFAULT 0", "tariff")
+        ensure_column(conn, "reservations", "tax REAL DEFAULT 0", "tax")
+
+        run_migrations(conn)
+        # refresh planner statistics for tables that grew since the last run;
+        # stats taken on a near-empty table make the planner pick table scans
+        conn.execute("PRAGMA optimize;")
+
+
+def get_setting(key: str, default: str) -> str:
+    def load() -> Optional[str]:
+        with db() as conn:
+            row = conn.execute("SELECT value FROM settings WHERE key=?;", (key,)).fetchone()
+            return str(row["value"]) if row else None
+
+    value = _read_cache().get(f"setting:{key}", load)
+    return value if value is not None else default
+
+
+def set_setting(key: str, value: str):
+    with db() as conn:
+        conn.execute(
+            "INSERT INTO settings(key,value) VALUES(?,?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value;",
+            (key, str(value)),
+        )
+        invalidate_read_cache()
+
+
+def default_room_numbers() -> List[str]:
+    nums: List[int] = []
+    nums += list(range(101, 108))
+    nums += list(range(201, 212))
+    nums += list(range(214, 220))
+    nums += list(range(221, 229))
+    nums += list(range(301, 309))
+    return [str(n) for n in nums]
+
+
+def seed_rooms_if_empty():
+    with db() as conn:
+        c = int(conn.execute("SELECT COUNT(*) AS c FROM rooms;").fetchone()["c"])
+        if c == 0:
+            for num in default_room_numbers():
+                conn.execute(
+                    "INSERT OR IGNORE INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
+                    (num, 0.0, 0.0),
+                )
+            invalidate_read_cache()
+
+
+AUDIT_INSERT_SQL = """
+    INSERT INTO audit_log(ts, user, role, action, entity, entity_id, details)
+    VALUES(?,?,?,?,?,?,?);
+"""
+
+_audit_local = threading.local()
+
+
+def log_audit(
+    action: str,
+    entity: str,
+    entity_id: Optional[int] = None,
+    details: str = "",
+    conn: Optional[sqlite3.Connection] = None,
+):
+    """Write an audit row.
+
+    Pass the caller's open connection to write it in the same transaction as
+    the change it describes. Inside audit_batch() rows are buffered instead.
+    """
+    user, role = current_actor()
+    row = (now_utc(), user, role, action, entity, entity_id, details)
+    buffer = getattr(_audit_local, "buffer", None)
+    if buffer is not None:
+        buffer.append(row)
+        return
+    if conn is not None:
+        conn.execute(AUDIT_INSERT_SQL, row)
+        return
+    with db() as own_conn:
+        own_conn.execute(AUDIT_INSERT_SQL, row)
+
+
+@contextmanager
+def audit_batch(conn: sqlite3.Connection):
+    """Buffer log_audit() rows on this thread and write them with one executemany.
+
+    The rows land in conn's transaction when the block exits; if the block
+    raises they are discarded along with the rest of the transaction.
+    """
+    if getattr(_audit_local, "buffer", None) is not None:
+        # already batching further up the stack
+        yield
+        return
+    _audit_local.buffer = []
+    try:
+        yield
+        rows = _audit_local.buffer
+    finally:
+        _audit_local.buffer = None
+    if rows:
+        conn.executemany(AUDIT_INSERT_SQL, rows)
+
+
+# ============================================================
+# DAILY FX (saved per day; tomorrow is empty again)
+# ============================================================
+class FxSeries:
+    """Every saved daily rate, oldest first.
+
+    Days without a saved rate take the previous one (forward fill); days
+    before the first saved rate have none (0.0 / NaN).
+    """
+
+    def __init__(self, rows: List[sqlite3.Row]):
+        self.rows: Dict[str, sqlite3.Row] = {r["day"]: r for r in rows}
+        self.days: List[str] = [r["day"] for r in rows]
+        self.rates: List[float] = [max(0.0, safe_float(r["fx_usd_crc"], 0.0)) for r in rows]
+        self._np = None
+
+    def rate_on(self, day: date) -> float:
+        i = bisect.bisect_right(self.days, iso(day)) - 1
+        return self.rates[i] if i >= 0 else 0.0
+
+    def _arrays(self):
+        import numpy as np
+
+        if self._np is None:
+            self._np = (
+                np.array(self.days, dtype="datetime64[D]"),
+                np.array(self.rates, dtype=np.float64),
+            )
+        return self._np
+
+    def rates_on(self, days):
+        """Vectorized rate_on(): one rate per entry of days (ISO strings or
+        dates), NaN where no rate had been saved yet."""
+        import numpy as np
+
+        fx_days, fx_rates = self._arrays()
+        if isinstance(days, np.ndarray) and days.dtype.kind == "M":
+            d = days.astype("datetime64[D]")
+        else:
+            d = np.asarray([str(x)[:10] for x in days], dtype="datetime64[D]")
+        out = np.full(len(d), np.nan)
+        if len(fx_rates):
+            pos = np.searchsorted(fx_days, d, side="right") - 1
+            ok = pos >= 0
+            out[ok] = fx_rates[pos[ok]]
+            out[out <= 0] = np.nan
+        return out
+
+    def daily_rates(self, start: date, end: date):
+        """Filled rate for every day from start to end (both inclusive)."""
+        import numpy as np
+
+        return self.rates_on(np.arange(np.datetime64(iso(start)), np.datetime64(iso(end)) + 1))
+
+    def to_crc(self, days, usd):
+        """Convert USD amounts at the rate of the matching day; NaN without a rate."""
+        import numpy as np
+
+        return np.asarray(usd, dtype=np.float64) * self.rates_on(days)
+
+
+def _load_fx_series() -> FxSeries:
+    with db() as conn:
+        return FxSeries(
+            conn.execute("SELECT day, fx_usd_crc, ts, user, role FROM fx_daily ORDER BY day;").fetchall()
+        )
+
+
+def get_fx_series() -> FxSeries:
+    """All rates, loaded once and kept until the next FX write."""
+    return _read_cache().get("fx_series", _load_fx_series)
+
+
+def get_fx_for_day(day: date) -> Optional[sqlite3.Row]:
+    return get_fx_series().rows.get(iso(day))
+
+
+def get_today_fx_value() -> float:
+    row = get_fx_for_day(date.today())
+    if not row:
+        return 0.0
+    return max(0.0, safe_float(row["fx_usd_crc"], 0.0))
+
+
+def save_today_fx(fx: float):
+    fx = max(0.0, float(fx))
+    today = iso(date.today())
+    user, role = current_actor()
+    with db() as conn:
+        conn.execute(
+            """
+            INSERT INTO fx_daily(day, fx_usd_crc, ts, user, role)
+            VALUES(?,?,?,?,?)
+            ON CONFLICT(day) DO UPDATE SET
+                fx_usd_crc=excluded.fx_usd_crc,
+                ts=excluded.ts,
+                user=excluded.user,
+                role=excluded.role;
+            """,
+            (today, fx, now_utc(), user, role),
+        )
+        invalidate_read_cache()
+        log_audit("UPDATE", "fx_daily", None, f"day={today}; fx_usd_crc={fx:.2f}", conn=conn)
+
+
+# ============================================================
+# CONFLICT INDEX (optional, in-memory)
+# ============================================================
+class RoomIntervalIndex:
+    """Active reservations per room as sorted [check_in, check_out) intervals.
+
+    Mirrors the SQL overlap probe in save_reservation: reservations whose status
+    is in RELEASED_STATUSES are not indexed. Dates are ISO strings, which sort
+    the same way as the dates themselves. Alongside each room's intervals,
+    _reach[room][i] is the latest check_out among intervals[: i + 1], so a
+    long stay still counts when shorter ones start after it (older databases
+    can hold overlapping active stays).
+    """
+
+    def __init__(self):
+        self._starts: Dict[int, List[str]] = {}
+        self._intervals: Dict[int, List[Tuple[str, str, int]]] = {}
+        self._reach: Dict[int, List[str]] = {}
+        self._by_id: Dict[int, Tuple[int, str, str]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def rebuild(self):
+        with db() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, room_id, check_in, check_out
+                FROM reservations
+                WHERE status NOT IN ('noshow', 'checkedout')
+                ORDER BY room_id, check_in, check_out, id;
+                """
+            ).fetchall()
+        with self._lock:
+            self._starts.clear()
+            self._intervals.clear()
+            self._reach.clear()
+            self._by_id.clear()
+            for r in rows:
+                room_id, ci, co, rid = int(r["room_id"]), str(r["check_in"]), str(r["check_out"]), int(r["id"])
+                self._starts.setdefault(room_id, []).append(ci)
+                self._intervals.setdefault(room_id, []).append((ci, co, rid))
+                self._by_id[rid] = (room_id, ci, co)
+            for room_id in self._intervals:
+                self._update_reach_locked(room_id, 0)
+            self.loaded = True
+
+    def clear(self):
+        with self._lock:
+            self._starts.clear()
+            self._intervals.clear()
+            self._reach.clear()
+            self._by_id.clear()
+
+    def _update_reach_locked(self, room_id: int, i: int):
+        # recompute the running max of check_out from position i on
+        intervals = self._intervals[room_id]
+        reach = self._reach.setdefault(room_id, [])
+        del reach[i:]
+        latest = reach[i - 1] if i > 0 else ""
+        for _, co, _ in intervals[i:]:
+            if co > latest:
+                latest = co
+            reach.append(latest)
+
+    def _remove_locked(self, res_id: int):
+        entry = self._by_id.pop(res_id, None)
+        if entry is None:
+            return
+        room_id, ci, co = entry
+        starts = self._starts[room_id]
+        intervals = self._intervals[room_id]
+        i = bisect.bisect_left(intervals, (ci, co, res_id))
+        if i < len(intervals) and intervals[i][2] == res_id:
+            del intervals[i]
+            del starts[i]
+            self._update_reach_locked(room_id, i)
+
+    def put(self, res_id: int, room_id: int, check_in: str, check_out: str, status: str):
+        """Insert or move a reservation; released statuses just drop it."""
+        with self._lock:
+            self._remove_locked(int(res_id))
+            if status in RELEASED_STATUSES:
+                return
+            item = (str(check_in), str(check_out), int(res_id))
+            intervals = self._intervals.setdefault(int(room_id), [])
+            i = bisect.bisect_left(intervals, item)
+            intervals.insert(i, item)
+            self._starts.setdefault(int(room_id), []).insert(i, item[0])
+            self._by_id[int(res_id)] = (int(room_id), item[0], item[1])
+            self._update_reach_locked(int(room_id), i)
+
+    def remove(self, res_id: int):
+        with self._lock:
+            self._remove_locked(int(res_id))
+
+    def drop_room(self, room_id: int):
+        with self._lock:
+            for _, _, rid in self._intervals.pop(int(room_id), []):
+                self._by_id.pop(rid, None)
+            self._starts.pop(int(room_id), None)
+            self._reach.pop(int(room_id), None)
+
+    def find_conflict(
+        self, room_id: int, check_in: str, check_out: str, exclude_id: Optional[int] = None
+    ) -> Optional[int]:
+        """Id of an indexed reservation overlapping [check_in, check_out), if any.
+
+        Only intervals starting before check_out can overlap. Walking back from
+        the last of them, the running max of check_out says when no earlier
+        interval can reach past check_in any more.
+        """
+        with self._lock:
+            starts = self._starts.get(int(room_id))
+            if not starts:
+                return None
+            intervals = self._intervals[int(room_id)]
+            reach = self._reach[int(room_id)]
+            ci = str(check_in)
+            i = bisect.bisect_left(starts, str(check_out))
+            while i > 0 and reach[i - 1] > ci:
+                i -= 1
+                _, co, rid = intervals[i]
+                if co > ci and (exclude_id is None or rid != int(exclude_id)):
+                    return rid
+            return None
+
+
+_ROOM_INDEX = RoomIntervalIndex()
+
+
+def _room_index() -> RoomIntervalIndex:
+    return _ROOM_INDEX
+
+
+def get_room_index() -> Optional[RoomIntervalIndex]:
+    if not CONFLICT_INDEX_ENABLED:
+        return None
+    index = _room_index()
+    if not index.loaded:
+        index.rebuild()
+    return index
+
+
+# ============================================================
+# DAILY STATS (materialized per-day totals)
+# ============================================================
+# One row per night a reservation is sold for (status not in
+# REPORT_EXCLUDED_STATUSES); revenue is tariff + tax per night, in cents so
+# that adding and removing stays never drifts.
+def _nights_cte(where: str) -> str:
+    excluded = ", ".join(f"'{s}'" for s in REPORT_EXCLUDED_STATUSES)
+    return f"""
+        WITH RECURSIVE n(day, co, pax, cents) AS (
+            SELECT check_in, check_out, COALESCE(num_guests, 0),
+                   CAST(ROUND(MAX(0, COALESCE(tariff, 0) + COALESCE(tax, 0)) * 100) AS INTEGER)
+            FROM reservations
+            WHERE {where} AND status NOT IN ({excluded}) AND check_in < check_out
+            UNION ALL
+            SELECT date(day, '+1 day'), co, pax, cents FROM n WHERE date(day, '+1 day') < co
+        )
+    """
+
+
+def _adjust_daily_stats(conn: sqlite3.Connection, where: str, params: Tuple, sign: int):
+    """Add (sign=1) or take away (sign=-1) the nights of the reservations
+    matching `where`; call it inside the transaction that writes them."""
+    conn.execute(
+        _nights_cte(where)
+        + """
+        INSERT INTO daily_stats(day, occupied_rooms, guests, revenue_cents)
+        SELECT day, ? * COUNT(*), ? * SUM(pax), ? * SUM(cents) FROM n WHERE true GROUP BY day
+        ON CONFLICT(day) DO UPDATE SET
+            occupied_rooms = occupied_rooms + excluded.occupied_rooms,
+            guests = guests + excluded.guests,
+            revenue_cents = revenue_cents + excluded.revenue_cents;
+        """,
+        (*params, sign, sign, sign),
+    )
+
+
+def _expected_daily_stats(conn: sqlite3.Connection) -> Dict[str, Tuple[int, int, int]]:
+    rows = conn.execute(
+        _nights_cte("1") + "SELECT day, COUNT(*), SUM(pax), SUM(cents) FROM n GROUP BY day;"
+    ).fetchall()
+    return {r[0]: (int(r[1]), int(r[2]), int(r[3])) for r in rows}
+
+
+def rebuild_daily_stats() -> int:
+    """Recompute daily_stats from all reservations; returns the number of days."""
+    with db() as conn:
+        conn.execute("DELETE FROM daily_stats;")
+        conn.execute(
+            _nights_cte("1")
+            + """
+            INSERT INTO daily_stats(day, occupied_rooms, guests, revenue_cents)
+            SELECT day, COUNT(*), SUM(pax), SUM(cents) FROM n GROUP BY day;
+            """
+        )
+        return int(conn.execute("SELECT COUNT(*) FROM daily_stats;").fetchone()[0])
+
+
+def check_daily_stats() -> List[Dict]:
+    """Days where daily_stats disagrees with the reservations (empty when
+    consistent). Rows that add up to zero count as missing."""
+    with db() as conn:
+        expected = _expected_daily_stats(conn)
+        stored = {
+            r["day"]: (int(r["occupied_rooms"]), int(r["guests"]), int(r["revenue_cents"]))
+            for r in conn.execute(
+                "SELECT day, occupied_rooms, guests, revenue_cents FROM daily_stats "
+                "WHERE occupied_rooms != 0 OR guests != 0 OR revenue_cents != 0;"
+            )
+        }
+    return [
+        {"day": day, "stored": stored.get(day), "expected": expected.get(day)}
+        for day in sorted(set(expected) | set(stored))
+        if stored.get(day) != expected.get(day)
+    ]
+
+
+def get_daily_stats(start: date, end: date) -> List[Dict]:
+    """Occupied rooms, guests and revenue for every day from start to end
+    (both inclusive), read from daily_stats; days without stays are zeros."""
+    with db() as conn:
+        rows = conn.execute(
+            "SELECT day, occupied_rooms, guests, revenue_cents FROM daily_stats WHERE day BETWEEN ? AND ?;",
+            (iso(start), iso(end)),
+        ).fetchall()
+    by_day = {r["day"]: r for r in rows}
+    out = []
+    for i in range((end - start).days + 1):
+        d = start + timedelta(days=i)
+        r = by_day.get(iso(d))
+        out.append(
+            {
+                "day": d,
+                "occupied_rooms": int(r["occupied_rooms"]) if r else 0,
+                "guests": int(r["guests"]) if r else 0,
+                "revenue_usd": int(r["revenue_cents"]) / 100 if r else 0.0,
+            }
+        )
+    return out
+
+
+# ============================================================
+# BACKUPS
+# ============================================================
+def ensure_backup_dir():
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+
+
+def _backup_day(filename: str, prefix: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(filename[len(prefix):len(prefix) + 10])
+    except ValueError:
+        return None
+
+
+def cleanup_old_backups(keep_days: int = BACKUP_RETENTION_DAYS):
+    ensure_backup_dir()
+    cutoff = date.today() - timedelta(days=keep_days)
+    for path in glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db")):
+        d = _backup_day(os.path.basename(path), "hotel_")
+        if d and d < cutoff:
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+    # a chain can only be restored as a whole, so it goes once its newest day expires
+    chains = _load_chains()
+    for chain in chains[:-1]:
+        if date.fromisoformat(chain["points"][-1]["day"]) < cutoff:
+            _remove_chain(chain)
+
+
+def _full_backup(force: bool) -> Dict:
+    today = date.today().isoformat()
+    final_path = os.path.join(BACKUP_DIR, f"hotel_{today}.db")
+    tmp_path = final_path + ".tmp"
+
+    if os.path.exists(final_path) and not force:
+        return {"mode": "full", "kind": "unchanged", "path": final_path, "bytes_written": 0}
+
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    except Exception:
+        pass
+
+    with db() as conn:
+        bconn = sqlite3.connect(tmp_path)
+        try:
+            conn.backup(bconn)
+            bconn.commit()
+        finally:
+            bconn.close()
+
+    os.replace(tmp_path, final_path)
+    return {"mode": "full", "kind": "full", "path": final_path, "bytes_written": os.path.getsize(final_path)}
+
+
+# ---- incremental backups ----
+# backups/base_<stamp>.db      plain copy of the database (a valid SQLite file)
+# backups/base_<stamp>.json    manifest: page size + restore points of the chain
+# backups/base_<stamp>.hashes  16-byte digest per page of the newest point
+# backups/delta_<stamp>.bin    pages that changed since the previous point
+DELTA_MAGIC = b"IVHDELTA1\n"
+PAGE_DIGEST_SIZE = 16
+
+
+def _page_size_of(path: str) -> int:
+    with open(path, "rb") as f:
+        header = f.read(100)
+    size = struct.unpack(">H", header[16:18])[0]
+    return 65536 if size == 1 else size
+
+
+def _iter_pages(path: str, page_size: int):
+    with open(path, "rb") as f:
+        pgno = 1
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield pgno, page
+            pgno += 1
+
+
+def _page_digest(page: bytes) -> bytes:
+    return hashlib.blake2b(page, digest_size=PAGE_DIGEST_SIZE).digest()
+
+
+@contextmanager
+def _snapshot_db_file():
+    """Yield the path of a temporary file holding a consistent image of the database.
+
+    The online backup API copies every page in one step inside a read
+    transaction; in WAL mode that never takes the write lock, so bookings
+    carry on while the copy is made and while the caller hashes it.
+    """
+    # a unique name, so two backups running at once don't share a scratch file
+    fd, tmp_path = tempfile.mkstemp(prefix="snapshot_", suffix=".tmp", dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            bconn = sqlite3.connect(tmp_path)
+            try:
+                # a scratch copy: no journal, no fsync
+                bconn.execute("PRAGMA journal_mode = OFF;")
+                bconn.execute("PRAGMA synchronous = OFF;")
+                conn.backup(bconn)
+            finally:
+                bconn.close()
+        finally:
+            conn.close()
+        yield tmp_path
+    finally:
+        os.remove(tmp_path)
+
+
+def _load_chains() -> List[Dict]:
+    chains = []
+    for path in sorted(glob.glob(os.path.join(BACKUP_DIR, "base_*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                chain = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if chain.get("points"):
+            chains.append(chain)
+    return chains
+
+
+def _chain_path(chain: Dict, ext: str) -> str:
+    return os.path.join(BACKUP_DIR, f"base_{chain['stamp']}{ext}")
+
+
+def _point_path(chain: Dict, point: Dict) -> str:
+    if point["kind"] == "base":
+        return _chain_path(chain, ".db")
+    return os.path.join(BACKUP_DIR, f"delta_{point['stamp']}.bin")
+
+
+def _write_atomic(path: str, data: bytes) -> int:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def _save_chain(chain: Dict, hashes: bytes) -> int:
+    written = _write_atomic(_chain_path(chain, ".hashes"), hashes)
+    return written + _write_atomic(_chain_path(chain, ".json"), json.dumps(chain, indent=1).encode("utf-8"))
+
+
+def _remove_chain(chain: Dict):
+    paths = [_point_path(chain, p) for p in chain["points"]]
+    paths += [_chain_path(chain, ".hashes"), _chain_path(chain, ".json")]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _incremental_backup(force: bool) -> Dict:
+    now = datetime.now()
+    today = now.date().isoformat()
+    stamp = now.strftime("%Y-%m-%dT%H%M%S.%f")
+
+    chains = _load_chains()
+    chain = chains[-1] if chains else None
+    if chain and chain["points"][-1]["day"] == today and not force:
+        last = chain["points"][-1]
+        return {"mode": "incremental", "kind": "unchanged", "path": _point_path(chain, last), "bytes_written": 0}
+
+    with _snapshot_db_file() as src:
+        page_size = _page_size_of(src)
+        rebase = (
+            chain is None
+            or chain["page_size"] != page_size
+            or date.fromisoformat(today) - date.fromisoformat(chain["day"]) >= timedelta(days=BACKUP_REBASE_DAYS)
+            # once the deltas outweigh the base, a fresh base is cheaper to restore
+            or sum(p["bytes"] for p in chain["points"][1:]) > chain["points"][0]["bytes"]
+        )
+
+        if rebase:
+            chain = {"stamp": stamp, "day": today, "page_size": page_size, "points": []}
+            base_path = _chain_path(chain, ".db")
+            digests = []
+            with open(base_path + ".tmp", "wb") as out:
+                for _, page in _iter_pages(src, page_size):
+                    out.write(page)
+                    digests.append(_page_digest(page))
+            os.replace(base_path + ".tmp", base_path)
+            point = {"kind": "base", "stamp": stamp, "day": today, "pages": len(digests),
+                     "changed": len(digests), "bytes": os.path.getsize(base_path)}
+        else:
+            with open(_chain_path(chain, ".hashes"), "rb") as f:
+                old = f.read()
+            digests = []
+            records = [DELTA_MAGIC]
+            for pgno, page in _iter_pages(src, page_size):
+                digest = _page_digest(page)
+                digests.append(digest)
+                at = (pgno - 1) * PAGE_DIGEST_SIZE
+                if old[at:at + PAGE_DIGEST_SIZE] != digest:
+                    records.append(struct.pack(">I", pgno))
+                    records.append(page)
+            changed = (len(records) - 1) // 2
+            if changed == 0 and len(digests) * PAGE_DIGEST_SIZE == len(old):
+                last = chain["points"][-1]
+                return {"mode": "incremental", "kind": "unchanged", "path": _point_path(chain, last),
+                        "bytes_written": 0, "pages_total": len(digests), "pages_written": 0}
+            records.insert(1, json.dumps({"page_size": page_size, "pages": len(digests)}).encode("ascii") + b"\n")
+            point = {"kind": "delta", "stamp": stamp, "day": today, "pages": len(digests), "changed": changed}
+            point["bytes"] = _write_atomic(_point_path(chain, point), b"".join(records))
+
+    chain["points"].append(point)
+    meta_bytes = _save_chain(chain, b"".join(digests))
+    return {
+        "mode": "incremental",
+        "kind": point["kind"],
+        "path": _point_path(chain, point),
+        "bytes_written": point["bytes"] + meta_bytes,
+        "pages_total": point["pages"],
+        "pages_written": point["changed"],
+    }
+
+
+def run_backup(force: bool = False) -> Dict:
+    """Back up the database according to BACKUP_MODE.
+
+    Returns a report dict: mode, kind ("full", "base", "delta" or "unchanged"),
+    path of the file written and bytes_written (plus page counts when
+    incremental).
+    """
+    ensure_backup_dir()
+    started = time.perf_counter()
+    report = _incremental_backup(force) if BACKUP_MODE == "incremental" else _full_backup(force)
+    cleanup_old_backups()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def create_backup(force: bool = False) -> Optional[str]:
+    return run_backup(force)["path"]
+
+
+def list_restore_points() -> List[Tuple[str, str]]:
+    """(stamp, kind) of every restorable point, oldest first; stamps start with the day."""
+    ensure_backup_dir()
+    points = []
+    for path in glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db")):
+        d = _backup_day(os.path.basename(path), "hotel_")
+        if d:
+            points.append((d.isoformat(), "full"))
+    for chain in _load_chains():
+        points.extend((p["stamp"], p["kind"]) for p in chain["points"])
+    return sorted(points)
+
+
+def restore_backup(dest_path: str, day: Optional[date] = None) -> str:
+    """Rebuild the database as of the last backup taken on or before `day`
+    (default: the newest) into dest_path; returns the stamp restored.
+    The live database is never touched."""
+    ensure_backup_dir()
+    limit = (day or date.max).isoformat()
+    best = None
+    for path in glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db")):
+        d = _backup_day(os.path.basename(path), "hotel_")
+        if d and d.isoformat() <= limit and (best is None or d.isoformat() > best[0]):
+            best = (d.isoformat(), path, None)
+    for chain in _load_chains():
+        upto = [p for p in chain["points"] if p["day"] <= limit]
+        if upto and (best is None or upto[-1]["stamp"] >= best[0]):
+            best = (upto[-1]["stamp"], chain, upto)
+    if best is None:
+        raise ValueError(f"no backup on or before {limit}")
+
+    stamp, source, points = best
+    tmp_path = dest_path + ".tmp"
+    if points is None:
+        shutil.copyfile(source, tmp_path)
+    else:
+        page_size = source["page_size"]
+        shutil.copyfile(_chain_path(source, ".db"), tmp_path)
+        pages = points[0]["pages"]
+        with open(tmp_path, "r+b") as out:
+            for point in points[1:]:
+                with open(_point_path(source, point), "rb") as f:
+                    if f.readline() != DELTA_MAGIC:
+                        raise ValueError(f"corrupt delta file for {point['stamp']}")
+                    pages = json.loads(f.readline())["pages"]
+                    while True:
+                        head = f.read(4)
+                        if not head:
+                            break
+                        pgno = struct.unpack(">I", head)[0]
+                        out.seek((pgno - 1) * page_size)
+                        out.write(f.read(page_size))
+            out.truncate(pages * page_size)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(dest_path + suffix):
+            os.remove(dest_path + suffix)
+    os.replace(tmp_path, dest_path)
+    return stamp
+
+
+def get_latest_backup_path() -> Optional[str]:
+    ensure_backup_dir()
+    backups = glob.glob(os.path.join(BACKUP_DIR, "hotel_*.db"))
+    backups += [_point_path(c, c["points"][-1]) for c in _load_chains()]
+    backups = [p for p in backups if os.path.exists(p)]
+    return max(backups, key=os.path.getmtime) if backups else None
+
+
+def bootstrap():
+    """Create / migrate the schema and seed rooms; safe to call on every start."""
+    init_db()
+    seed_rooms_if_empty()
+    if CONFLICT_INDEX_ENABLED:
+        _room_index().rebuild()
+
+
+# ============================================================
+# DATA FUNCTIONS
+# ============================================================
+def _load_rooms() -> List[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            "SELECT id, number, default_tariff, default_tax FROM rooms ORDER BY number;"
+        ).fetchall()
+
+
+def get_rooms() -> List[sqlite3.Row]:
+    return _read_cache().get("rooms", _load_rooms)
+
+
+def get_room_by_number(room_number: str) -> Optional[sqlite3.Row]:
+    rn = str(room_number).strip()
+    if not rn:
+        return None
+    by_number = _read_cache().get("rooms_by_number", lambda: {str(r["number"]): r for r in get_rooms()})
+    return by_number.get(rn)
+
+
+def update_room_defaults(room_id: int, default_tariff_usd: float, default_tax_usd: float):
+    with db() as conn:
+        conn.execute(
+            "UPDATE rooms SET default_tariff=?, default_tax=? WHERE id=?;",
+            (float(default_tariff_usd), float(default_tax_usd), int(room_id)),
+        )
+        invalidate_read_cache()
+        log_audit(
+            "UPDATE",
+            "room",
+            int(room_id),
+            f"Updated room defaults (USD): tariff={float(default_tariff_usd):.2f}, tax={float(default_tax_usd):.2f}",
+            conn=conn,
+        )
+
+
+def update_room_defaults_bulk(prices: List[Tuple[int, float, float]]) -> int:
+    """Apply (room_id, tariff_usd, tax_usd) rows that differ from what is stored.
+
+    Unchanged rooms are skipped; the changed ones are written with one
+    executemany in a single transaction with one consolidated audit row.
+    Returns how many rooms changed.
+    """
+    with db() as conn:
+        current = {
+            int(r["id"]): (str(r["number"]), float(r["default_tariff"] or 0.0), float(r["default_tax"] or 0.0))
+            for r in conn.execute("SELECT id, number, default_tariff, default_tax FROM rooms;").fetchall()
+        }
+        changes: List[Tuple[float, float, int]] = []
+        summary: List[str] = []
+        for room_id, tariff_usd, tax_usd in prices:
+            room_id, tariff_usd, tax_usd = int(room_id), float(tariff_usd), float(tax_usd)
+            if room_id not in current:
+                continue
+            number, old_tariff, old_tax = current[room_id]
+            if abs(old_tariff - tariff_usd) < 0.005 and abs(old_tax - tax_usd) < 0.005:
+                continue
+            changes.append((tariff_usd, tax_usd, room_id))
+            summary.append(f"{number}: tariff={tariff_usd:.2f}, tax={tax_usd:.2f}")
+
+        if not changes:
+            return 0
+        conn.executemany("UPDATE rooms SET default_tariff=?, default_tax=? WHERE id=?;", changes)
+        invalidate_read_cache()
+        log_audit(
+            "UPDATE",
+            "room",
+            None,
+            f"Updated room defaults (USD) for {len(changes)} room(s): " + "; ".join(summary),
+            conn=conn,
+        )
+    return len(changes)
+
+
+def add_room(num: str):
+    num = str(num).strip()
+    if not num:
+        raise ValueError("Empty room number")
+    with db() as conn:
+        conn.execute(
+            "INSERT INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
+            (num, 0.0, 0.0),
+        )
+        rid = int(conn.execute("SELECT id FROM rooms WHERE number=?;", (num,)).fetchone()["id"])
+        invalidate_read_cache()
+        log_audit("CREATE", "room", rid, f"Added room {num}", conn=conn)
+
+
+def delete_room(room_id: int):
+    with db() as conn:
+        row = conn.execute("SELECT number FROM rooms WHERE id=?;", (int(room_id),)).fetchone()
+        room_number = row["number"] if row else ""
+        # its reservations go with it (ON DELETE CASCADE)
+        _adjust_daily_stats(conn, "room_id = ?", (int(room_id),), -1)
+        conn.execute("DELETE FROM rooms WHERE id=?;", (int(room_id),))
+        invalidate_read_cache()
+        index = get_room_index()
+        if index is not None:
+            on_commit(lambda: index.drop_room(int(room_id)))
+        log_audit("DELETE", "room", int(room_id), f"Deleted room {room_number}", conn=conn)
+
+
+def clear_all_reservations():
+    with db() as conn:
+        conn.execute("DELETE FROM reservations;")
+        conn.execute("DELETE FROM daily_stats;")
+        if CONFLICT_INDEX_ENABLED:
+            on_commit(_room_index().clear)
+        log_audit("DELETE_ALL", "reservations", None, "Cleared all reservations", conn=conn)
+
+
+def reset_rooms_to_default():
+    with db() as conn:
+        conn.execute("DELETE FROM rooms;")
+        conn.execute("DELETE FROM daily_stats;")
+        for num in default_room_numbers():
+            conn.execute(
+                "INSERT OR IGNORE INTO rooms(number, default_tariff, default_tax) VALUES (?,?,?);",
+                (num, 0.0, 0.0),
+            )
+        if CONFLICT_INDEX_ENABLED:
+            on_commit(_room_index().clear)
+        invalidate_read_cache()
+        log_audit("RESET", "rooms", None, "Reset rooms to defaults", conn=conn)
+
+
+def get_reservations_for_date(selected_date: date) -> List[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            """
+            SELECT r.id, rm.number AS room_number, r.guest_name, r.num_guests,
+                   r.tariff, r.tax,
+                   r.notes, r.status, r.check_in, r.check_out
+            FROM reservations r
+            JOIN rooms rm ON r.room_id = rm.id
+            WHERE r.check_in <= ? AND ? < r.check_out
+            ORDER BY rm.number;
+            """,
+            (iso(selected_date), iso(selected_date)),
+        ).fetchall()
+
+
+def get_el_roll_snapshot(selected_date: date) -> Dict:
+    """Rooms, the reservation shown per room and the day's stats in one query.
+
+    When several reservations touch a room on the day (e.g. a no-show and its
+    replacement), the active one wins, then the most recent.
+    """
+    with db() as conn:
+        rows = conn.execute(
+            """
+            WITH day_res AS (
+                SELECT r.id, r.room_id, r.guest_name, r.num_guests, r.tariff, r.tax,
+                       r.notes, r.status, r.check_in, r.check_out, r.nights, r.total_usd,
+                       r.status NOT IN ('noshow', 'checkedout') AS active,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY r.room_id
+                           ORDER BY r.status NOT IN ('noshow', 'checkedout') DESC, r.id DESC
+                       ) AS rn,
+                       SUM(CASE WHEN r.status NOT IN ('noshow', 'checkedout')
+                                THEN COALESCE(r.num_guests, 0) ELSE 0 END) OVER () AS day_guests
+                FROM reservations r
+                WHERE r.check_in <= :d AND :d < r.check_out
+            )
+            SELECT rm.number AS room_number,
+                   dr.id AS reservation_id, dr.guest_name, dr.num_guests, dr.tariff, dr.tax,
+                   dr.notes, dr.status, dr.check_in, dr.check_out, dr.nights, dr.total_usd,
+                   COUNT(*) OVER () AS total_rooms,
+                   SUM(COALESCE(dr.active, 0)) OVER () AS occupied_rooms,
+                   MAX(COALESCE(dr.day_guests, 0)) OVER () AS total_guests
+            FROM rooms rm
+            LEFT JOIN day_res dr ON dr.room_id = rm.id AND dr.rn = 1
+            ORDER BY rm.number;
+            """,
+            {"d": iso(selected_date)},
+        ).fetchall()
+
+    rooms: List[Dict] = []
+    for r in rows:
+        if r["reservation_id"] is not None:
+            rooms.append(
+                {
+                    "room_number": str(r["room_number"]),
+                    "guest_name": r["guest_name"] or "",
+                    "num_guests": int(r["num_guests"] or 0),
+                    "tariff_usd": float(r["tariff"] or 0.0),
+                    "tax_usd": float(r["tax"] or 0.0),
+                    "notes": r["notes"] or "",
+                    "status": r["status"],
+                    "reservation_id": int(r["reservation_id"]),
+                    "occupied": True,
+                    "check_in": parse_iso(r["check_in"]),
+                    "check_out": parse_iso(r["check_out"]),
+                    # NULL when a stored date doesn't parse
+                    "nights": int(r["nights"] or 0),
+                    "total_usd": float(r["total_usd"] or 0.0),
+                }
+            )
+        else:
+            rooms.append(
+                {
+                    "room_number": str(r["room_number"]),
+                    "guest_name": "",
+                    "num_guests": 0,
+                    "tariff_usd": 0.0,
+                    "tax_usd": 0.0,
+                    "notes": "",
+                    "status": "available",
+                    "reservation_id": None,
+                    "occupied": False,
+                    "check_in": None,
+                    "check_out": None,
+                    "nights": 0,
+                    "total_usd": 0.0,
+                }
+            )
+
+    total_rooms = int(rows[0]["total_rooms"]) if rows else 0
+    occupied_rooms = int(rows[0]["occupied_rooms"] or 0) if rows else 0
+    total_guests = int(rows[0]["total_guests"] or 0) if rows else 0
+    occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0.0
+    return {
+        "rooms": rooms,
+        "available_rooms": [r["room_number"] for r in rooms if r["status"] == "available"],
+        "stats": {
+            "total_rooms": float(total_rooms),
+            "occupied_rooms": float(occupied_rooms),
+            "total_guests": float(total_guests),
+            "occupancy_rate": float(occupancy_rate),
+        },
+    }
+
+
+# grid cell codes; when several reservations touch a cell the highest code wins
+GRID_CODES = {"noshow": 1, "checkedout": 2, "reserved": 3, "checkedin": 4}
+GRID_LABELS = ["", "NS", "OUT", "R", "IN"]
+
+
+def get_occupancy_grid(start: date, days: int) -> Dict:
+    """Room x day status matrix for [start, start + days) from one range query.
+
+    Each reservation is clipped to the window and written into a per-status
+    difference array; a cumulative sum along the day axis expands all stays at
+    once instead of querying El Roll day by day.
+    """
+    import numpy as np
+
+    days = max(1, int(days))
+    end = start + timedelta(days=days)
+    with db() as conn:
+        rooms = conn.execute("SELECT id, number FROM rooms ORDER BY number;").fetchall()
+        res = conn.execute(
+            """
+            SELECT room_id, status,
+                   CAST(check_in_jd - julianday(:start) AS INTEGER) AS s,
+                   CAST(check_out_jd - julianday(:start) AS INTEGER) AS e
+            FROM reservations
+            WHERE check_in < :end AND :start < check_out;
+            """,
+            {"start": iso(start), "end": iso(end)},
+        ).fetchall()
+
+    room_pos = {int(r["id"]): i for i, r in enumerate(rooms)}
+    grid = np.zeros((len(rooms), days), dtype=np.int8)
+    if res and rooms:
+        row = np.array([room_pos.get(int(r["room_id"]), -1) for r in res], dtype=np.int64)
+        code = np.array([GRID_CODES.get(r["status"], 3) for r in res], dtype=np.int8)
+        s = np.clip(np.array([r["s"] if r["s"] is not None else 0 for r in res], dtype=np.int64), 0, days)
+        e = np.clip(np.array([r["e"] if r["e"] is not None else 0 for r in res], dtype=np.int64), 0, days)
+        keep = (row >= 0) & (s < e)
+        row, code, s, e = row[keep], code[keep], s[keep], e[keep]
+        for c in sorted(set(GRID_CODES.values())):
+            m = code == c
+            if not m.any():
+                continue
+            diff = np.zeros((len(rooms), days + 1), dtype=np.int32)
+            np.add.at(diff, (row[m], s[m]), 1)
+            np.add.at(diff, (row[m], e[m]), -1)
+            occupied = np.cumsum(diff[:, :days], axis=1) > 0
+            grid[occupied] = c
+
+    return {
+        "rooms": [str(r["number"]) for r in rooms],
+        "dates": [start + timedelta(days=i) for i in range(days)],
+        "grid": grid,
+    }
+
+
+REPORT_PERIODS = ("day", "week", "month")
+
+
+def get_revenue_report(start: date, end: date, period: str = "month") -> Dict:
+    """Room-nights, revenue (USD, and CRC at each night's rate), ADR, RevPAR
+    and occupancy for start..end (both inclusive), one row per day, ISO
+    week or month.
+
+    Every stay overlapping the range is clipped to it and added to two
+    difference arrays (rooms sold and revenue per night, i.e. tariff + tax
+    as in calc_total_usd); one cumulative sum expands all of them into
+    nightly totals, which are then summed per period. Availability is the
+    current number of rooms times the days of each period.
+    """
+    import numpy as np
+
+    if period not in REPORT_PERIODS:
+        raise ValueError(f"period must be one of {REPORT_PERIODS}")
+    days = (end - start).days + 1
+    if days <= 0:
+        raise ValueError("end must not be before start")
+
+    excluded = ",".join("?" * len(REPORT_EXCLUDED_STATUSES))
+    with db() as conn:
+        room_count = int(conn.execute("SELECT COUNT(*) FROM rooms;").fetchone()[0])
+        cur = conn.cursor()
+        cur.row_factory = None
+        stays = cur.execute(
+            f"""
+            SELECT check_in_jd - julianday(?), check_out_jd - julianday(?),
+                   MAX(0, COALESCE(tariff, 0) + COALESCE(tax, 0))
+            FROM reservations
+            WHERE check_in <= ? AND ? < check_out AND status NOT IN ({excluded});
+            """,
+            (iso(start), iso(start), iso(end), iso(start), *REPORT_EXCLUDED_STATUSES),
+        ).fetchall()
+
+    sold = np.zeros(days + 1, dtype=np.int64)
+    revenue = np.zeros(days + 1, dtype=np.float64)
+    if stays:
+        arr = np.array(stays, dtype=np.float64)
+        arr = arr[~np.isnan(arr).any(axis=1)]
+        s = np.clip(arr[:, 0], 0, days).astype(np.int64)
+        e = np.clip(arr[:, 1], 0, days).astype(np.int64)
+        keep = s < e
+        s, e, nightly = s[keep], e[keep], arr[keep, 2]
+        np.add.at(sold, s, 1)
+        np.add.at(sold, e, -1)
+        np.add.at(revenue, s, nightly)
+        np.add.at(revenue, e, -nightly)
+    sold = np.cumsum(sold[:days])
+    revenue = np.cumsum(revenue[:days])
+    # each night's revenue at that night's rate; NaN where no rate is known
+    revenue_crc = revenue * get_fx_series().daily_rates(start, end)
+
+    day_axis = np.arange(np.datetime64(iso(start)), np.datetime64(iso(end)) + 1)
+    if period == "month":
+        key = day_axis.astype("datetime64[M]").astype(np.int64)
+    elif period == "week":
+        # 1970-01-01 was a Thursday: shift so weeks start on Monday
+        key = (day_axis.astype(np.int64) + 3) // 7
+    else:
+        key = day_axis.astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    lengths = np.diff(np.r_[starts, days])
+    sold_p = np.add.reduceat(sold, starts)
+    revenue_p = np.add.reduceat(revenue, starts)
+    revenue_crc_p = np.add.reduceat(revenue_crc, starts)
+
+    def kpis(nights_sold: float, rev: float, rev_crc: float, n_days: int) -> Dict:
+        available = room_count * n_days
+        return {
+            "days": int(n_days),
+            "available_room_nights": int(available),
+            "room_nights": int(nights_sold),
+            "revenue_usd": round(float(rev), 2),
+            # None when some night of the period has no exchange rate
+            "revenue_crc": None if np.isnan(rev_crc) else round(float(rev_crc), 2),
+            "adr_usd": round(float(rev) / nights_sold, 2) if nights_sold else 0.0,
+            "revpar_usd": round(float(rev) / available, 2) if available else 0.0,
+            "occupancy_rate": round(nights_sold / available * 100, 2) if available else 0.0,
+        }
+
+    rows = []
+    for i, first in enumerate(starts):
+        p_start = start + timedelta(days=int(first))
+        label = p_start.strftime("%Y-%m") if period == "month" else (
+            f"{p_start.isocalendar()[0]}-W{p_start.isocalendar()[1]:02d}" if period == "week" else iso(p_start)
+        )
+        row = {"period": label, "start": p_start, "end": p_start + timedelta(days=int(lengths[i]) - 1)}
+        row.update(kpis(int(sold_p[i]), float(revenue_p[i]), float(revenue_crc_p[i]), int(lengths[i])))
+        rows.append(row)
+
+    return {
+        "start": start,
+        "end": end,
+        "period": period,
+        "rooms": room_count,
+        "rows": rows,
+        "totals": kpis(int(sold.sum()), float(revenue.sum()), float(revenue_crc.sum()), days),
+    }
+
+
+def get_all_rooms_with_status(selected_date: date) -> List[Dict]:
+    return get_el_roll_snapshot(selected_date)["rooms"]
+
+
+def get_reservation(res_id: int) -> Optional[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            """
+            SELECT r.id, rm.number AS room_number, r.guest_name, r.status, r.check_in, r.check_out,
+                   r.notes, r.num_guests, r.tariff, r.tax, r.version
+            FROM reservations r
+            JOIN rooms rm ON r.room_id = rm.id
+            WHERE r.id = ?;
+            """,
+            (int(res_id),),
+        ).fetchone()
+
+
+class StaleReservationError(Exception):
+    """The reservation was changed (or deleted) after the caller loaded it."""
+
+    def __init__(self, reservation_id: int, expected: Optional[int], current: Optional[int]):
+        self.reservation_id = reservation_id
+        self.expected = expected
+        self.current = current
+        state = "deleted" if current is None else f"changed (now version {current})"
+        loaded = f" since version {expected} was loaded" if expected is not None else ""
+        super().__init__(f"reservation {reservation_id} was {state}{loaded}")
+
+
+def _check_version(conn: sqlite3.Connection, res_id: int, expected: Optional[int]):
+    row = conn.execute("SELECT version FROM reservations WHERE id = ?;", (int(res_id),)).fetchone()
+    current = int(row["version"]) if row else None
+    if current is None or (expected is not None and current != int(expected)):
+        raise StaleReservationError(int(res_id), expected, current)
+
+
+def find_conflict_sql(
+    conn: sqlite3.Connection,
+    room_id: int,
+    check_in: date,
+    check_out: date,
+    exclude_id: Optional[int] = None,
+) -> Optional[int]:
+    params = {"room_id": int(room_id), "new_ci": iso(check_in), "new_co": iso(check_out)}
+    if exclude_id is not None:
+        params["rid"] = int(exclude_id)
+        row = conn.execute(
+            """
+            SELECT id FROM reservations
+            WHERE room_id = :room_id
+              AND status NOT IN ('noshow', 'checkedout')
+              AND id != :rid
+              AND check_in < :new_co
+              AND :new_ci < check_out
+            LIMIT 1;
+            """,
+            params,
+        ).fetchone()
+    else:
+        row = conn.execute(
+            """
+            SELECT id FROM reservations
+            WHERE room_id = :room_id
+              AND status NOT IN ('noshow', 'checkedout')
+              AND check_in < :new_co
+              AND :new_ci < check_out
+            LIMIT 1;
+            """,
+            params,
+        ).fetchone()
+    return int(row["id"]) if row else None
+
+
+def get_available_rooms(check_in: date, check_out: date) -> List[Dict]:
+    """Every room free for all nights of [check_in, check_out), with its
+    default price and the quote for the stay.
+
+    One anti-join with the conflict check's rules: a stay overlaps when
+    check_in < new check_out and new check_in < check_out, and no-shows /
+    checked-out stays no longer hold the room.
+    """
+    nn = nights(check_in, check_out)
+    if nn <= 0:
+        return []
+    with db() as conn:
+        rows = conn.execute(
+            """
+            SELECT rm.number, rm.default_tariff, rm.default_tax
+            FROM rooms rm
+            WHERE NOT EXISTS (
+                SELECT 1 FROM reservations r
+                WHERE r.room_id = rm.id
+                  AND r.check_out > :new_ci
+                  AND r.check_in < :new_co
+                  AND r.status NOT IN ('noshow', 'checkedout')
+            )
+            ORDER BY rm.number;
+            """,
+            {"new_ci": iso(check_in), "new_co": iso(check_out)},
+        ).fetchall()
+    out = []
+    for r in rows:
+        tariff = float(r["default_tariff"] or 0.0)
+        tax = float(r["default_tax"] or 0.0)
+        out.append(
+            {
+                "room_number": str(r["number"]),
+                "default_tariff_usd": tariff,
+                "default_tax_usd": tax,
+                "nights": nn,
+                "total_usd": calc_total_usd(tariff, tax, nn),
+            }
+        )
+    return out
+
+
+def save_reservation(
+    room_number: str,
+    guest_name: str,
+    check_in: date,
+    check_out: date,
+    num_guests: int,
+    tariff_usd: float,
+    tax_usd: float,
+    notes: str,
+    status: str,
+    reservation_id: Optional[int] = None,
+    expected_version: Optional[int] = None,
+) -> bool:
+    """Create or update a reservation; False when the input is invalid or the room is taken.
+
+    The overlap check and the write run in one BEGIN IMMEDIATE transaction,
+    so two sessions can't both pass the check for the same nights. Updates
+    bump the row's version; pass the version the form was loaded with as
+    expected_version and an edit made in between raises StaleReservationError
+    instead of being overwritten.
+    """
+    room_number = str(room_number).strip()
+    guest_name = normalize_guest_name(guest_name)
+    status = status if status in VALID_STATUSES else "reserved"
+
+    if not room_number or not guest_name:
+        return False
+    if check_out <= check_in:
+        return False
+
+    with db(immediate=True) as conn:
+        room_row = conn.execute("SELECT id FROM rooms WHERE number=?;", (room_number,)).fetchone()
+        if not room_row:
+            return False
+        room_id = int(room_row["id"])
+        if reservation_id is not None:
+            _check_version(conn, int(reservation_id), expected_version)
+
+        index = get_room_index()
+        # the index only holds committed stays: once this transaction has
+        # written (a batch of queued jobs, say), ask SQL instead
+        if index is not None and not _db_pool().pending_callbacks():
+            # the previous writer updates the index after its COMMIT, under commit_lock
+            with _db_pool().commit_lock:
+                conflict = index.find_conflict(room_id, iso(check_in), iso(check_out), exclude_id=reservation_id)
+        else:
+            conflict = find_conflict_sql(conn, room_id, check_in, check_out, exclude_id=reservation_id)
+
+        if conflict is not None:
+            return False
+
+        tstamp = now_utc()
+        if reservation_id is not None:
+            _adjust_daily_stats(conn, "id = ?", (int(reservation_id),), -1)
+            conn.execute(
+                """
+                UPDATE reservations
+                SET guest_name=?, status=?, check_in=?, check_out=?, notes=?,
+                    num_guests=?, tariff=?, tax=?, updated_at=?, version = version + 1
+                WHERE id=?;
+                """,
+                (
+                    guest_name,
+                    status,
+                    iso(check_in),
+                    iso(check_out),
+                    notes or "",
+                    int(num_guests),
+                    float(tariff_usd),
+                    float(tax_usd),
+                    tstamp,
+                    int(reservation_id),
+                ),
+            )
+            action = "UPDATE"
+            rid = int(reservation_id)
+        else:
+            conn.execute(
+                """
+                INSERT INTO reservations(room_id, guest_name, status, check_in, check_out,
+                                         notes, num_guests, tariff, tax, created_at, updated_at)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?);
+                """,
+                (
+                    room_id,
+                    guest_name,
+                    status,
+                    iso(check_in),
+                    iso(check_out),
+                    notes or "",
+                    int(num_guests),
+                    float(tariff_usd),
+                    float(tax_usd),
+                    tstamp,
+                    tstamp,
+                ),
+            )
+            rid = int(conn.execute("SELECT last_insert_rowid() AS id;").fetchone()["id"])
+            action = "CREATE"
+        _adjust_daily_stats(conn, "id = ?", (rid,), 1)
+
+        if index is not None:
+            on_commit(lambda: index.put(rid, room_id, iso(check_in), iso(check_out), status))
+
+        stay = conn.execute("SELECT nights, total_usd FROM reservations WHERE id = ?;", (rid,)).fetchone()
+        nn, total_usd = int(stay["nights"] or 0), float(stay["total_usd"] or 0.0)
+        log_audit(
+            action,
+            "reservation",
+            rid,
+            f"room={room_number}; name={guest_name}; status={status}; ci={iso(check_in)}; co={iso(check_out)}; "
+            f"pax={int(num_guests)}; tariff_usd={float(tariff_usd):.2f}; tax_usd={float(tax_usd):.2f}; "
+            f"nights={nn}; total_usd={total_usd:.2f}",
+            conn=conn,
+        )
+    return True
+
+
+def delete_reservation(res_id: int, expected_version: Optional[int] = None):
+    with db(immediate=True) as conn:
+        if expected_version is not None:
+            _check_version(conn, int(res_id), expected_version)
+        row = get_reservation(int(res_id))
+        details = ""
+        if row:
+            details = (
+                f"room={row['room_number']}; name={row['guest_name']}; ci={row['check_in']}; "
+                f"co={row['check_out']}; status={row['status']}"
+            )
+        _adjust_daily_stats(conn, "id = ?", (int(res_id),), -1)
+        conn.execute("DELETE FROM reservations WHERE id=?;", (int(res_id),))
+        index = get_room_index()
+        if index is not None:
+            on_commit(lambda: index.remove(int(res_id)))
+        log_audit("DELETE", "reservation", int(res_id), details, conn=conn)
+
+
+IMPORT_COLUMNS = ("room", "guest_name", "check_in", "check_out", "pax", "tariff", "tax", "status", "notes")
+
+
+def _parse_import_row(row: Dict, rooms_by_number: Dict[str, sqlite3.Row]) -> Tuple[Optional[Dict], str]:
+    if not isinstance(row, dict):
+        return None, "row is not an object"
+    room = str(row.get("room") or "").strip()
+    room_row = rooms_by_number.get(room)
+    if room_row is None:
+        return None, f"unknown room {room!r}"
+    guest_name = normalize_guest_name(str(row.get("guest_name") or ""))
+    if not guest_name:
+        return None, "guest_name is empty"
+    try:
+        ci = date.fromisoformat(str(row.get("check_in") or "").strip())
+        co = date.fromisoformat(str(row.get("check_out") or "").strip())
+    except ValueError:
+        return None, "check_in / check_out must be YYYY-MM-DD"
+    if co <= ci:
+        return None, "check_out must be after check_in"
+    status = str(row.get("status") or "reserved").strip()
+    if status not in VALID_STATUSES:
+        return None, f"unknown status {status!r}"
+    # blank / missing fields take the default; an explicit 0 is kept (and checked)
+    given = {k: row.get(k) is not None and str(row.get(k)).strip() != "" for k in ("pax", "tariff", "tax")}
+    try:
+        pax = int(row["pax"]) if given["pax"] else 1
+        tariff = float(row["tariff"]) if given["tariff"] else float(room_row["default_tariff"] or 0.0)
+        tax = float(row["tax"]) if given["tax"] else float(room_row["default_tax"] or 0.0)
+    except (TypeError, ValueError):
+        return None, "pax / tariff / tax must be numbers"
+    if pax < 1:
+        return None, "pax must be at least 1"
+    for name, value in (("tariff", tariff), ("tax", tax)):
+        if not math.isfinite(value) or value < 0:
+            return None, f"{name} must be a number >= 0"
+    return {
+        "room_id": int(room_row["id"]),
+        "room": room,
+        "guest_name": guest_name,
+        "check_in": iso(ci),
+        "check_out": iso(co),
+        "pax": pax,
+        "tariff": tariff,
+        "tax": tax,
+        "status": status,
+        "notes": str(row.get("notes") or ""),
+    }, ""
+
+
+def _sweep_conflicts(rows: List[Dict], held: Dict[int, List[Tuple[str, str]]]) -> Dict[int, str]:
+    """Which parsed rows clash, keyed by position in rows.
+
+    held: the active stays already in the database, per room. Per room the
+    rows that hold the room are swept in check-in order, keeping the end of
+    the latest accepted stay: a row starting before it overlaps an earlier
+    row of the file. Every row (released ones too, as in save_reservation)
+    is also checked against the database with a bisect over its stays
+    sorted by check-in, plus a running max of their check-outs.
+    """
+    rejected: Dict[int, str] = {}
+    by_room: Dict[int, List[int]] = {}
+    for i, r in enumerate(rows):
+        by_room.setdefault(r["room_id"], []).append(i)
+
+    for room_id, positions in by_room.items():
+        stays = sorted(held.get(room_id, []))
+        starts = [ci for ci, _ in stays]
+        reach: List[str] = []
+        for _, co in stays:
+            reach.append(max(reach[-1], co) if reach else co)
+
+        def db_clash(ci: str, co: str) -> bool:
+            k = bisect.bisect_left(starts, co)
+            return k > 0 and reach[k - 1] > ci
+
+        accepted: List[Tuple[str, str]] = []
+        end = ""
+        for i in sorted(positions, key=lambda i: (rows[i]["check_in"], i)):
+            r = rows[i]
+            if r["status"] in RELEASED_STATUSES:
+                continue
+            if db_clash(r["check_in"], r["check_out"]):
+                rejected[i] = "room occupied (existing reservation)"
+            elif r["check_in"] < end:
+                rejected[i] = "overlaps an earlier row of the import"
+            else:
+                accepted.append((r["check_in"], r["check_out"]))
+                end = r["check_out"]
+
+        # released rows don't hold the room but may not overlap stays that do
+        acc_starts = [ci for ci, _ in accepted]
+        for i in positions:
+            r = rows[i]
+            if r["status"] not in RELEASED_STATUSES:
+                continue
+            k = bisect.bisect_left(acc_starts, r["check_out"])
+            if db_clash(r["check_in"], r["check_out"]):
+                rejected[i] = "room occupied (existing reservation)"
+            elif k > 0 and accepted[k - 1][1] > r["check_in"]:
+                rejected[i] = "overlaps an earlier row of the import"
+    return rejected
+
+
+def import_reservations(rows, first_line: int = 1, dry_run: bool = False) -> Dict:
+    """Validate and insert many reservations in one transaction.
+
+    rows is an iterable of dicts with IMPORT_COLUMNS (tariff / tax default to
+    the room's prices, status to "reserved"). Rows that are invalid or would
+    double-book a room -- against the database or another row -- are left
+    out and reported as (line, reason), lines counted from first_line.
+    Returns {"imported", "rejected", "seconds"}; dry_run only validates.
+    """
+    started = time.perf_counter()
+    rooms_by_number = {str(r["number"]): r for r in get_rooms()}
+    parsed: List[Dict] = []
+    lines: List[int] = []
+    rejected: List[Tuple[int, str]] = []
+    for n, row in enumerate(rows, start=first_line):
+        r, reason = _parse_import_row(row, rooms_by_number)
+        if r is None:
+            rejected.append((n, reason))
+        else:
+            parsed.append(r)
+            lines.append(n)
+
+    imported = 0
+    with db(immediate=not dry_run) as conn:
+        held: Dict[int, List[Tuple[str, str]]] = {}
+        if parsed:
+            for h in conn.execute(
+                """
+                SELECT room_id, check_in, check_out FROM reservations
+                WHERE status NOT IN ('noshow', 'checkedout') AND check_out > ? AND check_in < ?;
+                """,
+                (min(r["check_in"] for r in parsed), max(r["check_out"] for r in parsed)),
+            ):
+                held.setdefault(int(h["room_id"]), []).append((h["check_in"], h["check_out"]))
+        clashes = _sweep_conflicts(parsed, held)
+        rejected += [(lines[i], reason) for i, reason in clashes.items()]
+        good = [r for i, r in enumerate(parsed) if i not in clashes]
+
+        if good and not dry_run:
+            tstamp = now_utc()
+            before = int(conn.execute("SELECT COALESCE(MAX(id), 0) FROM reservations;").fetchone()[0])
+            conn.executemany(
+                """
+                INSERT INTO reservations(room_id, guest_name, status, check_in, check_out,
+                                         notes, num_guests, tariff, tax, created_at, updated_at)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?);
+                """,
+                [
+                    (r["room_id"], r["guest_name"], r["status"], r["check_in"], r["check_out"],
+                     r["notes"], r["pax"], r["tariff"], r["tax"], tstamp, tstamp)
+                    for r in good
+                ],
+            )
+            # one writer at a time: our rows got the next ids, in order
+            stays = conn.execute(
+                "SELECT id, nights, total_usd FROM reservations WHERE id > ? ORDER BY id;", (before,)
+            ).fetchall()
+            ids = [int(x["id"]) for x in stays]
+            _adjust_daily_stats(conn, "id > ?", (before,), 1)
+
+            index = get_room_index()
+            if index is not None:
+                entries = [(rid, r["room_id"], r["check_in"], r["check_out"], r["status"]) for rid, r in zip(ids, good)]
+
+                def _index_imported():
+                    for e in entries:
+                        index.put(*e)
+
+                on_commit(_index_imported)
+
+            with audit_batch(conn):
+                for stay, r in zip(stays, good):
+                    rid = int(stay["id"])
+                    log_audit(
+                        "CREATE",
+                        "reservation",
+                        rid,
+                        f"room={r['room']}; name={r['guest_name']}; status={r['status']}; ci={r['check_in']}; "
+                        f"co={r['check_out']}; pax={r['pax']}; tariff_usd={r['tariff']:.2f}; tax_usd={r['tax']:.2f}; "
+                        f"nights={int(stay['nights'] or 0)}; total_usd={float(stay['total_usd'] or 0.0):.2f}; import=1",
+                    )
+                log_audit("IMPORT", "reservations", None, f"imported={len(good)}; rejected={len(rejected)}")
+        imported = len(good)
+
+    return {
+        "imported": imported,
+        "rejected": sorted(rejected),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def search_guests(query: str, limit: int = 10) -> List[str]:
+    """Guest names containing query, most recent stay first, then most frequent."""
+    if not query or len(query.strip()) < 2:
+        return []
+    q = query.strip()
+    with db() as conn:
+        if len(q) >= 3 and table_exists(conn, "reservations_guest_fts"):
+            # trigram MATCH on a quoted phrase = case-insensitive substring.
+            # CROSS JOIN pins the FTS table as the outer loop.
+            rows = conn.execute(
+                """
+                SELECT r.guest_name, MAX(r.check_in) AS last_ci, COUNT(*) AS n
+                FROM reservations_guest_fts
+                CROSS JOIN reservations r ON r.id = reservations_guest_fts.rowid
+                WHERE reservations_guest_fts MATCH ?
+                GROUP BY r.guest_name
+                ORDER BY last_ci DESC, n DESC
+                LIMIT ?;
+                """,
+                ('"' + q.replace('"', '""') + '"', int(limit)),
+            ).fetchall()
+        else:
+            # shorter than a trigram (or no FTS5): plain scan
+            rows = conn.execute(
+                """
+                SELECT guest_name, MAX(check_in) AS last_ci, COUNT(*) AS n
+                FROM reservations
+                WHERE LOWER(guest_name) LIKE LOWER(?) ESCAPE '\\'
+                GROUP BY guest_name
+                ORDER BY last_ci DESC, n DESC
+                LIMIT ?;
+                """,
+                ("%" + re.sub(r"([%_\\])", r"\\\1", q) + "%", int(limit)),
+            ).fetchall()
+        return [str(r["guest_name"]) for r in rows]
+
+
+# keyset cursor for room / guest history: (check_in, id) of a row
+HistoryCursor = Tuple[str, int]
+
+
+def _history_page(
+    where: str,
+    params: Tuple,
+    before: Optional[HistoryCursor],
+    after: Optional[HistoryCursor],
+    limit: int,
+) -> Tuple[List[sqlite3.Row], bool]:
+    """Shared by the room and guest history; latest check-in first, like get_audit_page()."""
+    if after is not None:
+        where += " AND (r.check_in, r.id) > (?, ?)"
+        params += (str(after[0]), int(after[1]))
+        order = "ASC"
+    else:
+        if before is not None:
+            where += " AND (r.check_in, r.id) < (?, ?)"
+            params += (str(before[0]), int(before[1]))
+        order = "DESC"
+    with db() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT r.id, rm.number AS room_number, r.guest_name, r.status, r.check_in, r.check_out,
+                   r.num_guests, r.tariff, r.tax, r.nights, r.total_usd, r.updated_at
+            FROM reservations r
+            JOIN rooms rm ON r.room_id = rm.id
+            WHERE {where}
+            ORDER BY r.check_in {order}, r.id {order}
+            LIMIT ?;
+            """,
+            params + (int(limit) + 1,),
+        ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if order == "ASC":
+        rows.reverse()
+    return rows, more
+
+
+def get_guest_reservations(
+    guest_name: str,
+    before: Optional[HistoryCursor] = None,
+    after: Optional[HistoryCursor] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+) -> Tuple[List[sqlite3.Row], bool]:
+    """One page of a guest's reservations; notes come from get_reservation_notes()."""
+    return _history_page("r.guest_name = ?", (guest_name,), before, after, limit)
+
+
+def get_room_reservations(
+    room_number: str,
+    before: Optional[HistoryCursor] = None,
+    after: Optional[HistoryCursor] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+) -> Tuple[List[sqlite3.Row], bool]:
+    """One page of a room's reservations; notes come from get_reservation_notes()."""
+    room = get_room_by_number(str(room_number).strip())
+    if room is None:
+        return [], False
+    return _history_page("r.room_id = ?", (int(room["id"]),), before, after, limit)
+
+
+def get_reservation_notes(ids: List[int]) -> Dict[int, str]:
+    """Notes of just these reservations (the rows on screen)."""
+    if not ids:
+        return {}
+    with db() as conn:
+        rows = conn.execute(
+            f"SELECT id, notes FROM reservations WHERE id IN ({','.join('?' * len(ids))});",
+            [int(i) for i in ids],
+        ).fetchall()
+    return {int(r["id"]): r["notes"] or "" for r in rows}
+
+
+def get_history_summary(room_number: Optional[str] = None, guest_name: Optional[str] = None) -> Dict:
+    """Totals over a room's or a guest's whole history, not just the page shown.
+
+    Nights and money skip REPORT_EXCLUDED_STATUSES. total_crc converts each
+    stay at its check-in day's rate and is None if any of those days has no
+    rate yet.
+    """
+    if room_number is not None:
+        room = get_room_by_number(str(room_number).strip())
+        where, params = "r.room_id = ?", [int(room["id"]) if room else -1]
+    else:
+        where, params = "r.guest_name = ?", [guest_name]
+    excluded = ",".join("?" * len(REPORT_EXCLUDED_STATUSES))
+    with db() as conn:
+        row = conn.execute(
+            f"""
+            SELECT COUNT(*) AS reservations,
+                   COUNT(s.counted) AS stays,
+                   COALESCE(SUM(s.counted * s.nights), 0) AS nights,
+                   COALESCE(SUM(s.counted * s.total_usd), 0) AS total_usd,
+                   SUM(s.counted * s.total_usd * s.fx) AS total_crc,
+                   SUM(s.counted AND s.fx IS NULL) AS missing_fx,
+                   MIN(s.check_in) AS first_check_in,
+                   MAX(s.check_out) AS last_check_out
+            FROM (
+                SELECT r.nights, r.total_usd, r.check_in, r.check_out,
+                       CASE WHEN r.status NOT IN ({excluded}) THEN 1 END AS counted,
+                       (SELECT NULLIF(f.fx_usd_crc, 0) FROM fx_daily f
+                        WHERE f.day <= r.check_in ORDER BY f.day DESC LIMIT 1) AS fx
+                FROM reservations r
+                WHERE {where}
+            ) s;
+            """,
+            [*REPORT_EXCLUDED_STATUSES, *params],
+        ).fetchone()
+    stays = int(row["stays"])
+    return {
+        "reservations": int(row["reservations"]),
+        "stays": stays,
+        "nights": int(row["nights"]),
+        "total_usd": float(row["total_usd"]),
+        "avg_usd": float(row["total_usd"]) / stays if stays else 0.0,
+        "total_crc": float(row["total_crc"] or 0.0) if not row["missing_fx"] else None,
+        "first_check_in": row["first_check_in"],
+        "last_check_out": row["last_check_out"],
+    }
+
+
+def get_dashboard_stats(selected_date: date) -> Dict[str, float]:
+    return get_el_roll_snapshot(selected_date)["stats"]
+
+
+def get_audit_log(limit: int = 300) -> List[sqlite3.Row]:
+    with db() as conn:
+        return conn.execute(
+            """
+            SELECT ts, user, role, action, entity, entity_id, details
+            FROM audit_log
+            ORDER BY id DESC
+            LIMIT ?;
+            """,
+            (int(limit),),
+        ).fetchall()
+
+
+AUDIT_FILTER_COLUMNS = ("user", "action", "entity")
+
+
+def _audit_filters(
+    user: Optional[str] = None,
+    action: Optional[str] = None,
+    entity: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    ts_from: Optional[date] = None,
+    ts_to: Optional[date] = None,
+) -> Tuple[List[str], List]:
+    """WHERE terms for the audit filters; ts_to includes its whole day.
+
+    The ts range stays a ts predicate: ts is not guaranteed to follow id
+    (the clock can step back), so it can't stand in for an id range.
+    """
+    where, params = [], []
+    for col, value in (("user", user), ("action", action), ("entity", entity)):
+        if value:
+            where.append(f"{col} = ?")
+            params.append(value)
+    if entity_id is not None:
+        where.append("entity_id = ?")
+        params.append(int(entity_id))
+    if ts_from:
+        where.append("ts >= ?")
+        params.append(iso(ts_from))
+    if ts_to:
+        where.append("ts < ?")
+        params.append(iso(ts_to + timedelta(days=1)))
+    return where, params
+
+
+def get_audit_page(
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = AUDIT_PAGE_SIZE,
+    **filters,
+) -> Tuple[List[sqlite3.Row], bool]:
+    """One page of audit rows, newest first, keyset-paginated on id.
+
+    before_id pages towards older rows, after_id towards newer ones, neither
+    gives the newest page. filters are those of _audit_filters(). Returns
+    (rows, more): more tells whether another page exists in that direction.
+    """
+    with db() as conn:
+        where, params = _audit_filters(**filters)
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(int(after_id))
+            order = "ASC"
+        else:
+            if before_id is not None:
+                where.append("id < ?")
+                params.append(int(before_id))
+            order = "DESC"
+        rows = conn.execute(
+            f"""
+            SELECT id, ts, user, role, action, entity, entity_id, details
+            FROM audit_log
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY id {order}
+            LIMIT ?;
+            """,
+            params + [int(limit) + 1],
+        ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if order == "ASC":
+        rows.reverse()
+    return rows, more
+
+
+def get_audit_values(column: str) -> List[str]:
+    """Distinct values of user / action / entity, for the filter pickers.
+
+    Walks the column's index one value at a time (a skip scan), so the cost
+    follows the number of distinct values, not the number of rows.
+    """
+    if column not in AUDIT_FILTER_COLUMNS:
+        raise ValueError(f"not an audit filter column: {column}")
+    with db() as conn:
+        rows = conn.execute(
+            f"""
+            WITH RECURSIVE v(val) AS (
+                SELECT MIN({column}) FROM audit_log
+                UNION ALL
+                SELECT (SELECT MIN({column}) FROM audit_log WHERE {column} > v.val)
+                FROM v WHERE v.val IS NOT NULL
+            )
+            SELECT val FROM v WHERE val IS NOT NULL;
+            """
+        ).fetchall()
+    return [r["val"] for r in rows]
+
+
+# ============================================================
+# EXPORTS (streamed CSV; memory stays bounded by EXPORT_CHUNK_ROWS)
+# ============================================================
+@contextmanager
+def _own_connection():
+    """A connection outside the pool, closed when the block ends.
+
+    Streaming exports keep a cursor open across yields. On a pooled
+    connection that would leave the connection checked out, and the
+    thread's db() nesting pointed at it, until the caller finished
+    iterating: an abandoned export would hold it, and writes made in
+    between would join its never-ending block. Generators close this one
+    in their finally when they are exhausted, closed or collected.
+    """
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def iter_csv(cursor: sqlite3.Cursor, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield the cursor's result as UTF-8 CSV, one chunk per fetchmany()."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([d[0] for d in cursor.description])
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def export_reservations_csv(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    room_number: Optional[str] = None,
+    guest_name: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Every reservation staying on any night from start to end (both
+    inclusive, either open), optionally for one room or guest, with its
+    total in USD and CRC."""
+    where, params = [], []
+    if start:
+        where.append("r.check_out > ?")
+        params.append(iso(start))
+    if end:
+        where.append("r.check_in <= ?")
+        params.append(iso(end))
+    if room_number:
+        where.append("rm.number = ?")
+        params.append(str(room_number).strip())
+    if guest_name:
+        where.append("r.guest_name = ?")
+        params.append(guest_name)
+    # CRC at the rate of the check-in day (or the last rate saved before it):
+    # one fx_daily primary-key seek per row, still streamed
+    sql = f"""
+        SELECT q.id, q.room, q.guest_name, q.status, q.check_in, q.check_out, q.nights, q.pax,
+               q.tariff_usd, q.tax_usd, q.total_usd, q.fx_usd_crc,
+               ROUND(q.total_usd * q.fx_usd_crc, 2) AS total_crc,
+               q.notes, q.created_at, q.updated_at
+        FROM (
+            SELECT r.id, rm.number AS room, r.guest_name, r.status, r.check_in, r.check_out,
+                   r.nights, r.num_guests AS pax, r.tariff AS tariff_usd, r.tax AS tax_usd, r.total_usd,
+                   (SELECT NULLIF(f.fx_usd_crc, 0) FROM fx_daily f
+                    WHERE f.day <= r.check_in ORDER BY f.day DESC LIMIT 1) AS fx_usd_crc,
+                   r.notes, r.created_at, r.updated_at
+            FROM reservations r
+            JOIN rooms rm ON r.room_id = rm.id
+            {"WHERE " + " AND ".join(where) if where else ""}
+        ) q
+        ORDER BY q.check_in, q.id;
+    """
+    with _own_connection() as conn:
+        yield from iter_csv(conn.execute(sql, params))
+
+
+def export_audit_csv(start: Optional[date] = None, end: Optional[date] = None, **filters) -> Iterator[bytes]:
+    """Audit rows logged from start to end (both inclusive, UTC days), oldest
+    first; filters as for get_audit_page()."""
+    with _own_connection() as conn:
+        where, params = _audit_filters(ts_from=start, ts_to=end, **filters)
+        cursor = conn.execute(
+            f"""
+            SELECT id, ts, user, role, action, entity, entity_id, details
+            FROM audit_log
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY id;
+            """,
+            params,
+        )
+        yield from iter_csv(cursor)
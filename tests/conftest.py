@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hotel_core  # noqa: E402
+
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    """hotel_core bootstrapped on a fresh hotel.db under tmp_path."""
+    monkeypatch.setattr(hotel_core, "DB_PATH", str(tmp_path / "hotel.db"))
+    monkeypatch.setattr(hotel_core, "BACKUP_DIR", str(tmp_path / "backups"))
+    hotel_core._read_cache().bump()
+    hotel_core._room_index().clear()
+    hotel_core.bootstrap()
+    yield hotel_core
+    hotel_core._db_pool().close_all()
+    hotel_core._read_cache().bump()
+    hotel_core._room_index().clear()
+    hotel_core._room_index().loaded = False
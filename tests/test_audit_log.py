@@ -0,0 +1,76 @@
+"""Audit browser: filters, keyset paging on id, and the ts range."""
+
+from datetime import date
+
+
+def add_rows(core, rows):
+    """rows: (ts, user, action, entity, entity_id); returns their ids in order."""
+    with core.db() as conn:
+        conn.execute("DELETE FROM audit_log;")
+        ids = []
+        for ts, user, action, entity, entity_id in rows:
+            cur = conn.execute(core.AUDIT_INSERT_SQL, (ts, user, "admin", action, entity, entity_id, ""))
+            ids.append(cur.lastrowid)
+    return ids
+
+
+def ids_of(rows):
+    return [r["id"] for r in rows]
+
+
+def test_ts_range_when_clock_steps_back(core):
+    # the clock stepped back between the first two rows: ts and id disagree
+    ids = add_rows(core, [
+        ("2026-03-02T09:00:00", "ana", "LOGIN", "user", None),
+        ("2026-03-02T08:00:00", "ana", "LOGOUT", "user", None),
+        ("2026-03-01T23:30:00", "bob", "LOGIN", "user", None),
+        ("2026-03-03T00:00:00", "bob", "LOGOUT", "user", None),
+    ])
+    rows, _ = core.get_audit_page(ts_from=date(2026, 3, 2), ts_to=date(2026, 3, 2))
+    assert ids_of(rows) == [ids[1], ids[0]]
+    rows, _ = core.get_audit_page(ts_to=date(2026, 3, 1))
+    assert ids_of(rows) == [ids[2]]
+    rows, _ = core.get_audit_page(ts_from=date(2026, 3, 2))
+    assert ids_of(rows) == [ids[3], ids[1], ids[0]]
+
+    exported = b"".join(core.export_audit_csv(date(2026, 3, 2), date(2026, 3, 2))).decode()
+    assert [line.split(",")[0] for line in exported.splitlines()[1:]] == [str(ids[0]), str(ids[1])]
+
+
+def test_filters(core):
+    ids = add_rows(core, [
+        ("2026-03-01T10:00:00", "ana", "CREATE", "reservation", 7),
+        ("2026-03-01T11:00:00", "bob", "UPDATE", "reservation", 7),
+        ("2026-03-01T12:00:00", "ana", "UPDATE", "reservation", 8),
+        ("2026-03-01T13:00:00", "ana", "UPDATE", "room", 7),
+    ])
+    page = lambda **f: ids_of(core.get_audit_page(**f)[0])
+    assert page(user="ana") == [ids[3], ids[2], ids[0]]
+    assert page(action="UPDATE", user="ana") == [ids[3], ids[2]]
+    assert page(entity="reservation", entity_id=7) == [ids[1], ids[0]]
+    assert page(user="nobody") == []
+    assert core.get_audit_values("user") == ["ana", "bob"]
+
+
+def test_paging_both_directions(core):
+    rows = [(f"2026-03-01T10:{m:02d}:00", "ana" if m % 3 else "bob", "LOGIN", "user", None) for m in range(25)]
+    ids = add_rows(core, rows)
+    newest_first = ids[::-1]
+
+    page1, more = core.get_audit_page(limit=10)
+    assert ids_of(page1) == newest_first[:10] and more
+    page2, more = core.get_audit_page(before_id=page1[-1]["id"], limit=10)
+    assert ids_of(page2) == newest_first[10:20] and more
+    page3, more = core.get_audit_page(before_id=page2[-1]["id"], limit=10)
+    assert ids_of(page3) == newest_first[20:] and not more
+
+    back, more = core.get_audit_page(after_id=page3[0]["id"], limit=10)
+    assert ids_of(back) == ids_of(page2) and more
+    back, more = core.get_audit_page(after_id=back[0]["id"], limit=10)
+    assert ids_of(back) == ids_of(page1) and not more
+
+    ana = [i for i, r in zip(ids, rows) if r[1] == "ana"][::-1]
+    first, more = core.get_audit_page(user="ana", limit=5)
+    assert ids_of(first) == ana[:5] and more
+    rest, more = core.get_audit_page(user="ana", before_id=first[-1]["id"], limit=50)
+    assert ids_of(rest) == ana[5:] and not more
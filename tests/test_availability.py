@@ -0,0 +1,42 @@
+"""get_available_rooms: a room is offered only if every night of the stay is free."""
+
+from datetime import date
+
+STAY = (date(2026, 5, 10), date(2026, 5, 15))
+
+
+def test_partly_booked_rooms_are_excluded(core):
+    with core.db() as conn:
+        conn.execute("DELETE FROM rooms WHERE number NOT IN ('101', '102', '103', '104', '105', '106');")
+        core.invalidate_read_cache()
+    bookings = [
+        ("101", date(2026, 5, 12), date(2026, 5, 13), "reserved"),  # one night in the middle
+        ("102", date(2026, 5, 8), date(2026, 5, 11), "checkedin"),  # the first night
+        ("103", date(2026, 5, 14), date(2026, 5, 20), "reserved"),  # the last night
+        ("104", date(2026, 5, 5), date(2026, 5, 10), "checkedin"),  # leaves the morning we arrive
+        ("104", date(2026, 5, 15), date(2026, 5, 17), "reserved"),  # arrives the day we leave
+        ("105", date(2026, 5, 11), date(2026, 5, 12), "noshow"),  # released
+        ("105", date(2026, 5, 9), date(2026, 5, 11), "checkedout"),  # released
+        ("106", date(2026, 5, 1), date(2026, 5, 30), "reserved"),  # the whole stay and more
+    ]
+    for room, ci, co, status in bookings:
+        assert core.save_reservation(room, f"Guest {room}", ci, co, 1, 0.0, 0.0, "", status)
+
+    rooms = core.get_available_rooms(*STAY)
+    assert [r["room_number"] for r in rooms] == ["104", "105"]
+
+    # same answer as the per-room conflict check used when booking
+    with core.db() as conn:
+        free = [r["number"] for r in core.get_rooms() if core.find_conflict_sql(conn, r["id"], *STAY) is None]
+    assert free == ["104", "105"]
+
+
+def test_quote_and_empty_stay(core):
+    room = core.get_room_by_number("101")
+    core.update_room_defaults(room["id"], 80.0, 12.5)
+    quote = {r["room_number"]: r for r in core.get_available_rooms(*STAY)}["101"]
+    assert (quote["nights"], quote["default_tariff_usd"], quote["default_tax_usd"]) == (5, 80.0, 12.5)
+    assert quote["total_usd"] == core.calc_total_usd(80.0, 12.5, 5)
+
+    assert core.get_available_rooms(STAY[1], STAY[0]) == []
+    assert core.get_available_rooms(STAY[0], STAY[0]) == []
@@ -0,0 +1,105 @@
+"""Incremental backups: restore round-trip, and no write lock while hashing."""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+
+def book(core, room, day, name="Backup Guest"):
+    return core.save_reservation(room, name, day, day + timedelta(days=1), 2, 80.0, 10.0, "", "reserved")
+
+
+def reservation_count(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA integrity_check;").fetchone()[0] == "ok"
+        return conn.execute("SELECT COUNT(*) FROM reservations;").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_restore_base_and_delta(core, tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "BACKUP_MODE", "incremental")
+    start = date(2025, 3, 1)
+    for k in range(20):
+        assert book(core, "101", start + timedelta(days=2 * k))
+    assert core.run_backup(force=True)["kind"] == "base"
+    for k in range(20):
+        assert book(core, "102", start + timedelta(days=2 * k))
+    assert core.run_backup(force=True)["kind"] == "delta"
+
+    core.restore_backup(str(tmp_path / "restored.db"))
+    assert reservation_count(str(tmp_path / "restored.db")) == 40
+
+
+def test_backup_does_not_block_writers(core, monkeypatch):
+    monkeypatch.setattr(core, "BACKUP_MODE", "incremental")
+    # no retries: a writer that meets a held write lock fails at once
+    monkeypatch.setattr(core, "DB_WRITE_RETRIES", 0)
+    iter_pages = core._iter_pages
+
+    def slow_pages(path, page_size):
+        for item in iter_pages(path, page_size):
+            time.sleep(0.005)
+            yield item
+
+    monkeypatch.setattr(core, "_iter_pages", slow_pages)
+    for k in range(10):
+        assert book(core, "101", date(2025, 3, 1) + timedelta(days=2 * k))
+
+    errors = []
+    booked = []
+    hashing = threading.Event()
+    done = threading.Event()
+
+    def writer():
+        hashing.wait(5)
+        day = date(2026, 1, 1)
+        while not done.is_set():
+            try:
+                booked.append(book(core, "103", day))
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            day += timedelta(days=2)
+
+    th = threading.Thread(target=writer)
+    th.start()
+
+    def slow_pages_signalled(path, page_size):
+        hashing.set()
+        yield from slow_pages(path, page_size)
+
+    monkeypatch.setattr(core, "_iter_pages", slow_pages_signalled)
+    try:
+        core.run_backup(force=True)
+    finally:
+        done.set()
+        th.join()
+    assert not errors
+    assert booked and all(booked)
+
+
+def test_concurrent_backups_use_their_own_snapshot(core, monkeypatch):
+    monkeypatch.setattr(core, "BACKUP_MODE", "incremental")
+    assert book(core, "101", date(2025, 3, 1))
+    core.ensure_backup_dir()
+    seen = []
+    inside = threading.Barrier(2, timeout=5)
+
+    def snapshot_twice():
+        with core._snapshot_db_file() as path:
+            inside.wait()
+            seen.append((path, reservation_count(path)))
+
+    threads = [threading.Thread(target=snapshot_twice) for _ in range(2)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert [n for _, n in seen] == [1, 1]
+    assert len({p for p, _ in seen}) == 2
+    assert not any(os.path.exists(p) for p, _ in seen)
+    assert not glob.glob(os.path.join(core.BACKUP_DIR, "*.tmp"))
@@ -0,0 +1,100 @@
+"""Concurrent bookings never overlap; edits from a stale version are refused."""
+
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+
+def active_stays(core, room="101"):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return conn.execute(
+            "SELECT r.check_in, r.check_out FROM reservations r JOIN rooms rm ON rm.id = r.room_id "
+            "WHERE rm.number = ? AND r.status NOT IN ('noshow', 'checkedout') ORDER BY r.check_in;",
+            (room,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def book_at_once(core, stays):
+    """Each (check_in, check_out) booked for room 101 from its own thread, released together."""
+    start = threading.Barrier(len(stays), timeout=10)
+    results, errors = [None] * len(stays), []
+
+    def book(k, ci, co):
+        start.wait()
+        try:
+            results[k] = core.save_reservation("101", f"Thread {k}", ci, co, 1, 80.0, 10.0, "", "reserved")
+        except Exception as e:  # surfaced below instead of dying with the thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=book, args=(k, ci, co)) for k, (ci, co) in enumerate(stays)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert not errors
+    return results
+
+
+@pytest.fixture(params=[False, True], ids=["sql", "index"])
+def booking_core(core, monkeypatch, request):
+    monkeypatch.setattr(core, "CONFLICT_INDEX_ENABLED", request.param)
+    return core
+
+
+def test_same_nights_booked_once(booking_core):
+    ci = date(2026, 8, 1)
+    results = book_at_once(booking_core, [(ci, ci + timedelta(days=3))] * 6)
+    assert results.count(True) == 1
+    assert active_stays(booking_core) == [("2026-08-01", "2026-08-04")]
+
+
+def test_overlapping_stays_never_double_book(booking_core):
+    ci = date(2026, 8, 1)
+    stays = [(ci + timedelta(days=k), ci + timedelta(days=k + 2)) for k in range(8)]
+    results = book_at_once(booking_core, stays)
+    # the winners always leave no free 2-night gap: at least 3 of these 8 stays
+    assert results.count(True) >= 3
+    booked = active_stays(booking_core)
+    assert len(booked) == results.count(True)
+    for (_, prev_co), (next_ci, _) in zip(booked, booked[1:]):
+        assert prev_co <= next_ci
+
+
+def booked_id(core, guest):
+    with core.db() as conn:
+        return int(conn.execute("SELECT id FROM reservations WHERE guest_name = ?;", (guest,)).fetchone()["id"])
+
+
+def test_stale_version_is_refused(core):
+    ci, co = date(2026, 9, 1), date(2026, 9, 3)
+    assert core.save_reservation("101", "Versioned", ci, co, 2, 80.0, 10.0, "", "reserved")
+    rid = booked_id(core, "Versioned")
+    loaded = core.get_reservation(rid)["version"]
+
+    # another session saves first
+    assert core.save_reservation("101", "Versioned", ci, co, 3, 80.0, 10.0, "late", "reserved",
+                                 reservation_id=rid, expected_version=loaded)
+    current = core.get_reservation(rid)["version"]
+    assert current == loaded + 1
+
+    with pytest.raises(core.StaleReservationError) as info:
+        core.save_reservation("101", "Versioned", ci, co, 4, 80.0, 10.0, "", "reserved",
+                              reservation_id=rid, expected_version=loaded)
+    assert (info.value.expected, info.value.current) == (loaded, current)
+    with pytest.raises(core.StaleReservationError):
+        core.delete_reservation(rid, expected_version=loaded)
+
+    row = core.get_reservation(rid)
+    assert (row["num_guests"], row["version"]) == (3, current)
+
+    core.delete_reservation(rid, expected_version=current)
+    assert core.get_reservation(rid) is None
+    with pytest.raises(core.StaleReservationError) as info:
+        core.save_reservation("101", "Versioned", ci, co, 1, 80.0, 10.0, "", "reserved",
+                              reservation_id=rid, expected_version=current)
+    assert info.value.current is None
@@ -0,0 +1,72 @@
+"""RoomIntervalIndex must agree with the SQL overlap probe."""
+
+import random
+from datetime import date, timedelta
+
+
+def insert_raw(core, room_id, ci, co, status="reserved"):
+    # bypasses the conflict check, like data written before it existed
+    with core.db() as conn:
+        conn.execute(
+            "INSERT INTO reservations(room_id, guest_name, status, check_in, check_out, created_at, updated_at) "
+            "VALUES (?, 'Old Guest', ?, ?, ?, '', '');",
+            (room_id, status, ci.isoformat(), co.isoformat()),
+        )
+
+
+def index_and_sql(core, room_id, ci, co, exclude_id=None):
+    index = core._room_index()
+    hit = index.find_conflict(room_id, ci.isoformat(), co.isoformat(), exclude_id=exclude_id)
+    with core.db() as conn:
+        sql = core.find_conflict_sql(conn, room_id, ci, co, exclude_id=exclude_id)
+    return hit, sql
+
+
+def test_long_stay_behind_short_one_still_conflicts(core):
+    # overlapping active stays from an older database: [01-01, 01-10) and [01-02, 01-03)
+    insert_raw(core, 1, date(2025, 1, 1), date(2025, 1, 10))
+    insert_raw(core, 1, date(2025, 1, 2), date(2025, 1, 3))
+    core._room_index().rebuild()
+
+    hit, sql = index_and_sql(core, 1, date(2025, 1, 5), date(2025, 1, 6))
+    assert sql is not None
+    assert hit is not None
+
+
+def test_index_matches_sql_on_overlapping_data(core):
+    rnd = random.Random(3)
+    start = date(2025, 1, 1)
+    for _ in range(300):
+        ci = start + timedelta(days=rnd.randint(0, 120))
+        status = rnd.choice(["reserved", "reserved", "checkedin", "noshow", "checkedout"])
+        insert_raw(core, rnd.randint(1, 3), ci, ci + timedelta(days=rnd.randint(1, 15)), status)
+    index = core._room_index()
+    index.rebuild()
+    with core.db() as conn:
+        ids = [int(r["id"]) for r in conn.execute("SELECT id FROM reservations;")]
+
+    def check():
+        for _ in range(500):
+            room_id = rnd.randint(1, 3)
+            ci = start + timedelta(days=rnd.randint(-5, 130))
+            co = ci + timedelta(days=rnd.randint(1, 6))
+            exclude = rnd.choice(ids) if rnd.random() < 0.3 else None
+            hit, sql = index_and_sql(core, room_id, ci, co, exclude)
+            assert (hit is None) == (sql is None), (room_id, ci, co, exclude, hit, sql)
+
+    check()
+    # moves and deletes keep the running max of check_out right
+    for rid in rnd.sample(ids, 80):
+        ci = start + timedelta(days=rnd.randint(0, 120))
+        co = ci + timedelta(days=rnd.randint(1, 15))
+        with core.db() as conn:
+            conn.execute("UPDATE reservations SET check_in = ?, check_out = ? WHERE id = ?;",
+                         (ci.isoformat(), co.isoformat(), rid))
+            row = conn.execute("SELECT room_id, status FROM reservations WHERE id = ?;", (rid,)).fetchone()
+        index.put(rid, int(row["room_id"]), ci.isoformat(), co.isoformat(), row["status"])
+    for rid in rnd.sample(ids, 40):
+        with core.db() as conn:
+            conn.execute("DELETE FROM reservations WHERE id = ?;", (rid,))
+        index.remove(rid)
+    ids = [rid for rid in ids if core.get_reservation(rid) is not None]
+    check()
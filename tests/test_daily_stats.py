@@ -0,0 +1,65 @@
+"""Every write path keeps daily_stats equal to a recount of the reservations."""
+
+from datetime import date
+
+import pytest
+
+
+def reservation_id(core, guest):
+    with core.db() as conn:
+        return int(conn.execute("SELECT id FROM reservations WHERE guest_name = ?;", (guest,)).fetchone()["id"])
+
+
+def do_new_booking(core):
+    assert core.save_reservation("103", "New", date(2026, 5, 2), date(2026, 5, 6), 3, 90.0, 9.0, "", "reserved")
+
+
+def do_move_booking(core):
+    rid = reservation_id(core, "Stay 101")
+    assert core.save_reservation("104", "Stay 101", date(2026, 5, 3), date(2026, 5, 9), 1, 70.0, 5.5, "",
+                                 "checkedin", reservation_id=rid)
+
+
+def do_mark_noshow(core):
+    rid = reservation_id(core, "Stay 102")
+    assert core.save_reservation("102", "Stay 102", date(2026, 5, 1), date(2026, 5, 4), 2, 80.0, 8.0, "",
+                                 "noshow", reservation_id=rid)
+
+
+def do_delete_reservation(core):
+    core.delete_reservation(reservation_id(core, "Stay 101"))
+
+
+def do_delete_room(core):
+    core.delete_room(core.get_room_by_number("102")["id"])
+
+
+def do_clear_all(core):
+    core.clear_all_reservations()
+
+
+def do_import(core):
+    result = core.import_reservations([
+        {"room": "105", "guest_name": "Imported A", "check_in": "2026-05-01", "check_out": "2026-05-03", "pax": "2"},
+        {"room": "106", "guest_name": "Imported B", "check_in": "2026-04-30", "check_out": "2026-05-05",
+         "tariff": "120.25", "tax": "12.10"},
+        # clashes with Stay 101: rejected, must add nothing
+        {"room": "101", "guest_name": "Clash", "check_in": "2026-05-02", "check_out": "2026-05-03"},
+    ])
+    assert result["imported"] == 2 and len(result["rejected"]) == 1
+
+
+@pytest.mark.parametrize(
+    "write",
+    [do_new_booking, do_move_booking, do_mark_noshow, do_delete_reservation, do_delete_room, do_clear_all, do_import],
+    ids=lambda fn: fn.__name__[3:],
+)
+def test_write_keeps_daily_stats_in_step(core, write):
+    assert core.save_reservation("101", "Stay 101", date(2026, 5, 1), date(2026, 5, 4), 1, 80.0, 8.0, "", "reserved")
+    assert core.save_reservation("102", "Stay 102", date(2026, 5, 2), date(2026, 5, 4), 2, 70.0, 7.0, "", "reserved")
+    assert core.get_daily_stats(date(2026, 5, 1), date(2026, 5, 1))[0]["occupied_rooms"] == 1
+    assert core.check_daily_stats() == []
+
+    write(core)
+
+    assert core.check_daily_stats() == []
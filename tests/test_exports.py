@@ -0,0 +1,52 @@
+"""Streaming exports must not hold a pooled connection between chunks."""
+
+import sqlite3
+from datetime import date, timedelta
+
+
+def seed(core, n=5000):
+    start = date(2025, 1, 1)
+    rows = []
+    for k in range(n):
+        ci = start + timedelta(days=k // 40)
+        rows.append((1 + k % 40, f"Guest {k}", "checkedout", ci.isoformat(), (ci + timedelta(days=1)).isoformat()))
+    with core.db() as conn:
+        conn.executemany(
+            "INSERT INTO reservations(room_id, guest_name, status, check_in, check_out, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, '', '');",
+            rows,
+        )
+
+
+def committed_guests(core, name):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM reservations WHERE guest_name = ?;", (name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_write_during_unfinished_export_commits(core):
+    seed(core)
+    chunks = core.export_reservations_csv()
+    next(chunks)  # caller stops after the first chunk but keeps the generator
+
+    assert core.save_reservation("101", "During Export", date(2027, 1, 1), date(2027, 1, 2),
+                                 1, 80.0, 10.0, "", "reserved")
+    assert committed_guests(core, "During Export") == 1
+    chunks.close()
+
+
+def test_interleaved_exports_on_one_thread(core):
+    seed(core)
+    whole_res = b"".join(core.export_reservations_csv())
+    whole_audit = b"".join(core.export_audit_csv())
+
+    res, audit = core.export_reservations_csv(), core.export_audit_csv()
+    got_res, got_audit = [next(res)], [next(audit)]
+    got_res.append(next(res))
+    got_res.extend(res)
+    got_audit.extend(audit)
+    assert b"".join(got_res) == whole_res
+    assert b"".join(got_audit) == whole_audit
+    assert whole_res.count(b"\n") == 5001
@@ -0,0 +1,74 @@
+"""Historical FX: forward fill between saved days, no rate before the first one."""
+
+import csv
+import io
+import math
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def fx(core):
+    # 500 from Mar 1, nothing saved Mar 2-4, 520 from Mar 5; Mar 8 saved as 0 (= no rate)
+    with core.db() as conn:
+        conn.executemany(
+            "INSERT INTO fx_daily(day, fx_usd_crc, ts, user, role) VALUES (?, ?, '', 'test', 'admin');",
+            [("2026-03-01", 500.0), ("2026-03-05", 520.0), ("2026-03-08", 0.0)],
+        )
+        core.invalidate_read_cache()
+    return core
+
+
+def test_rates_forward_fill(fx):
+    series = fx.get_fx_series()
+    assert series.rate_on(date(2026, 2, 28)) == 0.0
+    assert series.rate_on(date(2026, 3, 1)) == 500.0
+    assert series.rate_on(date(2026, 3, 4)) == 500.0
+    assert series.rate_on(date(2026, 3, 7)) == 520.0
+
+    rates = series.daily_rates(date(2026, 2, 28), date(2026, 3, 9))
+    assert math.isnan(rates[0])
+    assert list(rates[1:8]) == [500.0, 500.0, 500.0, 500.0, 520.0, 520.0, 520.0]
+    assert all(math.isnan(r) for r in rates[8:])
+
+    crc = series.to_crc(["2026-02-28", "2026-03-03", "2026-03-06"], [10.0, 10.0, 2.5])
+    assert math.isnan(crc[0]) and list(crc[1:]) == [5000.0, 1300.0]
+
+
+def test_new_rate_invalidates_the_series(fx):
+    assert fx.get_fx_for_day(date.today()) is None
+    fx.save_today_fx(530.0)
+    assert fx.get_today_fx_value() == 530.0
+    assert fx.get_fx_series().rate_on(date.today()) == 530.0
+
+
+def test_history_total_crc(fx):
+    assert fx.save_reservation("101", "Covered", date(2026, 3, 3), date(2026, 3, 5), 1, 100.0, 10.0, "", "checkedout")
+    assert fx.save_reservation("101", "Covered", date(2026, 3, 6), date(2026, 3, 7), 1, 50.0, 0.0, "", "checkedout")
+    summary = fx.get_history_summary(guest_name="Covered")
+    # 220 USD at Mar 3's filled 500 + 50 USD at 520
+    assert summary["total_usd"] == 270.0
+    assert summary["total_crc"] == 220.0 * 500 + 50.0 * 520
+
+    assert fx.save_reservation("102", "Early", date(2026, 2, 20), date(2026, 2, 21), 1, 100.0, 0.0, "", "checkedout")
+    assert fx.save_reservation("102", "Early", date(2026, 3, 2), date(2026, 3, 3), 1, 100.0, 0.0, "", "checkedout")
+    assert fx.get_history_summary(guest_name="Early")["total_crc"] is None
+    assert fx.get_history_summary(room_number="102")["total_crc"] is None
+
+
+def test_export_total_crc(fx):
+    assert fx.save_reservation("101", "Before", date(2026, 2, 27), date(2026, 2, 28), 1, 80.0, 0.0, "", "checkedout")
+    assert fx.save_reservation("101", "Filled", date(2026, 3, 2), date(2026, 3, 3), 1, 80.0, 0.0, "", "checkedout")
+    assert fx.save_reservation("101", "Zero", date(2026, 3, 9), date(2026, 3, 10), 1, 80.0, 0.0, "", "reserved")
+    rows = list(csv.DictReader(io.StringIO(b"".join(fx.export_reservations_csv()).decode())))
+    by_guest = {r["guest_name"]: (r["fx_usd_crc"], r["total_crc"]) for r in rows}
+    assert by_guest == {"Before": ("", ""), "Filled": ("500.0", "40000.0"), "Zero": ("", "")}
+
+
+def test_report_crc_needs_every_night(fx):
+    assert fx.save_reservation("101", "Stay", date(2026, 2, 28), date(2026, 3, 3), 1, 100.0, 0.0, "", "checkedout")
+    report = fx.get_revenue_report(date(2026, 2, 28), date(2026, 3, 2), "day")
+    assert [r["revenue_crc"] for r in report["rows"]] == [None, 50000.0, 50000.0]
+    assert report["totals"]["revenue_crc"] is None
+    assert fx.get_revenue_report(date(2026, 3, 1), date(2026, 3, 2))["totals"]["revenue_crc"] == 100000.0
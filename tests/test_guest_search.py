@@ -0,0 +1,53 @@
+"""search_guests: trigram FTS for 3+ characters, LIKE below that, any punctuation."""
+
+from datetime import date, timedelta
+
+import pytest
+
+NAMES = ["Ana Lopez", "Jo Smith", "Sean O'Brien", 'Mary "Mo" Jones', "Star* Guest", "Lopez Ana"]
+
+
+@pytest.fixture
+def guests(core):
+    ci = date(2026, 3, 1)
+    for k, name in enumerate(NAMES):
+        day = ci + timedelta(days=k)
+        core.save_reservation("101", name, day, day + timedelta(days=1), 1, 50.0, 5.0, "", "reserved")
+    return core
+
+
+def test_one_character_returns_nothing(guests):
+    assert guests.search_guests("a") == []
+    assert guests.search_guests("  j ") == []
+
+
+def test_two_characters_match_as_substring(guests):
+    assert guests.search_guests("jo") == ['Mary "Mo" Jones', "Jo Smith"]
+    assert guests.search_guests("Mo") == ['Mary "Mo" Jones']
+
+
+def test_three_characters_use_trigram_substring(guests):
+    assert guests.search_guests("LOPEZ") == ["Lopez Ana", "Ana Lopez"]
+    assert guests.search_guests("pez an") == ["Lopez Ana"]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("O'Brien", ["Sean O'Brien"]),
+        ("'Br", ["Sean O'Brien"]),
+        ('"Mo"', ['Mary "Mo" Jones']),
+        ('y "M', ['Mary "Mo" Jones']),
+        ('"', []),
+        ('""', []),
+        ("Star*", ["Star* Guest"]),
+        ("r* G", ["Star* Guest"]),
+        ("*", []),
+        ("Lo*", []),
+        ("AND OR", []),
+        ("%%", []),
+        ("__", []),
+    ],
+)
+def test_punctuation_is_matched_literally(guests, query, expected):
+    assert guests.search_guests(query) == expected
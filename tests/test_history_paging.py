@@ -0,0 +1,82 @@
+"""Room / guest history keyset pages, with tied check-ins, match one full ORDER BY."""
+
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def history(core):
+    rng = random.Random(7)
+    # 4 check-in days x 6 stays each, inserted shuffled so ids don't follow check_in
+    stays = [(date(2026, 1, 1) + timedelta(days=7 * d), k) for d in range(4) for k in range(6)]
+    rng.shuffle(stays)
+    room_ids = {r["number"]: r["id"] for r in core.get_rooms()}
+    with core.db() as conn:
+        conn.executemany(
+            "INSERT INTO reservations(room_id, guest_name, status, check_in, check_out, created_at, updated_at) "
+            "VALUES (?, 'Repeat Guest', 'checkedout', ?, ?, '', '');",
+            [
+                (room_ids["101"] if k % 2 else room_ids["102"], ci.isoformat(), (ci + timedelta(days=1)).isoformat())
+                for ci, k in stays
+            ],
+        )
+    return core
+
+
+def expected(core, where, params):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return [
+            r[0]
+            for r in conn.execute(
+                f"SELECT r.id FROM reservations r JOIN rooms rm ON rm.id = r.room_id WHERE {where} "
+                "ORDER BY r.check_in DESC, r.id DESC;",
+                params,
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def walk(fetch, limit):
+    """Every page going older, then back to the first one going newer."""
+    cursor = lambda row: (row["check_in"], row["id"])
+    rows, more = fetch(limit=limit)
+    pages = [rows]
+    while more:
+        rows, more = fetch(before=cursor(pages[-1][-1]), limit=limit)
+        pages.append(rows)
+    back = [pages[-1]]
+    while len(back) < len(pages):
+        rows, more = fetch(after=cursor(back[-1][0]), limit=limit)
+        assert more == (len(back) < len(pages) - 1)
+        back.append(rows)
+    assert fetch(after=cursor(back[-1][0]), limit=limit) == ([], False)
+    return [[r["id"] for r in p] for p in pages], [[r["id"] for r in p] for p in reversed(back)]
+
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 24, 50])
+def test_guest_pages_match_full_order(history, limit):
+    full = expected(history, "r.guest_name = ?", ("Repeat Guest",))
+    assert len(full) == 24
+    older, newer = walk(lambda **kw: history.get_guest_reservations("Repeat Guest", **kw), limit)
+    assert [i for page in older for i in page] == full
+    assert all(0 < len(page) <= limit for page in older)
+    assert newer == older
+
+
+@pytest.mark.parametrize("limit", [2, 5])
+def test_room_pages_match_full_order(history, limit):
+    full = expected(history, "rm.number = ?", ("101",))
+    assert len(full) == 12
+    older, newer = walk(lambda **kw: history.get_room_reservations("101", **kw), limit)
+    assert [i for page in older for i in page] == full
+    assert newer == older
+
+
+def test_unknown_room_and_guest(history):
+    assert history.get_room_reservations("9999") == ([], False)
+    assert history.get_guest_reservations("Nobody") == ([], False)
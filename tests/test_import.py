@@ -0,0 +1,114 @@
+"""Bulk import: per-line rejections, clashes within the file and with the database."""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+
+def row(room="101", ci="2026-06-01", co="2026-06-03", name="Imported Guest", **extra):
+    return {"room": room, "guest_name": name, "check_in": ci, "check_out": co, **extra}
+
+
+def counts(core):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return tuple(
+            conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+            for table in ("reservations", "audit_log", "daily_stats")
+        )
+    finally:
+        conn.close()
+
+
+def test_rows_that_clash_with_each_other(core):
+    result = core.import_reservations(
+        [
+            row(ci="2026-06-01", co="2026-06-04", name="First"),
+            row(ci="2026-06-03", co="2026-06-05", name="Overlaps first"),
+            row(ci="2026-06-04", co="2026-06-06", name="Starts at first's check-out"),
+            row(room="102", ci="2026-06-02", co="2026-06-03", name="Other room"),
+            row(ci="2026-06-05", co="2026-06-06", name="Released overlap", status="noshow"),
+        ],
+        first_line=2,
+    )
+    assert result["imported"] == 3
+    assert result["rejected"] == [
+        (3, "overlaps an earlier row of the import"),
+        (6, "overlaps an earlier row of the import"),
+    ]
+    guests = {r["guest_name"] for r in core.get_room_reservations("101")[0]}
+    assert guests == {"First", "Starts at first's check-out"}
+
+
+def test_rows_that_clash_with_the_database(core):
+    assert core.save_reservation("101", "Existing", date(2026, 6, 10), date(2026, 6, 12), 1, 50.0, 5.0, "", "reserved")
+    assert core.save_reservation("102", "Gone", date(2026, 6, 10), date(2026, 6, 12), 1, 50.0, 5.0, "", "checkedout")
+    result = core.import_reservations([
+        row(ci="2026-06-11", co="2026-06-13"),
+        row(ci="2026-06-08", co="2026-06-11", status="checkedout"),
+        row(ci="2026-06-12", co="2026-06-14"),
+        row(room="102", ci="2026-06-10", co="2026-06-12"),
+    ])
+    assert result["imported"] == 2
+    assert result["rejected"] == [
+        (1, "room occupied (existing reservation)"),
+        (2, "room occupied (existing reservation)"),
+    ]
+    assert core.check_daily_stats() == []
+
+
+def test_unknown_room(core):
+    result = core.import_reservations([row(room="9999"), row(room=""), row()])
+    assert result["imported"] == 1
+    assert result["rejected"] == [(1, "unknown room '9999'"), (2, "unknown room ''")]
+
+
+def test_dry_run_leaves_the_database_untouched(core):
+    assert core.save_reservation("101", "Existing", date(2026, 6, 1), date(2026, 6, 2), 1, 50.0, 5.0, "", "reserved")
+    before = counts(core)
+    rows = [row(ci="2026-06-01", co="2026-06-03"), row(room="102"), row(room="103", pax="0")]
+    dry = core.import_reservations(rows, dry_run=True)
+    assert counts(core) == before
+    assert dry["imported"] == 1
+    assert core.import_reservations(rows)["rejected"] == dry["rejected"]
+    assert counts(core)[0] == before[0] + 1
+
+
+@pytest.mark.parametrize(
+    "extra, reason",
+    [
+        ({"pax": "-3"}, "pax must be at least 1"),
+        ({"pax": "0"}, "pax must be at least 1"),
+        ({"pax": 0}, "pax must be at least 1"),
+        ({"pax": "two"}, "pax / tariff / tax must be numbers"),
+        ({"tariff": "nan"}, "tariff must be a number >= 0"),
+        ({"tariff": "inf"}, "tariff must be a number >= 0"),
+        ({"tariff": "-10"}, "tariff must be a number >= 0"),
+        ({"tax": "-0.5"}, "tax must be a number >= 0"),
+        ({"tax": "-inf"}, "tax must be a number >= 0"),
+        ({"tax": "NaN"}, "tax must be a number >= 0"),
+        ({"status": "gone"}, "unknown status 'gone'"),
+        ({"check_out": "2026-06-01"}, "check_out must be after check_in"),
+        ({"check_in": "06/01/2026"}, "check_in / check_out must be YYYY-MM-DD"),
+        ({"guest_name": "  "}, "guest_name is empty"),
+    ],
+)
+def test_invalid_values_are_rejected(core, extra, reason):
+    before = counts(core)
+    result = core.import_reservations([row(**extra)], first_line=5)
+    assert result == {"imported": 0, "rejected": [(5, reason)], "seconds": result["seconds"]}
+    assert counts(core) == before
+
+
+def test_prices_default_to_the_room_but_zero_is_kept(core):
+    room = core.get_room_by_number("101")
+    core.update_room_defaults(room["id"], 80.0, 8.0)
+    result = core.import_reservations([
+        row(ci="2026-07-01", co="2026-07-02", name="Defaults", tariff="", tax=None),
+        row(ci="2026-07-02", co="2026-07-03", name="Comped", tariff="0", tax=0, pax="3"),
+    ])
+    assert result["rejected"] == []
+    stays = {r["guest_name"]: r for r in core.get_room_reservations("101")[0]}
+    assert (stays["Defaults"]["tariff"], stays["Defaults"]["tax"], stays["Defaults"]["num_guests"]) == (80.0, 8.0, 1)
+    assert (stays["Comped"]["tariff"], stays["Comped"]["tax"], stays["Comped"]["num_guests"]) == (0.0, 0.0, 3)
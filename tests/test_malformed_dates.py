@@ -0,0 +1,19 @@
+"""Stays whose stored dates don't parse have NULL nights/total_usd; readers show 0."""
+
+from datetime import date
+
+
+def test_el_roll_snapshot_with_unparseable_check_in(core):
+    with core.db() as conn:
+        # sorts inside the day's range as text, but julianday() can't read it
+        conn.execute(
+            "INSERT INTO reservations(room_id, guest_name, status, check_in, check_out, tariff, tax, "
+            "created_at, updated_at) VALUES (1, 'Bad Date', 'reserved', '2026-10-17x', '2026-10-20', 80, 10, '', '');"
+        )
+        assert tuple(conn.execute("SELECT nights, total_usd FROM reservations;").fetchone()) == (None, None)
+
+    snap = core.get_el_roll_snapshot(date(2026, 10, 18))
+    stay = next(r for r in snap["rooms"] if r.get("guest_name") == "Bad Date")
+    assert stay["nights"] == 0
+    assert stay["total_usd"] == 0.0
+    assert core.get_history_summary(guest_name="Bad Date")["nights"] == 0
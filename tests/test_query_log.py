@@ -0,0 +1,45 @@
+"""Slow statements are buffered per rerun, not written from read-only db() blocks."""
+
+import sqlite3
+
+
+def slow_rows(core):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return conn.execute("SELECT label, sql, plan FROM slow_query ORDER BY id;").fetchall()
+    finally:
+        conn.close()
+
+
+def test_read_only_block_does_not_write(core):
+    log = core.start_query_log("view")
+    log.threshold_ms = 0.0
+    try:
+        # another session holds the write lock; a page view must not need it
+        blocker = sqlite3.connect(core.DB_PATH, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE;")
+        try:
+            with core.db() as conn:
+                conn.execute("SELECT COUNT(*) FROM reservations WHERE room_id = ?;", (1,)).fetchall()
+        finally:
+            blocker.execute("ROLLBACK;")
+            blocker.close()
+        assert log.pending_slow
+        assert slow_rows(core) == []
+    finally:
+        core.finish_query_log(log)
+
+
+def test_finish_writes_slow_statements_once(core):
+    log = core.start_query_log("view")
+    log.threshold_ms = 0.0
+    with core.db() as conn:
+        conn.execute("SELECT COUNT(*) FROM reservations WHERE room_id = ?;", (1,)).fetchall()
+    core.finish_query_log(log)
+    core.finish_query_log(log)
+
+    rows = slow_rows(core)
+    assert [r[0] for r in rows] == ["view"]
+    assert rows[0][1] == "SELECT COUNT(*) FROM reservations WHERE room_id = ?;"
+    assert "reservations" in rows[0][2]
+    assert log.pending_slow == []
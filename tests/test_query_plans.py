@@ -0,0 +1,91 @@
+"""The hot reservation queries must seek an index, never scan the table."""
+
+import re
+from datetime import date, timedelta
+
+import pytest
+
+TABLE_SCAN = re.compile(r"^SCAN (r|reservations)\b")
+TEMP_SORT = "USE TEMP B-TREE"
+
+
+def seed(core, per_room: int = 12):
+    start = date(2025, 1, 1)
+    for n, room in enumerate(r["number"] for r in core.get_rooms()):
+        for k in range(per_room):
+            ci = start + timedelta(days=3 * k)
+            core.save_reservation(room, f"Guest {n % 7}", ci, ci + timedelta(days=2), 2, 80.0, 10.0, "", "reserved")
+
+
+def reservation_plans(core, fn):
+    """EXPLAIN QUERY PLAN of every SELECT on reservations that fn() runs."""
+    statements = []
+    with core.db() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            fn()
+        finally:
+            conn.set_trace_callback(None)
+        plans = []
+        for sql in statements:
+            if "reservations" in sql and sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                plans.append((sql, [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]))
+    assert plans, "no reservation query was run"
+    return plans
+
+
+def conflict_probe(core):
+    with core.db() as conn:
+        return core.find_conflict_sql(conn, 1, date(2025, 1, 10), date(2025, 1, 12))
+
+
+HOT_QUERIES = {
+    "el_roll_snapshot": (lambda c: c.get_el_roll_snapshot(date(2025, 1, 10)), "idx_reservations_dates"),
+    "conflict_probe": (conflict_probe, "idx_reservations_room_checkout"),
+    "guest_history": (lambda c: c.get_guest_reservations("Guest 3"), "idx_reservations_guest"),
+    "room_history": (lambda c: c.get_room_reservations("101"), "idx_reservations_room_history"),
+    "available_rooms": (
+        lambda c: c.get_available_rooms(date(2025, 1, 10), date(2025, 1, 12)),
+        "idx_reservations_room_checkout",
+    ),
+    "occupancy_grid": (lambda c: c.get_occupancy_grid(date(2025, 1, 10), 14), "idx_reservations_dates"),
+}
+
+
+def test_migrations_reach_latest_version(core):
+    with core.db() as conn:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        indexes = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+    assert version == core.MIGRATIONS[-1][0]
+    assert {
+        "idx_reservations_room_dates",
+        "idx_reservations_dates",
+        "idx_reservations_guest",
+        "idx_reservations_room_history",
+    } <= indexes
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(core, name):
+    seed(core)
+    fn, index = HOT_QUERIES[name]
+    for sql, plan in reservation_plans(core, lambda: fn(core)):
+        assert any(index in line for line in plan), (name, plan)
+        assert not [line for line in plan if TABLE_SCAN.match(line)], (name, plan)
+
+
+HISTORY_PAGES = {
+    "room_first": lambda c: c.get_room_reservations("101", limit=5),
+    "room_older": lambda c: c.get_room_reservations("101", before=("2025-01-19", 10**6), limit=5),
+    "room_newer": lambda c: c.get_room_reservations("101", after=("2025-01-19", 0), limit=5),
+    "guest_first": lambda c: c.get_guest_reservations("Guest 3", limit=5),
+    "guest_older": lambda c: c.get_guest_reservations("Guest 3", before=("2025-01-19", 10**6), limit=5),
+    "guest_newer": lambda c: c.get_guest_reservations("Guest 3", after=("2025-01-19", 0), limit=5),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HISTORY_PAGES))
+def test_history_page_is_an_index_seek(core, name):
+    seed(core)
+    for sql, plan in reservation_plans(core, lambda: HISTORY_PAGES[name](core)):
+        assert not [line for line in plan if TEMP_SORT in line], (name, plan)
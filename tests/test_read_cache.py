@@ -0,0 +1,34 @@
+"""Rooms and settings are cached until a write commits."""
+
+import pytest
+
+
+def test_write_invalidates_cached_reads(core):
+    rooms = core.get_rooms()
+    assert core.get_rooms() is rooms
+    assert core.get_setting("theme", "light") == "light"
+
+    core.add_room("999")
+    core.set_setting("theme", "dark")
+
+    assert "999" in [r["number"] for r in core.get_rooms()]
+    assert core.get_room_by_number("999") is not None
+    assert core.get_setting("theme", "light") == "dark"
+
+
+def test_rolled_back_write_leaves_no_cached_data(core):
+    core.set_setting("theme", "light")
+    generation = core.read_cache_stats()["generation"]
+
+    with pytest.raises(RuntimeError):
+        with core.db() as conn:
+            conn.execute("UPDATE settings SET value = 'dark' WHERE key = 'theme';")
+            core.add_room("999")
+            # reads inside the transaction see its uncommitted rows
+            assert core.get_setting("theme", "light") == "dark"
+            assert core.get_room_by_number("999") is not None
+            raise RuntimeError("abort")
+
+    assert core.read_cache_stats()["generation"] == generation
+    assert core.get_setting("theme", "light") == "light"
+    assert core.get_room_by_number("999") is None
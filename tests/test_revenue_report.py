@@ -0,0 +1,78 @@
+"""get_revenue_report buckets and KPIs on a fixture small enough to add up by hand."""
+
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def hotel(core):
+    # two rooms, 2026-01-29 (Thu) .. 2026-02-02 (Mon) = 10 available room-nights
+    with core.db() as conn:
+        conn.execute("DELETE FROM rooms WHERE number NOT IN ('101', '102');")
+        core.invalidate_read_cache()
+    stays = [
+        # starts before the range: only the night of Jan 29 counts, 80/night
+        ("101", date(2026, 1, 27), date(2026, 1, 30), 70.0, 10.0, "checkedout"),
+        # Jan 30, 31, Feb 1 at 110/night
+        ("101", date(2026, 1, 30), date(2026, 2, 2), 100.0, 10.0, "checkedin"),
+        # Feb 1, 2 at 50/night; the Feb 3 night is past the range
+        ("102", date(2026, 2, 1), date(2026, 2, 4), 50.0, 0.0, "reserved"),
+        # no-shows count nothing
+        ("102", date(2026, 1, 29), date(2026, 1, 31), 500.0, 0.0, "noshow"),
+    ]
+    for room, ci, co, tariff, tax, status in stays:
+        assert core.save_reservation(room, f"Guest {room} {ci}", ci, co, 1, tariff, tax, "", status)
+    return core
+
+
+def summary(row):
+    return (row["period"], row["days"], row["available_room_nights"], row["room_nights"],
+            row["revenue_usd"], row["adr_usd"], row["revpar_usd"], row["occupancy_rate"])
+
+
+def test_day_buckets(hotel):
+    report = hotel.get_revenue_report(date(2026, 1, 29), date(2026, 2, 2), "day")
+    assert [summary(r) for r in report["rows"]] == [
+        ("2026-01-29", 1, 2, 1, 80.0, 80.0, 40.0, 50.0),
+        ("2026-01-30", 1, 2, 1, 110.0, 110.0, 55.0, 50.0),
+        ("2026-01-31", 1, 2, 1, 110.0, 110.0, 55.0, 50.0),
+        ("2026-02-01", 1, 2, 2, 160.0, 80.0, 80.0, 100.0),
+        ("2026-02-02", 1, 2, 1, 50.0, 50.0, 25.0, 50.0),
+    ]
+
+
+def test_week_buckets_start_on_monday(hotel):
+    report = hotel.get_revenue_report(date(2026, 1, 29), date(2026, 2, 2), "week")
+    assert [summary(r) for r in report["rows"]] == [
+        ("2026-W05", 4, 8, 5, 460.0, 92.0, 57.5, 62.5),
+        ("2026-W06", 1, 2, 1, 50.0, 50.0, 25.0, 50.0),
+    ]
+    assert [(r["start"], r["end"]) for r in report["rows"]] == [
+        (date(2026, 1, 29), date(2026, 2, 1)),
+        (date(2026, 2, 2), date(2026, 2, 2)),
+    ]
+
+
+def test_month_buckets_and_totals(hotel):
+    report = hotel.get_revenue_report(date(2026, 1, 29), date(2026, 2, 2), "month")
+    assert report["rooms"] == 2
+    assert [summary(r) for r in report["rows"]] == [
+        ("2026-01", 3, 6, 3, 300.0, 100.0, 50.0, 50.0),
+        ("2026-02", 2, 4, 3, 210.0, 70.0, 52.5, 75.0),
+    ]
+    totals = report["totals"]
+    assert (totals["days"], totals["available_room_nights"], totals["room_nights"]) == (5, 10, 6)
+    assert (totals["revenue_usd"], totals["adr_usd"], totals["revpar_usd"], totals["occupancy_rate"]) == (
+        510.0, 85.0, 51.0, 60.0
+    )
+
+
+def test_empty_range_and_bad_arguments(hotel):
+    report = hotel.get_revenue_report(date(2025, 6, 1), date(2025, 6, 3), "day")
+    assert [r["room_nights"] for r in report["rows"]] == [0, 0, 0]
+    assert report["totals"]["adr_usd"] == 0.0
+    with pytest.raises(ValueError):
+        hotel.get_revenue_report(date(2026, 1, 2), date(2026, 1, 1))
+    with pytest.raises(ValueError):
+        hotel.get_revenue_report(date(2026, 1, 1), date(2026, 1, 2), "year")
@@ -0,0 +1,60 @@
+"""update_room_defaults_bulk writes only the rooms whose prices changed."""
+
+import sqlite3
+
+
+def track_room_updates(core):
+    with core.db() as conn:
+        conn.execute("CREATE TABLE room_updates(room_id INTEGER);")
+        conn.execute(
+            "CREATE TRIGGER room_updates_au AFTER UPDATE ON rooms BEGIN "
+            "INSERT INTO room_updates(room_id) VALUES (new.id); END;"
+        )
+
+
+def read(core, sql):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_bulk_save_writes_only_changed_rooms(core):
+    rooms = core.get_rooms()
+    assert len(rooms) >= 4
+    core.update_room_defaults_bulk([(r["id"], 80.0, 10.0) for r in rooms])
+    track_room_updates(core)
+    audit_before = read(core, "SELECT COUNT(*) FROM audit_log;")[0][0]
+
+    prices = [(r["id"], 80.0, 10.0) for r in rooms]
+    prices[1] = (rooms[1]["id"], 95.0, 10.0)
+    prices[3] = (rooms[3]["id"], 80.0, 12.5)
+    prices[2] = (rooms[2]["id"], 80.004, 10.0)  # under half a cent: unchanged
+    assert core.update_room_defaults_bulk(prices) == 2
+
+    assert read(core, "SELECT room_id FROM room_updates ORDER BY room_id;") == [
+        (rooms[1]["id"],), (rooms[3]["id"],)
+    ]
+    stored = {r[0]: (r[1], r[2]) for r in read(core, "SELECT id, default_tariff, default_tax FROM rooms;")}
+    assert stored[rooms[1]["id"]] == (95.0, 10.0)
+    assert stored[rooms[3]["id"]] == (80.0, 12.5)
+    assert stored[rooms[2]["id"]] == (80.0, 10.0)
+
+    audit = read(core, f"SELECT action, details FROM audit_log ORDER BY id LIMIT -1 OFFSET {audit_before};")
+    assert len(audit) == 1
+    assert audit[0][0] == "UPDATE"
+    assert "2 room(s)" in audit[0][1]
+    assert {r["id"]: r["default_tariff"] for r in core.get_rooms()}[rooms[1]["id"]] == 95.0
+
+
+def test_bulk_save_without_changes_writes_nothing(core):
+    rooms = core.get_rooms()
+    core.update_room_defaults_bulk([(r["id"], 60.0, 6.0) for r in rooms])
+    track_room_updates(core)
+    audit_before = read(core, "SELECT COUNT(*) FROM audit_log;")[0][0]
+
+    assert core.update_room_defaults_bulk([(r["id"], 60.0, 6.0) for r in rooms] + [(99999, 1.0, 1.0)]) == 0
+
+    assert read(core, "SELECT COUNT(*) FROM room_updates;") == [(0,)]
+    assert read(core, "SELECT COUNT(*) FROM audit_log;")[0][0] == audit_before
@@ -0,0 +1,100 @@
+"""WriteQueue: one transaction per batch, one savepoint per job."""
+
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def queued(core, monkeypatch):
+    # a long gather window so every job submitted below lands in one batch
+    wq = core.WriteQueue(batch_max=16, wait_ms=500)
+    monkeypatch.setattr(core, "_WRITE_QUEUE", wq)
+    monkeypatch.setattr(core, "WRITE_QUEUE_ENABLED", True)
+    yield core
+    wq.stop(timeout=5)
+
+
+def put(core, key, value):
+    with core.db() as conn:
+        conn.execute("INSERT INTO settings(key, value) VALUES (?, ?);", (key, value))
+    return value
+
+
+def put_then_fail(core, key):
+    put(core, key, "doomed")
+    raise ValueError(f"job {key} failed")
+
+
+def nested(core, key):
+    inner = core.run_write(put, core, key + ".inner", "in")
+    return put(core, key, "out") + "+" + inner
+
+
+def nested_failure_caught(core, key):
+    try:
+        core.run_write(put_then_fail, core, key + ".inner")
+    except ValueError:
+        pass
+    return put(core, key, "kept")
+
+
+def stored(core):
+    conn = sqlite3.connect(core.DB_PATH)
+    try:
+        return dict(conn.execute("SELECT key, value FROM settings WHERE key LIKE 'wq.%';").fetchall())
+    finally:
+        conn.close()
+
+
+def test_failed_job_rolls_back_alone(queued):
+    core = queued
+    futures = [
+        core.submit_write(put, core, "wq.a", "A"),
+        core.submit_write(put_then_fail, core, "wq.b"),
+        core.submit_write(put, core, "wq.c", "C"),
+        core.submit_write(put, core, "wq.a", "duplicate key"),
+        core.submit_write(nested, core, "wq.d"),
+        core.submit_write(nested_failure_caught, core, "wq.e"),
+    ]
+    assert futures[0].result(5) == "A"
+    with pytest.raises(ValueError, match="job wq.b failed"):
+        futures[1].result(5)
+    assert futures[2].result(5) == "C"
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[3].result(5)
+    assert futures[4].result(5) == "out+in"
+    assert futures[5].result(5) == "kept"
+
+    assert stored(core) == {"wq.a": "A", "wq.c": "C", "wq.d": "out", "wq.d.inner": "in", "wq.e": "kept"}
+    stats = core.write_queue_stats()
+    assert (stats["batches"], stats["max_batch"], stats["jobs"], stats["failed"]) == (1, 6, 6, 2)
+
+
+def test_failed_job_drops_its_commit_callbacks(queued):
+    core = queued
+    generation = core.read_cache_stats()["generation"]
+
+    def set_then_fail():
+        core.set_setting("wq.theme", "dark")
+        raise RuntimeError("no")
+
+    failed = core.submit_write(set_then_fail)
+    ok = core.submit_write(core.set_setting, "wq.lang", "es")
+    with pytest.raises(RuntimeError):
+        failed.result(5)
+    ok.result(5)
+    # only the committed job's invalidation ran
+    assert core.read_cache_stats()["generation"] == generation + 1
+    assert core.get_setting("wq.theme", "light") == "light"
+    assert core.get_setting("wq.lang", "en") == "es"
+
+
+def test_without_the_queue_jobs_run_inline(core):
+    jobs = core.write_queue_stats()["jobs"]
+    future = core.submit_write(put, core, "wq.inline", "x")
+    assert future.done() and future.result() == "x"
+    assert core.run_write(nested, core, "wq.n") == "out+in"
+    with pytest.raises(ValueError):
+        core.run_write(put_then_fail, core, "wq.fail")
+    assert core.write_queue_stats()["jobs"] == jobs